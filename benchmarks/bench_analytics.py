@@ -0,0 +1,53 @@
+"""
+Benchmark of the vectorized recharge analytics (gwr.analytics) on synthetic monthly series.
+
+Usage: python benchmarks/bench_analytics.py [n_series] [n_years]
+"""
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from gwr import analytics
+
+
+def synthetic_recharge(n_series, n_months, seed=0):
+    # Seasonal recharge with a random trend, noise, missing values and dry (zero) months.
+    rng = np.random.default_rng(seed)
+    t = np.arange(n_months)
+    seasonal = 20 * (1 + np.sin(2 * np.pi * t / 12))[None, :]
+    trend = rng.normal(0, 0.05, size=(n_series, 1)) * t[None, :]
+    values = np.maximum(seasonal + trend + rng.normal(0, 5, size=(n_series, n_months)), 0)
+    values[rng.random(values.shape) < 0.01] = np.nan
+    return values
+
+
+def timed(label, fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    print(f"{label:<24} {time.perf_counter() - start:8.3f} s")
+    return result
+
+
+def main():
+    n_series = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    n_years = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+    index = pd.date_range("2000-01-01", periods=12 * n_years, freq="MS")
+    values = synthetic_recharge(n_series, len(index))
+    print(f"{n_series} series x {len(index)} months")
+
+    timed("monthly_climatology", analytics.monthly_climatology, values, index.month)
+    timed("monthly_anomalies", analytics.monthly_anomalies, values, index.month, standardized=True)
+    timed("mann_kendall", analytics.mann_kendall, values)
+    timed("sens_slope", analytics.sens_slope, values)
+    timed("drought_years", analytics.drought_years, values, index.year)
+    timed("analyse_series", analytics.analyse_series, values, index)
+
+
+if __name__ == "__main__":
+    main()
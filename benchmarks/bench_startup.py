@@ -0,0 +1,88 @@
+"""
+Benchmark of the import time of the gwr modules and of the heavy third party packages used by the page.
+
+Each module is imported in a fresh interpreter, so the time includes all its dependencies, as on a cold
+start of the application. The packages only needed once a section is rendered (geemap, folium,
+matplotlib) are reported separately: they must not appear in the imports of the page modules.
+
+Usage: python benchmarks/bench_startup.py [repeat]
+"""
+import ast
+import os
+import subprocess
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+PAGE = os.path.join(ROOT, "pages", "1_Groundwater_Recharge_Estimation.py")
+
+
+def page_imports(path=PAGE):
+    """
+    Returns the modules imported at the top level of the page, except the standard library, so that the
+    modules added to the page are benchmarked without updating this list.
+    """
+    with open(path, encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+
+    modules = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            modules += [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.module:
+            # "from gwr import pipeline" imports the module gwr.pipeline.
+            modules += [f"{node.module}.{alias.name}" for alias in node.names]
+    return [module for module in dict.fromkeys(modules) if module.split(".")[0] not in sys.stdlib_module_names]
+
+
+# Modules imported when the page starts.
+STARTUP_MODULES = page_imports()
+
+# Modules only imported once a map or a chart is rendered.
+LAZY_MODULES = [
+    "geemap.foliumap",
+    "folium",
+    "matplotlib.pyplot",
+]
+
+IMPORT_SCRIPT = """
+import sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+lazy = [name for name in {lazy!r} if name in sys.modules]
+print(elapsed, ",".join(lazy))
+"""
+
+
+def time_import(module, repeat):
+    # Returns the best import time over the runs and the lazy modules pulled in by the import.
+    best, lazy = None, ""
+    for _ in range(repeat):
+        result = subprocess.run(
+            [sys.executable, "-c", IMPORT_SCRIPT.format(module=module, lazy=LAZY_MODULES)],
+            cwd=ROOT, capture_output=True, text=True,
+        )
+        if result.returncode != 0:
+            return None, result.stderr.strip().splitlines()[-1]
+        elapsed, lazy = result.stdout.split(" ", 1)
+        best = float(elapsed) if best is None else min(best, float(elapsed))
+    return best, lazy.strip()
+
+
+def main():
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+
+    for title, modules in (("Startup imports", STARTUP_MODULES), ("Lazy imports", LAZY_MODULES)):
+        print(title)
+        for module in modules:
+            elapsed, detail = time_import(module, repeat)
+            if elapsed is None:
+                print(f"  {module:<24} {'n/a':>8}   {detail}")
+            else:
+                pulled = f"   pulls in {detail}" if detail and module in STARTUP_MODULES else ""
+                print(f"  {module:<24} {elapsed:8.3f} s{pulled}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+import warnings
+
+import numpy as np
+import pandas as pd
+
+'''
+    Vectorized analytics over monthly recharge / meteorological series.
+
+    All the functions work on a 2D array of shape (n_series, n_months) holding many series (ROIs, pixels,
+    scenarios...) aligned on the same monthly time axis, and are vectorized over the series: the only Python
+    loops are over the time axis (lags) or over chunks of series, never over individual series.
+    Missing values are NaN.
+'''
+
+# Maximum number of pairwise slopes held in memory at once by sens_slope() (16 MB, small enough to stay in
+# the CPU cache while the slopes are partitioned).
+MAX_PAIRWISE_ELEMENTS = 2_000_000
+
+
+def series_matrix(frames, column="mean-rech"):
+    """
+    Stacks the given column of several monthly DataFrames (e.g. recharge_df of several ROIs)
+    into an array of shape (n_series, n_months) aligned on their datetime index.
+    Returns the array and the common DatetimeIndex.
+    """
+    if isinstance(frames, dict):
+        frames = list(frames.values())
+
+    combined = pd.concat([df[column] for df in frames], axis=1).sort_index()
+    return combined.to_numpy(dtype=np.float64).T, combined.index
+
+
+def _month_matrix(months):
+    # One-hot (n_months, 12) matrix of the calendar month of each time step.
+    months = np.asarray(months)
+    return (months[:, None] == np.arange(1, 13)[None, :]).astype(np.float64)
+
+
+def _group_mean(values, one_hot):
+    # Mean of the non NaN values of each group defined by the columns of the one-hot matrix.
+    valid = ~np.isnan(values)
+    sums = np.where(valid, values, 0.0) @ one_hot
+    counts = valid.astype(np.float64) @ one_hot
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return sums / counts, counts
+
+
+def monthly_climatology(values, months):
+    """
+    Mean value of each calendar month for each series.
+    values: (n_series, n_months) array
+    months: (n_months,) calendar month (1-12) of each time step
+    Returns a (n_series, 12) array.
+    """
+    climatology, _ = _group_mean(np.asarray(values, dtype=np.float64), _month_matrix(months))
+    return climatology
+
+
+def monthly_anomalies(values, months, standardized=False):
+    """
+    Departure of each value from the climatology of its calendar month.
+    With standardized the anomalies are divided by the standard deviation of the calendar month.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    months = np.asarray(months)
+    climatology = monthly_climatology(values, months)
+    anomalies = values - climatology[:, months - 1]
+
+    if standardized:
+        one_hot = _month_matrix(months)
+        variance, counts = _group_mean(anomalies ** 2, one_hot)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            std = np.sqrt(variance * counts / (counts - 1))
+            anomalies = anomalies / std[:, months - 1]
+
+    return anomalies
+
+
+def _erfc(x):
+    # Complementary error function (Abramowitz and Stegun 7.1.26, absolute error < 1.5e-7).
+    z = np.abs(x)
+    t = 1.0 / (1.0 + 0.3275911 * z)
+    poly = t * (0.254829592 + t * (-0.284496736 + t * (1.421413741 + t * (-1.453152027 + t * 1.061405429))))
+    result = poly * np.exp(-z * z)
+    return np.where(x >= 0, result, 2.0 - result)
+
+
+def mann_kendall(values, alpha=0.05):
+    """
+    Mann-Kendall trend test of each series (with the variance correction for ties).
+    Returns a DataFrame with the statistic s, its variance, the normalised statistic z,
+    the two-sided p-value and the trend (-1 decreasing, 0 no trend, 1 increasing) at level alpha.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    n_series, n_months = values.shape
+
+    # S = sum over i < j of sign(x_j - x_i), accumulated lag by lag over all the series at once.
+    s = np.zeros(n_series)
+    # Comparisons with NaN are False, so the missing values do not contribute.
+    for lag in range(1, n_months):
+        difference = values[:, lag:] - values[:, :-lag]
+        s += np.count_nonzero(difference > 0, axis=1) - np.count_nonzero(difference < 0, axis=1)
+
+    n = np.sum(~np.isnan(values), axis=1).astype(np.float64)
+
+    # Tie correction: sum over the groups of tied values of t(t-1)(2t+5), computed from the
+    # position k of each value within its run of equal values in the sorted series.
+    ordered = np.sort(values, axis=1)
+    run_start = np.ones_like(ordered, dtype=bool)
+    run_start[:, 1:] = ordered[:, 1:] != ordered[:, :-1]
+    positions = np.broadcast_to(np.arange(n_months), ordered.shape)
+    k = positions - np.maximum.accumulate(np.where(run_start, positions, 0), axis=1) + 1
+
+    def g(t):
+        return t * (t - 1) * (2 * t + 5)
+
+    ties = np.sum(np.where(np.isnan(ordered), 0, g(k) - g(k - 1)), axis=1)
+
+    var_s = (g(n) - ties) / 18.0
+    with np.errstate(invalid="ignore", divide="ignore"):
+        z = np.where(s > 0, (s - 1) / np.sqrt(var_s), np.where(s < 0, (s + 1) / np.sqrt(var_s), 0.0))
+    p_value = _erfc(np.abs(z) / np.sqrt(2.0))
+
+    trend = np.where(p_value < alpha, np.sign(z), 0).astype(np.int8)
+    trend[n < 3] = 0
+
+    return pd.DataFrame({"s": s, "var_s": var_s, "z": z, "p_value": p_value, "trend": trend})
+
+
+def _median_rows(a):
+    """
+    Median of each row of an array without NaN (modified in place).
+    A single partition is made around the upper middle element, the lower middle element of an even
+    number of values is then the maximum of the lower part.
+    """
+    upper = a.shape[1] // 2
+    a.partition(upper, axis=1)
+    median = a[:, upper].copy()
+    if a.shape[1] % 2 == 0:
+        median = (median + a[:, :upper].max(axis=1)) / 2
+    return median
+
+
+def _pairwise_slopes(packed, times):
+    """
+    Slopes between all the pairs of values of each row, computed lag by lag on contiguous slices.
+    packed, times: (n_rows, n_values) values and time steps, the time steps increasing along each row
+    Returns a (n_rows, n_values * (n_values - 1) / 2) array.
+    """
+    n_rows, n_values = packed.shape
+    slopes = np.empty((n_rows, n_values * (n_values - 1) // 2))
+    offset = 0
+    for lag in range(1, n_values):
+        out = slopes[:, offset:offset + n_values - lag]
+        np.subtract(packed[:, lag:], packed[:, :-lag], out=out)
+        out /= times[:, lag:] - times[:, :-lag]
+        offset += n_values - lag
+    return slopes
+
+
+def sens_slope(values):
+    """
+    Sen's slope (median of the slopes between all pairs of time steps) of each series, per time step.
+
+    The series are grouped by their number of valid months: the valid values of the series of a group are
+    packed without the missing months, so every series of the group has the same number of pairwise slopes,
+    none of them NaN, and their median is taken with a single partition instead of a NaN-aware sort. The
+    series of a group are processed in chunks so that the pairwise slopes fit in MAX_PAIRWISE_ELEMENTS.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    n_series, n_months = values.shape
+
+    valid = ~np.isnan(values)
+    counts = valid.sum(axis=1)
+    positions = np.broadcast_to(np.arange(n_months, dtype=np.float64), values.shape)
+
+    slopes = np.full(n_series, np.nan)
+    for count in np.unique(counts[counts >= 2]):
+        rows = np.flatnonzero(counts == count)
+        chunk = max(1, MAX_PAIRWISE_ELEMENTS // (count * (count - 1) // 2))
+        for start in range(0, len(rows), chunk):
+            block = rows[start:start + chunk]
+            # Valid values and their time steps, in time order (the boolean mask keeps the row order).
+            mask = valid[block]
+            packed = values[block][mask].reshape(len(block), count)
+            times = positions[block][mask].reshape(len(block), count)
+            slopes[block] = _median_rows(_pairwise_slopes(packed, times))
+
+    return slopes
+
+
+def annual_totals(values, years, min_months=12):
+    """
+    Sum of the monthly values of each year for each series.
+    Years with fewer than min_months valid months are NaN.
+    Returns the (n_series, n_years) totals and the sorted years.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    unique_years, year_idx = np.unique(np.asarray(years), return_inverse=True)
+    one_hot = (year_idx[:, None] == np.arange(len(unique_years))[None, :]).astype(np.float64)
+
+    valid = ~np.isnan(values)
+    totals = np.where(valid, values, 0.0) @ one_hot
+    counts = valid.astype(np.float64) @ one_hot
+    totals[counts < min_months] = np.nan
+
+    return totals, unique_years
+
+
+def drought_years(values, years, threshold=-1.0, min_months=12):
+    """
+    Flags the drought years of each series: the years whose annual total is more than
+    |threshold| standard deviations below the mean annual total of the series.
+    Returns a boolean (n_series, n_years) array, the standardized annual totals and the years.
+    """
+    totals, unique_years = annual_totals(values, years, min_months)
+    with np.errstate(invalid="ignore", divide="ignore"), warnings.catch_warnings():
+        # Series without any complete year have no mean, they are never flagged.
+        warnings.simplefilter("ignore", RuntimeWarning)
+        mean = np.nanmean(totals, axis=1, keepdims=True)
+        std = np.nanstd(totals, axis=1, ddof=1, keepdims=True)
+        z = (totals - mean) / std
+
+    return np.nan_to_num(z, nan=0.0) < threshold, z, unique_years
+
+
+def analyse_series(values, index, alpha=0.05, drought_threshold=-1.0):
+    """
+    Runs the trend and drought analytics on many monthly series at once.
+    values: (n_series, n_months) array, index: DatetimeIndex of the months
+    Returns a DataFrame with one row per series: Mann-Kendall statistics, Sen's slope
+    (per year) and the number of drought years.
+    """
+    index = pd.DatetimeIndex(index)
+    summary = mann_kendall(values, alpha)
+    summary["sens_slope_per_year"] = sens_slope(values) * 12
+    flags, _, _ = drought_years(values, index.year, drought_threshold)
+    summary["drought_years"] = flags.sum(axis=1)
+
+    return summary
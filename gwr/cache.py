@@ -0,0 +1,298 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from gwr import instrumentation, rate_limit, singleflight
+
+logger = logging.getLogger(__name__)
+
+'''
+    Result cache shared between the streamlit sessions (and between the processes serving them).
+
+    The results of the Earth Engine calls are stored as JSON in a pluggable backend:
+        memory://                   - in-process dictionary (default)
+        sqlite:///path/to/cache.db  - SQLite database, can live on a volume shared by several processes
+        redis://host:port/db        - Redis compatible key-value server (requires the redis package)
+
+    The backend is selected with the GWR_CACHE_URL environment variable. The memory backend is bounded: the
+    least recently used entries are evicted beyond MEMORY_MAX_ENTRIES entries or MEMORY_MAX_BYTES of values.
+    Concurrent identical requests are coalesced: within a process through the single-flight registry,
+    across processes through a lease on the key taken by the first caller, the others wait for the
+    result to be stored instead of calling Earth Engine.
+'''
+
+# Default time to live of a cached result [in seconds].
+DEFAULT_TTL = 24 * 3600
+
+# Time after which a lease is considered abandoned (e.g. the computing process died) [in seconds].
+DEFAULT_LEASE_TTL = 300
+
+# Interval between two checks for the result of a computation leased by another process [in seconds].
+DEFAULT_POLL_INTERVAL = 0.5
+
+# Maximum number of entries and total size of the values [in bytes] kept by the memory backend.
+MEMORY_MAX_ENTRIES = 10000
+MEMORY_MAX_BYTES = 256 * 1024 * 1024
+
+# Returned by ResultCache.get for a key without result, as None (JSON null) is a valid result.
+MISSING = object()
+
+
+def fingerprint(*parts):
+    """Returns a deterministic sha256 key for the given JSON serialisable parts."""
+    payload = json.dumps(parts, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def request_fingerprint(ee_object):
+    """
+    Returns the canonical fingerprint of the computation of an Earth Engine object.
+    The serialised expression graph contains the assets, dates, geometry, scale and every
+    operation applied, so two identical requests built independently share the same fingerprint.
+    """
+    return fingerprint("getInfo", ee_object.serialize())
+
+
+class MemoryBackend:
+    """
+    Cache backend keeping the results in the memory of the current process.
+    The entries are kept in least recently used order and evicted beyond max_entries entries or max_bytes
+    of values, the expired entries are purged whenever a value is stored.
+    """
+
+    def __init__(self, max_entries=MEMORY_MAX_ENTRIES, max_bytes=MEMORY_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._values = OrderedDict()
+        self._size = 0
+        self._leases = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._values.get(key)
+            if item is None:
+                return None
+            value, expires = item
+            if expires < time.time():
+                self._remove(key)
+                return None
+            self._values.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            if key in self._values:
+                self._remove(key)
+            self._values[key] = (value, time.time() + ttl)
+            self._size += len(value)
+            self._purge()
+
+    def _remove(self, key):
+        value, _ = self._values.pop(key)
+        self._size -= len(value)
+
+    def _purge(self):
+        # Drop the expired entries, then the least recently used ones until the limits are met.
+        now = time.time()
+        for key in [key for key, (_, expires) in self._values.items() if expires < now]:
+            self._remove(key)
+        while self._values and (len(self._values) > self.max_entries or self._size > self.max_bytes):
+            self._remove(next(iter(self._values)))
+
+    def acquire_lease(self, key, ttl):
+        with self._lock:
+            expires = self._leases.get(key)
+            if expires is not None and expires > time.time():
+                return False
+            self._leases[key] = time.time() + ttl
+            return True
+
+    def release_lease(self, key):
+        with self._lock:
+            self._leases.pop(key, None)
+
+
+class SQLiteBackend:
+    """Cache backend storing the results in a SQLite database, which can be shared between processes."""
+
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, value BLOB, expires REAL)")
+            conn.execute("CREATE TABLE IF NOT EXISTS leases (key TEXT PRIMARY KEY, expires REAL)")
+
+    @contextmanager
+    def _connect(self):
+        # A connection per operation keeps the backend usable from any thread.
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, key):
+        with self._connect() as conn:
+            row = conn.execute("SELECT value, expires FROM results WHERE key = ?", (key,)).fetchone()
+        if row is None or row[1] < time.time():
+            return None
+        return row[0]
+
+    def set(self, key, value, ttl):
+        with self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO results (key, value, expires) VALUES (?, ?, ?)",
+                         (key, value, time.time() + ttl))
+
+    def acquire_lease(self, key, ttl):
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("DELETE FROM leases WHERE key = ? AND expires < ?", (key, now))
+            cursor = conn.execute("INSERT OR IGNORE INTO leases (key, expires) VALUES (?, ?)", (key, now + ttl))
+            return cursor.rowcount == 1
+
+    def release_lease(self, key):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM leases WHERE key = ?", (key,))
+
+
+class RedisBackend:
+    """Cache backend storing the results in a Redis compatible key-value server."""
+
+    def __init__(self, url, prefix="gwr:"):
+        try:
+            import redis
+        except ImportError as e:
+            raise ImportError("The redis package is required to use a redis:// cache backend") from e
+
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def get(self, key):
+        return self.client.get(self.prefix + key)
+
+    def set(self, key, value, ttl):
+        self.client.set(self.prefix + key, value, ex=int(ttl))
+
+    def acquire_lease(self, key, ttl):
+        return bool(self.client.set(self.prefix + "lease:" + key, 1, nx=True, ex=int(ttl)))
+
+    def release_lease(self, key):
+        self.client.delete(self.prefix + "lease:" + key)
+
+
+def backend_from_url(url):
+    """Creates the cache backend described by a memory://, sqlite:/// or redis:// URL."""
+    if url is None or url == "memory://":
+        return MemoryBackend()
+    if url.startswith("sqlite:///"):
+        return SQLiteBackend(url[len("sqlite:///"):])
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisBackend(url)
+
+    raise ValueError(f"The cache URL '{url}' is not supported")
+
+
+class ResultCache:
+    """Cache of JSON serialisable results with coalescing of concurrent identical requests."""
+
+    def __init__(self, backend, ttl=DEFAULT_TTL, lease_ttl=DEFAULT_LEASE_TTL, poll_interval=DEFAULT_POLL_INTERVAL):
+        self.backend = backend
+        self.ttl = ttl
+        self.lease_ttl = lease_ttl
+        self.poll_interval = poll_interval
+
+    def get(self, key, default=None):
+        """Returns the result stored under key, or default if there is none."""
+        value = self.backend.get(key)
+        return default if value is None else json.loads(value)
+
+    def set(self, key, result):
+        self.backend.set(key, json.dumps(result, separators=(",", ":")), self.ttl)
+
+    def get_or_compute(self, key, compute):
+        """
+        Returns the cached result for key, computing and storing it with compute() on a miss.
+        Only one caller computes a given key at a time: the threads of this process await the
+        in-flight computation, the other processes sharing the backend wait for the lease to be released.
+        """
+        result = self.get(key, MISSING)
+        if result is not MISSING:
+            return result
+
+        return singleflight.do(key, lambda: self._compute_once(key, compute))
+
+    def _compute_once(self, key, compute):
+        # A computation of the same key may have completed since the cache was checked.
+        result = self.get(key, MISSING)
+        if result is not MISSING:
+            return result
+
+        deadline = time.time() + self.lease_ttl
+        while not self.backend.acquire_lease(key, self.lease_ttl):
+            # Another process is computing the result, wait for it to be stored.
+            time.sleep(self.poll_interval)
+            result = self.get(key, MISSING)
+            if result is not MISSING:
+                return result
+            if time.time() > deadline:
+                logger.warning(f"Lease on cache key {key} was not released, computing the result")
+                break
+
+        try:
+            result = compute()
+            self.set(key, result)
+        finally:
+            self.backend.release_lease(key)
+
+        return result
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """Returns the process wide result cache, configured from the GWR_CACHE_URL environment variable."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResultCache(backend_from_url(os.environ.get("GWR_CACHE_URL")))
+        return _cache
+
+
+def set_cache(cache):
+    """Replaces the process wide result cache."""
+    global _cache
+    with _cache_lock:
+        _cache = cache
+
+
+def get_info(ee_object, name, **attributes):
+    """
+    Cached equivalent of ee_object.getInfo().
+    The cache key is the fingerprint of the serialised Earth Engine computation, so identical
+    requests made by any session share the same result.
+    """
+    key = request_fingerprint(ee_object)
+    return get_cache().get_or_compute(key, lambda: traced_get_info(ee_object, name, **attributes))
+
+
+def traced_get_info(ee_object, name, **attributes):
+    """
+    Calls getInfo() on an Earth Engine object through the rate limiter, inside an
+    instrumentation span recording the response size and the retries.
+    """
+    with instrumentation.span(name, **attributes) as s:
+        result = rate_limit.call(ee_object.getInfo, span=s)
+        s.record_response(result)
+    return result
@@ -0,0 +1,265 @@
+import argparse
+import json
+import logging
+import math
+import os
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+import ee
+from gwr import layer_map, met_properties, rate_limit
+
+logger = logging.getLogger(__name__)
+
+'''
+    Precomputed tiles of the monthly and annual precipitation / PET climatology.
+
+    The climatology layers (mean monthly and mean annual totals over CLIMATOLOGY_YEARS) are rendered once
+    by Earth Engine for the operating region and a range of zoom levels, and written as PNG tiles in a local
+    XYZ store:
+        <store>/<layer>/<z>/<x>/<y>.png
+        <store>/manifest.json           - layers, bounds, zooms and visualization of the store
+    The store is served by streamlit itself (static file serving, enabled in .streamlit/config.toml), so the
+    browser fetches the tiles from the origin of the page and panning and zooming these layers does not
+    trigger any Earth Engine computation.
+
+    Generate the store (resumable, existing tiles are skipped) with:
+        python -m gwr.climatology_tiles generate --bounds 88 20 93 27 --zooms 0 9
+    The tiles are written by default to static/climatology next to Home.py, served at
+    /app/static/climatology. A store outside of the static folder must be served elsewhere: set GWR_TILE_STORE
+    to its folder and GWR_TILE_URL to its public base URL. If the store cannot be served to the browser, the
+    layers of its manifest are rendered by Earth Engine instead.
+    The serve command runs a plain HTTP server of the store, for local development only:
+        python -m gwr.climatology_tiles serve --store tiles --port 8765
+'''
+
+# Years over which the climatology is computed.
+CLIMATOLOGY_YEARS = (2001, 2020)
+
+PALETTE = ["red", "orange", "yellow", "green", "blue", "purple"]
+
+# Visualization parameters of the climatology layers [in mm per month or per year].
+VIS_PARAMS = {
+    "pr": {"monthly": {"min": 0, "max": 400, "palette": PALETTE}, "annual": {"min": 0, "max": 3000, "palette": PALETTE}},
+    "pet": {"monthly": {"min": 0, "max": 250, "palette": PALETTE}, "annual": {"min": 0, "max": 2000, "palette": PALETTE}},
+}
+
+LABELS = {"pr": "Precipitation", "pet": "Potential Evapotranspiration"}
+
+MANIFEST = "manifest.json"
+
+# Static folder served by streamlit, next to the main script of the app.
+STATIC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "static")
+STATIC_URL_PATH = "app/static"
+
+DEFAULT_STORE = os.path.join(STATIC_DIR, "climatology")
+
+DEFAULT_TILE_PORT = 8765
+
+# Number of tiles downloaded at once, each download goes through the rate limiter.
+DOWNLOAD_WORKERS = 8
+
+
+def layer_name(band, period):
+    """Returns the name of a climatology layer, e.g. pr_annual or pet_m07."""
+    return f"{band}_annual" if period == "annual" else f"{band}_m{period:02d}"
+
+
+def get_climatology_collection(years=CLIMATOLOGY_YEARS):
+    """Returns the monthly pr and pet collection over the climatology years."""
+    return met_properties.get_mean_monthly_meteorological_data(date(years[0], 1, 1), date(years[1] + 1, 1, 1))
+
+
+def climatology_image(meteo, band, period):
+    """
+    Returns the mean total of the band for a calendar month (1-12) or for the year ("annual")
+    over the monthly collection meteo.
+    """
+    if period == "annual":
+        # Mean monthly value multiplied by the number of months gives the mean annual total.
+        return meteo.select(band).mean().multiply(12).rename(band)
+
+    return meteo.select(band).filter(ee.Filter.calendarRange(period, period, "month")).mean().rename(band)
+
+
+def tile_range(bounds, zoom):
+    """Returns the x and y ranges of the XYZ tiles covering bounds (west, south, east, north) at zoom."""
+    west, south, east, north = bounds
+    n = 2 ** zoom
+
+    def tile_x(lon):
+        return min(n - 1, max(0, int((lon + 180) / 360 * n)))
+
+    def tile_y(lat):
+        lat = max(min(lat, 85.0511), -85.0511)
+        y = (1 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2 * n
+        return min(n - 1, max(0, int(y)))
+
+    return range(tile_x(west), tile_x(east) + 1), range(tile_y(north), tile_y(south) + 1)
+
+
+def download_tile(url, path):
+    # Downloads a tile through the rate limiter, the tiles already in the store are skipped.
+    if os.path.exists(path):
+        return False
+
+    def fetch():
+        with urllib.request.urlopen(url, timeout=60) as response:
+            return response.read()
+
+    data = rate_limit.call(fetch, priority=rate_limit.BATCH)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Written to a temporary file first so that an interrupted run does not leave truncated tiles.
+    with open(path + ".tmp", "wb") as f:
+        f.write(data)
+    os.replace(path + ".tmp", path)
+    return True
+
+
+def generate_tiles(store, bounds, min_zoom=0, max_zoom=8, bands=("pr", "pet"),
+                   periods=("annual", *range(1, 13)), years=CLIMATOLOGY_YEARS):
+    """
+    Renders the climatology layers into the local tile store.
+    bounds: (west, south, east, north) of the operating region [in degrees]
+    Returns the number of tiles downloaded.
+    """
+    meteo = get_climatology_collection(years)
+    manifest = {"bounds": list(bounds), "min_zoom": min_zoom, "max_zoom": max_zoom, "years": list(years), "layers": {}}
+
+    downloaded = 0
+    with rate_limit.priority(rate_limit.BATCH), ThreadPoolExecutor(max_workers=DOWNLOAD_WORKERS) as executor:
+        for band in bands:
+            for period in periods:
+                name = layer_name(band, period)
+                vis_params = VIS_PARAMS[band]["annual" if period == "annual" else "monthly"]
+                url = layer_map.get_tile_url(climatology_image(meteo, band, period), vis_params, name)
+
+                futures = []
+                for z in range(min_zoom, max_zoom + 1):
+                    xs, ys = tile_range(bounds, z)
+                    for x in xs:
+                        for y in ys:
+                            tile_url = url.format(z=z, x=x, y=y)
+                            path = os.path.join(store, name, str(z), str(x), f"{y}.png")
+                            futures.append(executor.submit(download_tile, tile_url, path))
+                downloaded += sum(future.result() for future in futures)
+
+                manifest["layers"][name] = {"band": band, "period": period, "vis_params": vis_params}
+                logger.info(f"Climatology layer {name} written to {store}")
+
+    with open(os.path.join(store, MANIFEST), "w") as f:
+        json.dump(manifest, f, indent=2)
+
+    return downloaded
+
+
+def read_manifest(store):
+    """Returns the manifest of the tile store, or None if the store was not generated."""
+    try:
+        with open(os.path.join(store, MANIFEST)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+# ________________________________________________Tile server_________________________________________________
+
+class TileRequestHandler(SimpleHTTPRequestHandler):
+    """Serves the tiles of the store with long lived cache headers, missing tiles are 404."""
+
+    def end_headers(self):
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.send_header("Cache-Control", "public, max-age=86400")
+        super().end_headers()
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+
+def make_server(store, host="127.0.0.1", port=DEFAULT_TILE_PORT):
+    """Returns a threaded HTTP server serving the tile store."""
+    def handler(*args, **kwargs):
+        return TileRequestHandler(*args, directory=store, **kwargs)
+
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def static_url(store):
+    """
+    Returns the URL path of a store inside the static folder served by streamlit, or None if the store is
+    outside of it or the static file serving is disabled.
+    """
+    store = os.path.abspath(store)
+    if os.path.commonpath([store, STATIC_DIR]) != STATIC_DIR:
+        return None
+
+    import streamlit as st
+
+    if not st.get_option("server.enableStaticServing"):
+        logger.warning(f"The tile store {store} is not served, enable server.enableStaticServing")
+        return None
+    # Absolute path on the origin of the page, so it resolves the same from the iframe of the map.
+    base_path = st.get_option("server.baseUrlPath").strip("/")
+    relative = os.path.relpath(store, STATIC_DIR).replace(os.sep, "/")
+    return "/" + "/".join(part for part in (base_path, STATIC_URL_PATH, relative) if part)
+
+
+def get_local_layers():
+    """
+    Returns the climatology layers available in the tile store (GWR_TILE_STORE, static/climatology by
+    default), as a dict of layer name to (tile URL template, manifest entry). The tiles are served from
+    GWR_TILE_URL if set, otherwise by the static file serving of streamlit. When the store cannot be served
+    to the browser, the URLs are Earth Engine tile URLs of the same layers.
+    Returns an empty dict if no store was generated.
+    """
+    store = os.environ.get("GWR_TILE_STORE", DEFAULT_STORE)
+    manifest = read_manifest(store)
+    if manifest is None:
+        return {}
+
+    base_url = os.environ.get("GWR_TILE_URL") or static_url(store)
+    if base_url:
+        return {
+            name: (f"{base_url.rstrip('/')}/{name}/{{z}}/{{x}}/{{y}}.png", entry)
+            for name, entry in manifest["layers"].items()
+        }
+
+    logger.warning(f"The tile store {store} is not served to the browser, set GWR_TILE_URL to its public URL")
+    meteo = get_climatology_collection(manifest["years"])
+    return {
+        name: (layer_map.get_tile_url(climatology_image(meteo, entry["band"], entry["period"]), entry["vis_params"], name),
+               entry)
+        for name, entry in manifest["layers"].items()
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate or serve the climatology tile store.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    generate = subparsers.add_parser("generate")
+    generate.add_argument("--store", default=DEFAULT_STORE)
+    generate.add_argument("--bounds", type=float, nargs=4, required=True, metavar=("WEST", "SOUTH", "EAST", "NORTH"))
+    generate.add_argument("--zooms", type=int, nargs=2, default=(0, 8), metavar=("MIN", "MAX"))
+
+    serve = subparsers.add_parser("serve")
+    serve.add_argument("--store", required=True)
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=DEFAULT_TILE_PORT)
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    if args.command == "generate":
+        ee.Initialize()
+        count = generate_tiles(args.store, args.bounds, *args.zooms)
+        logger.info(f"{count} tiles downloaded to {args.store}")
+    else:
+        logger.info(f"Serving {args.store} on http://{args.host}:{args.port}")
+        make_server(args.store, args.host, args.port).serve_forever()
+
+
+if __name__ == "__main__":
+    main()
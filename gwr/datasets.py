@@ -0,0 +1,147 @@
+import os
+from datetime import date
+
+import ee
+
+'''
+    Registry of the Earth Engine datasets read by the gwr package.
+
+    Each dataset is described once: asset id, bands, scale factors, native resolution, temporal cadence and
+    period of availability. The getters of the other modules resolve their dataset through the registry:
+        - the asset id is resolved when the collection is built, and can be overridden with the
+          GWR_ASSET_<NAME> environment variable (e.g. to pin a version or use a mirror),
+        - the requested dates are clipped to the period of the dataset, and a request entirely outside of
+          it gives an empty collection built client-side, without any server-side filtering,
+        - a dataset is extracted at its native resolution when it is coarser than the requested scale
+          (see extraction_scale), instead of being oversampled into duplicated pixels.
+'''
+
+# Soil depths [in cm] of the OpenLandMap data and names of the associated bands.
+OLM_DEPTHS = [0, 10, 30, 60, 100, 200]
+OLM_BANDS = ["b" + str(sd) for sd in OLM_DEPTHS]
+
+
+class Dataset:
+    """
+    Description of an Earth Engine dataset.
+
+    name: (str) name of the dataset in the registry
+    asset_id: (str) default Earth Engine asset id
+    bands: (list) bands used by the package
+    scale_factors: (dict) factor converting each band into its physical unit
+    resolution: (int) native resolution [in m]
+    cadence: (str) temporal cadence ("daily", "3-day", "8-day") or "static" for an image
+    start_date, end_date: (date) period covered by the dataset, end_date excluded (None if still updated)
+    """
+
+    __slots__ = ("name", "asset_id", "bands", "scale_factors", "resolution", "cadence", "start_date", "end_date")
+
+    def __init__(self, name, asset_id, bands, scale_factors, resolution, cadence, start_date=None, end_date=None):
+        self.name = name
+        self.asset_id = asset_id
+        self.bands = list(bands)
+        self.scale_factors = dict(scale_factors)
+        self.resolution = resolution
+        self.cadence = cadence
+        self.start_date = start_date
+        self.end_date = end_date
+
+    def __repr__(self):
+        return f"Dataset({self.name!r}, {self.resolve_asset_id()!r}, cadence={self.cadence!r})"
+
+    @property
+    def is_static(self):
+        return self.cadence == "static"
+
+    def resolve_asset_id(self):
+        """Returns the asset id of the dataset, unless overridden with GWR_ASSET_<NAME>."""
+        return os.environ.get(f"GWR_ASSET_{self.name.upper()}", self.asset_id)
+
+    def clip_dates(self, start_date, end_date):
+        """
+        Clips the period [start_date, end_date) to the period of the dataset.
+        Returns the clipped (start_date, end_date), or None if the period is outside of the dataset.
+        """
+        if self.start_date is not None and start_date < self.start_date:
+            start_date = self.start_date
+        if self.end_date is not None and end_date > self.end_date:
+            end_date = self.end_date
+        return (start_date, end_date) if start_date < end_date else None
+
+    def covers(self, start_date, end_date):
+        """Returns True if the dataset has data in the period [start_date, end_date)."""
+        return self.is_static or self.clip_dates(start_date, end_date) is not None
+
+    def image(self):
+        """Returns the image of a static dataset, converted with the scale factor of its bands."""
+        image = ee.Image(self.resolve_asset_id()).select(self.bands)
+        factors = {self.scale_factors.get(band, 1) for band in self.bands}
+        if len(factors) == 1:
+            return image.multiply(factors.pop())
+        return image.multiply(ee.Image.constant([self.scale_factors.get(band, 1) for band in self.bands]))
+
+    def collection(self, start_date, end_date, bands=None):
+        """
+        Returns the collection of the bands (all the bands of the dataset by default) over the period clipped
+        to the dataset. The scale factors are not applied, as the resampling of the collections applies them.
+        """
+        bands = list(bands or self.bands)
+        period = self.clip_dates(start_date, end_date)
+        if period is None:
+            # Short-circuited client-side, the asset is not even loaded.
+            return ee.ImageCollection([])
+
+        return (
+            ee.ImageCollection(self.resolve_asset_id())
+                .select(bands)
+                .filterDate(period[0].strftime('%Y-%m-%d'), period[1].strftime('%Y-%m-%d'))
+        )
+
+
+REGISTRY = {
+    dataset.name: dataset for dataset in [
+        Dataset("chirps", "UCSB-CHG/CHIRPS/DAILY", ["precipitation"], {"precipitation": 1},
+                resolution=5566, cadence="daily", start_date=date(1981, 1, 1)),
+        # Collection 6.1 of MOD16A2, which replaces the deprecated MODIS/006/MOD16A2.
+        # PET is the sum over the 8-day composite in kg/m^2/8day with a scale factor of 0.1.
+        Dataset("mod16a2", "MODIS/061/MOD16A2", ["PET", "ET_QC"], {"PET": 0.1},
+                resolution=500, cadence="8-day", start_date=date(2001, 1, 1)),
+        Dataset("smap", "NASA_USDA/HSL/SMAP10KM_soil_moisture", ["ssm", "susm"], {"ssm": 1, "susm": 1},
+                resolution=10000, cadence="3-day", start_date=date(2015, 4, 2), end_date=date(2022, 8, 3)),
+        # Sand and clay fractions [%w] converted into kg/kg.
+        Dataset("sand", "OpenLandMap/SOL/SOL_SAND-WFRACTION_USDA-3A1A1A_M/v02", OLM_BANDS,
+                {band: 1 * 0.01 for band in OLM_BANDS}, resolution=250, cadence="static"),
+        Dataset("clay", "OpenLandMap/SOL/SOL_CLAY-WFRACTION_USDA-3A1A1A_M/v02", OLM_BANDS,
+                {band: 1 * 0.01 for band in OLM_BANDS}, resolution=250, cadence="static"),
+        # Organic carbon content [5 g/kg] converted into kg/kg.
+        Dataset("orgc", "OpenLandMap/SOL/SOL_ORGANIC-CARBON_USDA-6A1C_M/v02", OLM_BANDS,
+                {band: 5 * 0.001 for band in OLM_BANDS}, resolution=250, cadence="static"),
+    ]
+}
+
+
+def get(name):
+    """Returns the dataset registered under name."""
+    try:
+        return REGISTRY[name]
+    except KeyError:
+        raise ValueError(f"The dataset '{name}' is not registered, use one of {sorted(REGISTRY)}") from None
+
+
+def asset_ids(names=None):
+    """Returns the resolved asset ids of the datasets (all the registered datasets by default)."""
+    return [get(name).resolve_asset_id() for name in (names or REGISTRY)]
+
+
+def extraction_scale(names, scale):
+    """
+    Returns the scale [in m] at which the datasets are extracted together: the requested scale, or the
+    native resolution of the coarsest dataset if it is coarser, as sampling it more finely only returns
+    copies of the same pixels.
+    """
+    return max([scale] + [get(name).resolution for name in names])
+
+
+def covers(names, start_date, end_date):
+    """Returns True if all the datasets have data in the period [start_date, end_date)."""
+    return all(get(name).covers(start_date, end_date) for name in names)
@@ -1,16 +1,18 @@
-
 import pandas as pd
 import numpy as np
 import ee
 import logging
-import folium
+from gwr import instrumentation, rate_limit
 
 logger = logging.getLogger(__name__)
 
 
 def add_ee_layer(self, ee_image_object, vis_params, name):
     """Adds a method for displaying Earth Engine image tiles to folium map."""
-    map_id_dict = ee.Image(ee_image_object).getMapId(vis_params)
+    import folium
+
+    with instrumentation.span("getMapId", stage="map layer", method="getMapId", layer=name) as s:
+        map_id_dict = rate_limit.call(lambda: ee.Image(ee_image_object).getMapId(vis_params), span=s)
     folium.raster_layers.TileLayer(
         tiles=map_id_dict["tile_fetcher"].url_format,
         attr="Map Data &copy; <a href='https://earthengine.google.com/'>Google Earth Engine</a>",
@@ -20,8 +22,11 @@ def add_ee_layer(self, ee_image_object, vis_params, name):
     ).add_to(self)
 
 
-def ee_array_to_df(arr, list_of_bands):
-    """Transforms client-side ee.Image.getRegion array to pandas.DataFrame."""
+def ee_array_to_df(arr, list_of_bands, keep_coordinates=False):
+    """
+    Transforms client-side ee.Image.getRegion array to pandas.DataFrame.
+    With keep_coordinates the longitude and latitude of each sampled pixel are kept as columns.
+    """
     arr = np.array(arr) # convert list to numpy array
     df = pd.DataFrame(arr)
 
@@ -33,11 +38,16 @@ def ee_array_to_df(arr, list_of_bands):
     for band in list_of_bands:
         df[band] = pd.to_numeric(df[band], errors="coerce")
 
-    # Convert the time field into a datetime.
-    df["datetime"] = pd.to_datetime(df["time"], unit="ms")
+    # Convert the time field into a datetime (the array holds strings as the id column is a string).
+    df["datetime"] = pd.to_datetime(pd.to_numeric(df["time"]), unit="ms")
 
     # Keep the columns of interest.
-    df = df[["time", "datetime", *list_of_bands]]
+    if keep_coordinates:
+        df["longitude"] = pd.to_numeric(df["longitude"], errors="coerce")
+        df["latitude"] = pd.to_numeric(df["latitude"], errors="coerce")
+        df = df[["time", "datetime", "longitude", "latitude", *list_of_bands]]
+    else:
+        df = df[["time", "datetime", *list_of_bands]]
 
     # The datetime column is defined as index.
     df = df.set_index("datetime")
@@ -105,4 +115,80 @@ def sum_resampler(coll, freq, unit, scale_factor, band_name):
     # Transform the result into an ee.ImageCollection.
     res = ee.ImageCollection(res)
 
-    return res
\ No newline at end of file
+    return res
+
+
+def temporal_resampler(coll, freq, unit, aggregation, scale_factors=None, start_date=None):
+    """
+    This function resamples the time scale of a multi-band ee.ImageCollection in a single pass.
+    Each band is aggregated with its own method on each period of the selected frequency.
+
+    coll: (ee.ImageCollection) collection with the bands listed in aggregation
+    freq: (int) corresponds to the resampling frequence
+    unit: (str) corresponds to the resampling time unit.
+                must be 'day', 'month' or 'year'
+    aggregation: (dict) method used for each band, must be one of:
+                "mean" - mean of the images of the period (e.g. soil moisture state)
+                "sum"  - averaged sum: mean of the period multiplied by its number of days
+                         (e.g. daily fluxes like precipitation)
+                "last" - last valid value of the period
+    scale_factors: (dict) optional scaling factor of each band to get the value in the good unit
+    start_date: (str or ee.Date) optional start of the first period. Defaults to the date of the first
+                image, use the start of a month to get periods aligned on calendar months.
+    """
+    bands = list(aggregation.keys())
+    scale_factors = scale_factors or {}
+
+    for band, method in aggregation.items():
+        if method not in ("mean", "sum", "last"):
+            raise ValueError(f"The aggregation method '{method}' of the band '{band}' is not supported")
+
+    coll = coll.select(bands)
+
+    # Define initial and final dates of the collection.
+    if start_date is not None:
+        firstdate = ee.Date(start_date)
+    else:
+        firstdate = ee.Date(
+            coll.sort("system:time_start", True).first().get("system:time_start")
+        )
+
+    lastdate = ee.Date(
+        coll.sort("system:time_start", False).first().get("system:time_start")
+    )
+
+    # Calculate the time difference between both dates.
+    diff_dates = lastdate.difference(firstdate, unit)
+
+    # Define a new time index (for output).
+    new_index = ee.List.sequence(0, ee.Number(diff_dates).floor(), freq)
+
+    # Fully masked image used for the periods without any image.
+    empty = ee.Image.constant([0] * len(bands)).rename(bands).float().updateMask(0)
+
+    def apply_resampling(date_index):
+        startdate = firstdate.advance(ee.Number(date_index), unit)
+        enddate = firstdate.advance(ee.Number(date_index).add(freq), unit)
+        diff_days = enddate.difference(startdate, "day")
+
+        period = coll.filterDate(startdate, enddate)
+        mean = period.mean()
+        last = period.sort("system:time_start", True).mosaic()
+
+        composites = []
+        for band in bands:
+            method = aggregation[band]
+            if method == "mean":
+                composite = mean.select(band)
+            elif method == "sum":
+                composite = mean.select(band).multiply(diff_days)
+            else:
+                composite = last.select(band)
+            composites.append(composite.multiply(scale_factors.get(band, 1)).float().rename(band))
+
+        image = ee.Image(ee.Algorithms.If(period.size().gt(0), ee.Image.cat(composites), empty))
+
+        # Return the final image with the appropriate time index.
+        return image.set("system:time_start", startdate.millis())
+
+    return ee.ImageCollection(new_index.map(apply_resampling))
@@ -0,0 +1,416 @@
+import ast
+import csv
+import io
+import json
+import math
+import re
+
+import ee
+import numpy as np
+from gwr import cache
+
+'''
+    Ingestion of the region of interest.
+
+    The ROI can be given as GeoJSON (geometry, Feature or FeatureCollection), WKT, a list of coordinates
+    or an uploaded file containing one of these (or a CSV of longitude / latitude columns). It is parsed
+    into a normalized GeoJSON Point, Polygon or MultiPolygon:
+        - longitudes are brought back into [-180, 180] (e.g. -268 becomes 92), a geometry crossing the
+          antimeridian must be split into a MultiPolygon,
+        - rings are closed, oriented counter clockwise and start on their smallest vertex,
+        - coordinates are rounded to COORDINATE_DECIMALS,
+        - polygons with more than MAX_VERTICES vertices are simplified (Douglas-Peucker),
+        - self-intersecting rings are rejected,
+    so that the same region always gives the same geometry, hash and Earth Engine requests, and that the
+    server-side reductions are not slowed down by over-dense polygons.
+'''
+
+# Number of decimals kept for the coordinates (about 1 cm).
+COORDINATE_DECIMALS = 7
+
+# Maximum number of vertices of a polygon before it is simplified.
+MAX_VERTICES = 500
+
+SUPPORTED_TYPES = ("Point", "Polygon", "MultiPolygon")
+
+
+class GeometryError(ValueError):
+    """Raised when the region of interest cannot be parsed or is not a valid geometry."""
+
+
+# ___________________________________________________Parsing___________________________________________________
+
+def parse_wkt(text):
+    """Parses a WKT POINT, POLYGON or MULTIPOLYGON (Z values are dropped) into a GeoJSON geometry."""
+    match = re.fullmatch(r"\s*(POINT|POLYGON|MULTIPOLYGON)\s*(?:Z\s*|M\s*|ZM\s*)?(\(.*\))\s*", text,
+                         re.IGNORECASE | re.DOTALL)
+    if match is None:
+        raise GeometryError("Only WKT POINT, POLYGON and MULTIPOLYGON geometries are supported")
+
+    wkt_type, body = match.group(1).upper(), match.group(2)
+    number = r"[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?"
+
+    # Replace each position "x y [z]" by "[x, y]" and the parentheses by brackets to get JSON.
+    body = re.sub(rf"({number})\s+({number})(?:\s+{number})*", r"[\1, \2]", body)
+    body = body.replace("(", "[").replace(")", "]")
+    try:
+        coordinates = json.loads(body)
+    except json.JSONDecodeError as e:
+        raise GeometryError(f"Invalid WKT geometry: {e}") from e
+
+    if wkt_type == "POINT":
+        return {"type": "Point", "coordinates": coordinates[0]}
+    if wkt_type == "POLYGON":
+        return {"type": "Polygon", "coordinates": coordinates}
+    return {"type": "MultiPolygon", "coordinates": coordinates}
+
+
+def from_geojson(data):
+    """Returns the geometry of a GeoJSON geometry, Feature or FeatureCollection."""
+    geojson_type = data.get("type")
+    if geojson_type == "Feature":
+        return from_geojson(data.get("geometry") or {})
+    if geojson_type == "FeatureCollection":
+        geometries = [from_geojson(feature) for feature in data.get("features", [])]
+        if not geometries:
+            raise GeometryError("The FeatureCollection does not contain any feature")
+        return merge_geometries(geometries)
+    if geojson_type == "GeometryCollection":
+        return merge_geometries([from_geojson(geometry) for geometry in data.get("geometries", [])])
+    if geojson_type not in SUPPORTED_TYPES:
+        raise GeometryError(f"The geometry type '{geojson_type}' is not supported, use one of {SUPPORTED_TYPES}")
+
+    return {"type": geojson_type, "coordinates": data.get("coordinates")}
+
+
+def merge_geometries(geometries):
+    # Several features are merged into a single MultiPolygon (or kept as is if there is only one).
+    if len(geometries) == 1:
+        return geometries[0]
+
+    polygons = []
+    for geometry in geometries:
+        if geometry["type"] == "Polygon":
+            polygons.append(geometry["coordinates"])
+        elif geometry["type"] == "MultiPolygon":
+            polygons.extend(geometry["coordinates"])
+        else:
+            raise GeometryError("Only polygons can be combined into a single region of interest")
+
+    return {"type": "MultiPolygon", "coordinates": polygons}
+
+
+def from_coordinates(coordinates):
+    """
+    Builds a geometry from a list of coordinates:
+    [x, y] or [[x, y]] is a point, [[x, y], ...] a polygon exterior ring and [[[x, y], ...], ...]
+    a polygon with holes.
+    """
+    depth = 0
+    item = coordinates
+    while isinstance(item, (list, tuple)) and item:
+        depth += 1
+        item = item[0]
+
+    if depth == 1:
+        return {"type": "Point", "coordinates": list(coordinates)}
+    if depth == 2 and len(coordinates) == 1:
+        return {"type": "Point", "coordinates": list(coordinates[0])}
+    if depth == 2:
+        return {"type": "Polygon", "coordinates": [coordinates]}
+    if depth == 3:
+        return {"type": "Polygon", "coordinates": coordinates}
+    if depth == 4:
+        return {"type": "MultiPolygon", "coordinates": coordinates}
+
+    raise GeometryError("Please enter a non-empty list of [longitude, latitude] coordinates")
+
+
+def parse_text(text):
+    """Parses a GeoJSON, WKT or coordinate list string into a (not normalized) GeoJSON geometry."""
+    text = text.strip()
+    if not text:
+        raise GeometryError("Please enter a region of interest")
+
+    if text[0].isalpha():
+        return parse_wkt(text)
+
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError:
+        try:
+            # Python literals (e.g. tuples) are accepted for the coordinate lists.
+            data = ast.literal_eval(text)
+        except (ValueError, SyntaxError) as e:
+            raise GeometryError("The region of interest is neither GeoJSON, WKT nor a list of coordinates") from e
+
+    if isinstance(data, dict):
+        return from_geojson(data)
+    if isinstance(data, (list, tuple)):
+        return from_coordinates(data)
+
+    raise GeometryError("The region of interest is neither GeoJSON, WKT nor a list of coordinates")
+
+
+def parse_csv(text):
+    """Parses a CSV with longitude and latitude columns (lon/lng/x and lat/y) into a point or polygon."""
+    rows = list(csv.reader(io.StringIO(text)))
+    if not rows:
+        raise GeometryError("The CSV file is empty")
+
+    header = [name.strip().lower() for name in rows[0]]
+    lon_names, lat_names = ("longitude", "lon", "lng", "x"), ("latitude", "lat", "y")
+    if any(name in lon_names for name in header):
+        lon_col = next(header.index(name) for name in lon_names if name in header)
+        lat_col = next((header.index(name) for name in lat_names if name in header), None)
+        if lat_col is None:
+            raise GeometryError("The CSV file has a longitude column but no latitude column")
+        rows = rows[1:]
+    else:
+        lon_col, lat_col = 0, 1
+
+    try:
+        coordinates = [[float(row[lon_col]), float(row[lat_col])] for row in rows if row]
+    except (ValueError, IndexError) as e:
+        raise GeometryError(f"Invalid coordinates in the CSV file: {e}") from e
+
+    return from_coordinates(coordinates)
+
+
+def parse_file(name, data):
+    """
+    Parses an uploaded file (GeoJSON, WKT, CSV or text file with a coordinate list).
+    name: (str) file name, its extension selects the format
+    data: (bytes or str) content of the file
+    """
+    if isinstance(data, bytes):
+        data = data.decode("utf-8-sig")
+
+    if name.lower().endswith(".csv"):
+        return parse_csv(data)
+    return parse_text(data)
+
+
+# _________________________________________________Normalization________________________________________________
+
+def longitude_offset(points):
+    """
+    Returns the multiple of 360 degrees to add to the longitudes so that the geometry is within [-180, 180].
+    The whole geometry is shifted at once so that its shape is kept, a geometry which would still cross the
+    antimeridian is rejected.
+    """
+    west, east = points[:, 0].min(), points[:, 0].max()
+    offset = -360 * math.floor((west + 180) / 360)
+    if east + offset > 180:
+        raise GeometryError("The geometry crosses the antimeridian (180 degrees of longitude), "
+                            "split it into a MultiPolygon with a polygon on each side")
+    return offset
+
+
+def validate_points(points):
+    if points.ndim != 2 or points.shape[1] < 2:
+        raise GeometryError("Each position must have a longitude and a latitude")
+    if not np.all(np.isfinite(points[:, :2])):
+        raise GeometryError("The coordinates must be finite numbers")
+    if np.any(np.abs(points[:, 1]) > 90):
+        raise GeometryError("The latitudes must be within [-90, 90], check the order (longitude, latitude)")
+
+
+def signed_area(ring):
+    # Shoelace formula, positive for counter clockwise rings.
+    x, y = ring[:-1, 0], ring[:-1, 1]
+    return 0.5 * np.sum(x * np.roll(y, -1) - np.roll(x, -1) * y)
+
+
+def cross(u, v):
+    # z component of the cross product of the 2-D vector u with each 2-D vector of v.
+    return u[0] * v[..., 1] - u[1] * v[..., 0]
+
+
+def simplify_ring(ring, tolerance):
+    """Douglas-Peucker simplification of a closed ring, keeping at least 4 positions."""
+    points = ring[:-1]
+    keep = np.zeros(len(points), dtype=bool)
+    # The ring is split on its first vertex and the vertex the farthest from it.
+    far = int(np.argmax(np.sum((points - points[0]) ** 2, axis=1)))
+    keep[[0, far]] = True
+
+    stack = [(0, far), (far, len(points))]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+        a, b = points[start], points[end % len(points)]
+        segment = points[start + 1:end]
+        direction = b - a
+        length = np.hypot(*direction)
+        if length == 0:
+            distances = np.hypot(*(segment - a).T)
+        else:
+            distances = np.abs(cross(direction, segment - a)) / length
+        i = int(np.argmax(distances))
+        if distances[i] > tolerance:
+            keep[start + 1 + i] = True
+            stack.extend([(start, start + 1 + i), (start + 1 + i, end)])
+
+    # A ring keeps at least 3 vertices: the vertex the farthest from the line of the first two is added.
+    if np.count_nonzero(keep) < 3:
+        direction = points[far] - points[0]
+        distances = np.abs(cross(direction, points - points[0]))
+        distances[keep] = -1
+        keep[int(np.argmax(distances))] = True
+
+    kept = points[keep]
+    return np.vstack([kept, kept[:1]])
+
+
+def normalize_ring(ring, exterior):
+    ring = np.asarray(ring, dtype=np.float64)[:, :2]
+
+    # Close the ring.
+    if not np.array_equal(ring[0], ring[-1]):
+        ring = np.vstack([ring, ring[:1]])
+
+    # Remove the consecutive duplicated positions.
+    ring = ring[np.r_[True, np.any(np.diff(ring, axis=0) != 0, axis=1)]]
+    if len(ring) < 4:
+        raise GeometryError("A polygon needs at least 3 distinct vertices")
+    if signed_area(ring) == 0:
+        raise GeometryError("The polygon has no area, check the coordinates")
+
+    # Exterior rings are counter clockwise and holes clockwise (RFC 7946).
+    if (signed_area(ring) > 0) != exterior:
+        ring = ring[::-1]
+
+    # Start the ring on its smallest vertex so that the same ring always has the same coordinates.
+    points = ring[:-1]
+    start = np.lexsort((points[:, 1], points[:, 0]))[0]
+    points = np.roll(points, -start, axis=0)
+    return np.vstack([points, points[:1]])
+
+
+def crosses_itself(ring):
+    """Returns True if two non adjacent edges of the closed ring cross each other."""
+    starts, ends = ring[:-1], ring[1:]
+    directions = ends - starts
+
+    # side[i, j] is negative when the edge j has its two ends on both sides of the line of the edge i.
+    def position(points):
+        offsets = points[None, :, :] - starts[:, None, :]
+        return directions[:, None, 0] * offsets[..., 1] - directions[:, None, 1] * offsets[..., 0]
+
+    straddles = position(starts) * position(ends) < 0
+    # Two edges cross when each one straddles the other (adjacent edges share a vertex and never do).
+    return bool(np.any(straddles & straddles.T))
+
+
+def vertex_count(polygons):
+    return sum(len(ring) - 1 for polygon in polygons for ring in polygon)
+
+
+def simplify_polygons(polygons, max_vertices):
+    """
+    Simplifies the polygons with an increasing tolerance until they have at most max_vertices vertices.
+    Raises a GeometryError if the polygons cannot be simplified enough (e.g. too many triangles).
+    """
+    if vertex_count(polygons) <= max_vertices:
+        return polygons
+
+    all_points = np.vstack([ring for polygon in polygons for ring in polygon])
+    extent = max(np.ptp(all_points[:, 0]), np.ptp(all_points[:, 1]), 1e-9)
+    tolerance = 1e-6 * extent
+    simplified = polygons
+    while vertex_count(simplified) > max_vertices:
+        # Beyond the extent of the geometry every ring is already reduced to a triangle.
+        if tolerance > 2 * extent:
+            raise GeometryError(f"The region of interest cannot be simplified to {max_vertices} vertices "
+                                f"({vertex_count(simplified)} left), reduce its number of polygons")
+        simplified = [[simplify_ring(ring, tolerance) for ring in polygon] for polygon in polygons]
+        tolerance *= 2
+
+    return simplified
+
+
+def normalize(geometry, max_vertices=MAX_VERTICES):
+    """
+    Validates and normalizes a GeoJSON Point, Polygon or MultiPolygon geometry.
+    Returns a new GeoJSON geometry (see the module description).
+    """
+    geometry_type = geometry.get("type")
+    if geometry_type not in SUPPORTED_TYPES:
+        raise GeometryError(f"The geometry type '{geometry_type}' is not supported, use one of {SUPPORTED_TYPES}")
+
+    try:
+        if geometry_type == "Point":
+            polygons = [[np.asarray([geometry["coordinates"]], dtype=np.float64)]]
+        elif geometry_type == "Polygon":
+            polygons = [[np.asarray(ring, dtype=np.float64) for ring in geometry["coordinates"]]]
+        else:
+            polygons = [[np.asarray(ring, dtype=np.float64) for ring in polygon]
+                        for polygon in geometry["coordinates"]]
+    except (TypeError, ValueError) as e:
+        raise GeometryError(f"Invalid coordinates: {e}") from e
+
+    if not polygons or any(not polygon for polygon in polygons):
+        raise GeometryError("The geometry does not have any coordinates")
+    for polygon in polygons:
+        for ring in polygon:
+            validate_points(ring)
+
+    # Shift the whole geometry so that its longitudes are within [-180, 180].
+    offset = longitude_offset(np.vstack([ring for polygon in polygons for ring in polygon]))
+    polygons = [[ring[:, :2] + [offset, 0] for ring in polygon] for polygon in polygons]
+
+    if geometry_type == "Point":
+        point = np.round(polygons[0][0][0], COORDINATE_DECIMALS)
+        return {"type": "Point", "coordinates": point.tolist()}
+
+    polygons = [[normalize_ring(ring, exterior=i == 0) for i, ring in enumerate(polygon)] for polygon in polygons]
+    polygons = simplify_polygons(polygons, max_vertices)
+    if any(crosses_itself(ring) for polygon in polygons for ring in polygon):
+        raise GeometryError("A polygon ring crosses itself, check the order of its vertices")
+    coordinates = [[np.round(ring, COORDINATE_DECIMALS).tolist() for ring in polygon] for polygon in polygons]
+
+    if geometry_type == "Polygon":
+        return {"type": "Polygon", "coordinates": coordinates[0]}
+    # The polygons of a MultiPolygon are sorted so that their order does not change the hash.
+    return {"type": "MultiPolygon", "coordinates": sorted(coordinates)}
+
+
+def geometry_hash(geometry):
+    """Returns the canonical hash of a normalized geometry, used as cache key of the region of interest."""
+    return cache.fingerprint("geometry", geometry)
+
+
+# ___________________________________________________Entry points________________________________________________
+
+def parse(value, max_vertices=MAX_VERTICES):
+    """
+    Parses and normalizes a region of interest given as a GeoJSON dict or string, a WKT string
+    or a list of coordinates.
+    Returns the normalized GeoJSON geometry, raises a GeometryError if it is invalid.
+    """
+    if isinstance(value, dict):
+        geometry = from_geojson(value)
+    elif isinstance(value, (list, tuple)):
+        geometry = from_coordinates(value)
+    elif isinstance(value, str):
+        geometry = parse_text(value)
+    else:
+        raise GeometryError(f"Unsupported region of interest of type {type(value).__name__}")
+
+    return normalize(geometry, max_vertices)
+
+
+def parse_upload(uploaded_file, max_vertices=MAX_VERTICES):
+    """Parses and normalizes the region of interest of a file uploaded with st.file_uploader."""
+    return normalize(parse_file(uploaded_file.name, uploaded_file.getvalue()), max_vertices)
+
+
+def to_ee(geometry):
+    """Converts a normalized GeoJSON geometry into an ee.Geometry."""
+    if geometry["type"] == "Point":
+        return ee.Geometry.Point(geometry["coordinates"])
+    if geometry["type"] == "Polygon":
+        return ee.Geometry.Polygon(geometry["coordinates"])
+    return ee.Geometry.MultiPolygon(geometry["coordinates"])
@@ -3,6 +3,18 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+# Pedotransfer functions of Saxton & Rawls (2006) giving the wilting point and the field capacity from the
+# sand (S), clay (C) and organic matter (OM) contents. They are part of the provenance of the results.
+PEDOTRANSFER_EXPRESSIONS = {
+    "T1500ti": "-0.024 * S + 0.487 * C + 0.006 * OM + 0.005 * (S * OM)"
+               " - 0.013 * (C * OM) + 0.068 * (S * C) + 0.031",
+    "wpi": "T1500ti + ( 0.14 * T1500ti - 0.002)",
+    "T33ti": "-0.251 * S + 0.195 * C + 0.011 * OM +"
+             " 0.006 * (S * OM) - 0.027 * (C * OM)+"
+             " 0.452 * (S * C) + 0.299",
+    "fci": "T33ti + (1.283 * T33ti * T33ti - 0.374 * T33ti - 0.015)",
+}
+
 
 def compute_hyrdo_properties(sand, clay, orgm, olm_bands):
     wilting_point = ee.Image(0)
@@ -20,8 +32,7 @@ def compute_hyrdo_properties(sand, clay, orgm, olm_bands):
         theta_1500ti = (
             ee.Image(0)
             .expression(
-                "-0.024 * S + 0.487 * C + 0.006 * OM + 0.005 * (S * OM)\
-            - 0.013 * (C * OM) + 0.068 * (S * C) + 0.031",
+                PEDOTRANSFER_EXPRESSIONS["T1500ti"],
                 {
                     "S": si,
                     "C": ci,
@@ -33,7 +44,7 @@ def compute_hyrdo_properties(sand, clay, orgm, olm_bands):
 
         # Final expression for the wilting point.
         wpi = theta_1500ti.expression(
-            "T1500ti + ( 0.14 * T1500ti - 0.002)", {"T1500ti": theta_1500ti}
+            PEDOTRANSFER_EXPRESSIONS["wpi"], {"T1500ti": theta_1500ti}
         ).rename("wpi")
 
         # Add as a new band of the global wilting point ee.Image.
@@ -45,9 +56,7 @@ def compute_hyrdo_properties(sand, clay, orgm, olm_bands):
         theta_33ti = (
             ee.Image(0)
             .expression(
-                "-0.251 * S + 0.195 * C + 0.011 * OM +\
-            0.006 * (S * OM) - 0.027 * (C * OM)+\
-            0.452 * (S * C) + 0.299",
+                PEDOTRANSFER_EXPRESSIONS["T33ti"],
                 {
                     "S": si,
                     "C": ci,
@@ -60,7 +69,7 @@ def compute_hyrdo_properties(sand, clay, orgm, olm_bands):
         # Final expression for the field capacity of the soil.
         # Final expression for the field capacity of the soil.
         fci = theta_33ti.expression(
-            "T33ti + (1.283 * T33ti * T33ti - 0.374 * T33ti - 0.015)",
+            PEDOTRANSFER_EXPRESSIONS["fci"],
             {"T33ti": theta_33ti.select("T33ti")},
         )
 
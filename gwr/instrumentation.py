@@ -0,0 +1,330 @@
+import json
+import logging
+import math
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+'''
+    Timing and payload instrumentation of the calls made to the Earth Engine backend.
+
+    Every backend call is wrapped in a span recording the stage of the pipeline it belongs to,
+    the asset(s) it reads, the ROI area, the scale, the date range, the elapsed time, the size
+    of the response and the number of retries. Finished spans are logged and kept in memory so
+    that they can be exported as OpenTelemetry-style JSON or as Prometheus metrics.
+
+    After each run of the page, export_files writes the Prometheus metrics to GWR_METRICS_FILE (e.g. a
+    .prom file of the node_exporter textfile collector) and the traces to GWR_TRACES_FILE, when set.
+'''
+
+# Maximum number of finished spans kept in memory for the JSON export.
+MAX_SPANS = 5000
+
+# Method of the spans of the page sections, which contain the spans of their Earth Engine calls.
+SECTION_METHOD = "section"
+
+_spans = deque(maxlen=MAX_SPANS)
+_metrics = {}
+_gauges = {}
+_lock = threading.Lock()
+_local = threading.local()
+
+
+class Span:
+    """A timed unit of work, usually a single call to the Earth Engine backend."""
+
+    def __init__(self, name, parent=None, attributes=None):
+        self.name = name
+        self.trace_id = parent.trace_id if parent is not None else os.urandom(16).hex()
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent.span_id if parent is not None else None
+        self.attributes = dict(attributes or {})
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.status = "OK"
+        self.error = None
+
+    @property
+    def elapsed(self):
+        """Elapsed time of the span in seconds."""
+        end_ns = self.end_ns if self.end_ns is not None else time.time_ns()
+        return (end_ns - self.start_ns) / 1e9
+
+    def set(self, key, value):
+        self.attributes[key] = value
+
+    def record_response(self, payload):
+        """Records the size in bytes of the (JSON serialisable) response of a backend call."""
+        try:
+            self.attributes["response_bytes"] = len(json.dumps(payload, separators=(",", ":")))
+        except (TypeError, ValueError):
+            self.attributes["response_bytes"] = None
+
+    def add_retry(self):
+        self.attributes["retries"] = self.attributes.get("retries", 0) + 1
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_ns": self.start_ns,
+            "end_ns": self.end_ns,
+            "elapsed": round(self.elapsed, 6),
+            "status": self.status,
+            "error": self.error,
+            "attributes": self.attributes,
+        }
+
+
+def current_span():
+    """Returns the innermost open span of the calling thread, if any."""
+    stack = getattr(_local, "stack", None)
+    return stack[-1] if stack else None
+
+
+@contextmanager
+def span(name, **attributes):
+    """
+    Context manager timing the enclosed block.
+    Spans opened inside the block (in the same thread) are recorded as children of this one.
+
+    name: (str) name of the stage or of the backend method called
+    attributes: stage, asset_id, roi, scale, date_range, method... ROI geometries are
+                converted to their area in km² (roi_area_km2).
+    """
+    parent = attributes.pop("parent", None) or current_span()
+
+    roi = attributes.pop("roi", None)
+    if roi is not None:
+        attributes["roi_area_km2"] = roi_area_km2(roi)
+
+    date_range = attributes.get("date_range")
+    if date_range is not None and not isinstance(date_range, str):
+        attributes["date_range"] = "/".join(str(d) for d in date_range)
+
+    attributes.setdefault("retries", 0)
+
+    s = Span(name, parent, attributes)
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+    stack.append(s)
+    try:
+        yield s
+    except Exception as e:
+        s.status = "ERROR"
+        s.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        s.end_ns = time.time_ns()
+        stack.pop()
+        _finish(s)
+
+
+def _finish(s):
+    with _lock:
+        _spans.append(s)
+        labels = (s.name, s.attributes.get("stage", ""), s.attributes.get("method", ""))
+        metric = _metrics.setdefault(labels, {"count": 0, "errors": 0, "seconds": 0.0,
+                                              "bytes": 0, "retries": 0})
+        metric["count"] += 1
+        metric["seconds"] += s.elapsed
+        metric["bytes"] += s.attributes.get("response_bytes") or 0
+        metric["retries"] += s.attributes.get("retries", 0)
+        if s.status != "OK":
+            metric["errors"] += 1
+
+    logger.info("span %s", json.dumps(s.to_dict(), default=str))
+
+
+def roi_area_km2(roi):
+    """
+    Approximates the area in km² of a client-side ee.Geometry (or GeoJSON dict) without
+    calling the backend. Returns None for computed geometries whose coordinates are not
+    known client-side.
+    """
+    try:
+        geojson = roi if isinstance(roi, dict) else roi.toGeoJSON()
+    except Exception:
+        return None
+
+    geometry_type = geojson.get("type")
+    coordinates = geojson.get("coordinates")
+    if geometry_type == "Polygon":
+        polygons = [coordinates]
+    elif geometry_type == "MultiPolygon":
+        polygons = coordinates
+    else:
+        # Points and lines have no area.
+        return 0.0
+
+    area = 0.0
+    for rings in polygons:
+        area += _ring_area_km2(rings[0])
+        for hole in rings[1:]:
+            area -= _ring_area_km2(hole)
+    return round(area, 3)
+
+
+def _ring_area_km2(ring):
+    # Spherical excess approximation of the area of a ring of [lon, lat] coordinates.
+    radius = 6371.0088
+    area = 0.0
+    for (lon1, lat1), (lon2, lat2) in zip(ring, ring[1:] + ring[:1]):
+        area += math.radians(lon2 - lon1) * (2 + math.sin(math.radians(lat1)) + math.sin(math.radians(lat2)))
+    return abs(area * radius * radius / 2.0)
+
+
+def set_gauge(name, value, description="", **labels):
+    """Sets the current value of a gauge metric (e.g. a queue depth) exported with the span metrics."""
+    with _lock:
+        _gauges[(name, tuple(sorted(labels.items())))] = (value, description)
+
+
+def get_gauge(name, **labels):
+    with _lock:
+        item = _gauges.get((name, tuple(sorted(labels.items()))))
+    return None if item is None else item[0]
+
+
+def get_spans():
+    """Returns the finished spans kept in memory, oldest first."""
+    with _lock:
+        return list(_spans)
+
+
+def reset():
+    """Forgets all the finished spans and metrics."""
+    with _lock:
+        _spans.clear()
+        _metrics.clear()
+        _gauges.clear()
+
+
+def export_otel_json(service_name="gwr"):
+    """
+    Exports the finished spans in the OpenTelemetry (OTLP/JSON) trace format.
+    """
+    def attribute(key, value):
+        if isinstance(value, bool):
+            return {"key": key, "value": {"boolValue": value}}
+        if isinstance(value, int):
+            return {"key": key, "value": {"intValue": str(value)}}
+        if isinstance(value, float):
+            return {"key": key, "value": {"doubleValue": value}}
+        return {"key": key, "value": {"stringValue": str(value)}}
+
+    spans = []
+    for s in get_spans():
+        spans.append({
+            "traceId": s.trace_id,
+            "spanId": s.span_id,
+            "parentSpanId": s.parent_id or "",
+            "name": s.name,
+            "kind": 3,  # SPAN_KIND_CLIENT
+            "startTimeUnixNano": str(s.start_ns),
+            "endTimeUnixNano": str(s.end_ns),
+            "attributes": [attribute(k, v) for k, v in s.attributes.items() if v is not None],
+            "status": {"code": 1 if s.status == "OK" else 2, "message": s.error or ""},
+        })
+
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": [attribute("service.name", service_name)]},
+            "scopeSpans": [{"scope": {"name": __name__}, "spans": spans}],
+        }]
+    }
+
+
+def write_otel_json(path, service_name="gwr"):
+    """Writes the OpenTelemetry-style JSON export of the finished spans to a file."""
+    _write_atomic(path, json.dumps(export_otel_json(service_name)))
+
+
+def write_prometheus(path):
+    """Writes the Prometheus metrics to a file, e.g. for the textfile collector of node_exporter."""
+    _write_atomic(path, export_prometheus())
+
+
+def export_files():
+    """
+    Writes the metrics to GWR_METRICS_FILE and the traces to GWR_TRACES_FILE, when these environment
+    variables are set. Called after each run of the page, the files always hold the latest state.
+    """
+    metrics_path = os.environ.get("GWR_METRICS_FILE")
+    traces_path = os.environ.get("GWR_TRACES_FILE")
+    try:
+        if metrics_path:
+            write_prometheus(metrics_path)
+        if traces_path:
+            write_otel_json(traces_path)
+    except OSError as e:
+        logger.warning(f"Unable to export the metrics: {e}")
+
+
+def _write_atomic(path, text):
+    # Written to a temporary file first so that a scraper never reads a partial file.
+    with open(path + ".tmp", "w") as f:
+        f.write(text)
+    os.replace(path + ".tmp", path)
+
+
+def export_prometheus():
+    """
+    Exports the aggregated metrics of the finished spans in the Prometheus text exposition format.
+    """
+    metrics = [
+        ("gwr_ee_calls_total", "counter", "Number of Earth Engine calls.", "count"),
+        ("gwr_ee_call_errors_total", "counter", "Number of failed Earth Engine calls.", "errors"),
+        ("gwr_ee_call_duration_seconds_total", "counter", "Total time spent in Earth Engine calls.", "seconds"),
+        ("gwr_ee_response_bytes_total", "counter", "Total size of the Earth Engine responses.", "bytes"),
+        ("gwr_ee_call_retries_total", "counter", "Number of retried Earth Engine calls.", "retries"),
+    ]
+    # The section spans are exported separately, counting them as calls would count their calls twice.
+    section_metrics = [
+        ("gwr_section_runs_total", "counter", "Number of page section extractions.", "count"),
+        ("gwr_section_errors_total", "counter", "Number of failed page section extractions.", "errors"),
+        ("gwr_section_duration_seconds_total", "counter", "Total time spent in page section extractions.", "seconds"),
+    ]
+
+    with _lock:
+        snapshot = {labels: dict(values) for labels, values in _metrics.items()}
+        gauges = dict(_gauges)
+
+    calls = {labels: values for labels, values in snapshot.items() if labels[2] != SECTION_METHOD}
+    sections = {labels: values for labels, values in snapshot.items() if labels[2] == SECTION_METHOD}
+
+    lines = []
+    for metric_name, metric_type, description, field in metrics:
+        lines.append(f"# HELP {metric_name} {description}")
+        lines.append(f"# TYPE {metric_name} {metric_type}")
+        for (name, stage, method), values in sorted(calls.items()):
+            labels = f'name="{_escape(name)}",stage="{_escape(stage)}",method="{_escape(method)}"'
+            lines.append(f"{metric_name}{{{labels}}} {values[field]}")
+
+    for metric_name, metric_type, description, field in section_metrics:
+        lines.append(f"# HELP {metric_name} {description}")
+        lines.append(f"# TYPE {metric_name} {metric_type}")
+        for (name, _, _), values in sorted(sections.items()):
+            lines.append(f'{metric_name}{{section="{_escape(name)}"}} {values[field]}')
+
+    described = set()
+    for (metric_name, labels), (value, description) in sorted(gauges.items()):
+        if metric_name not in described:
+            lines.append(f"# HELP {metric_name} {description}")
+            lines.append(f"# TYPE {metric_name} gauge")
+            described.add(metric_name)
+        labels = ",".join(f'{key}="{_escape(label)}"' for key, label in labels)
+        lines.append(f"{metric_name}{{{labels}}} {value}" if labels else f"{metric_name} {value}")
+
+    return "\n".join(lines) + "\n"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
@@ -0,0 +1,198 @@
+import os
+import threading
+
+import ee
+from gwr import cache, instrumentation, rate_limit, ui_visuals
+
+'''
+    Map rendering with a persistent Leaflet component.
+
+    Instead of serializing a folium map (tiles, layer control, colorbars) into a new HTML iframe on every
+    rerun, a map is described by a list of layer descriptors (name, tile URL template, opacity, visibility)
+    and legends, sent as JSON to a streamlit component. The component keeps its Leaflet map between reruns,
+    only adds / removes / updates the layers whose descriptor changed, and the browser fetches the tiles
+    directly from Earth Engine.
+
+    The tile URL of a layer is obtained once with getMapId and cached for TILE_URL_TTL seconds. The colorbar
+    image of a legend is only sent the first time the component displays it, the component keeps the images
+    by legend id.
+'''
+
+FRONTEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "layer_map_frontend")
+
+ATTRIBUTION = "Map Data &copy; <a href='https://earthengine.google.com/'>Google Earth Engine</a>"
+
+# Time to live of the cached tile URLs [in seconds], shorter than the validity of the Earth Engine map ids.
+TILE_URL_TTL = 4 * 3600
+
+_tile_url_cache = None
+_component = None
+_lock = threading.Lock()
+
+
+def get_tile_url_cache():
+    """Returns the cache of the tile URLs, sharing the backend of the result cache with a shorter time to live."""
+    global _tile_url_cache
+    with _lock:
+        if _tile_url_cache is None:
+            _tile_url_cache = cache.ResultCache(cache.get_cache().backend, ttl=TILE_URL_TTL)
+        return _tile_url_cache
+
+
+def get_tile_url(ee_object, vis_params, name):
+    """
+    Returns the XYZ tile URL template of an image (or of the mosaic of a collection) with the given
+    visualization parameters.
+    """
+    if isinstance(ee_object, ee.ImageCollection):
+        ee_object = ee_object.mosaic()
+    image = ee.Image(ee_object)
+
+    def compute():
+        with instrumentation.span("getMapId", stage="map layer", method="getMapId", layer=name) as s:
+            map_id = rate_limit.call(lambda: image.getMapId(vis_params), span=s)
+        return map_id["tile_fetcher"].url_format
+
+    key = cache.fingerprint("getMapId", image.serialize(), vis_params)
+    return get_tile_url_cache().get_or_compute(key, compute)
+
+
+def tile_layer(ee_object, vis_params, name, visible=True, opacity=1.0):
+    """Returns the descriptor of an Earth Engine tile layer."""
+    return {
+        "id": name,
+        "name": name,
+        "url": get_tile_url(ee_object, vis_params, name),
+        "attribution": ATTRIBUTION,
+        "visible": visible,
+        "opacity": opacity,
+    }
+
+
+def legend(vis_params, label):
+    """
+    Returns the descriptor of a colorbar legend for the min, max and palette of vis_params, identified by
+    a hash of the colormap. The colorbar image is added by render when the component does not have it yet.
+    """
+    palette = list(vis_params["palette"])
+    return {
+        "id": cache.fingerprint("legend", palette, vis_params["min"], vis_params["max"], label),
+        "label": label,
+        "min": vis_params["min"],
+        "max": vis_params["max"],
+        "palette": palette,
+    }
+
+
+def with_images(legends, sent):
+    """
+    Returns the legend descriptors with the colorbar image (a data URI rendered once per process, see
+    ui_visuals.colorbar_png) of the legends whose id is not in sent.
+    """
+    return [
+        legend if legend["id"] in sent else dict(legend, image=ui_visuals.colorbar_data_uri(
+            legend["palette"], legend["min"], legend["max"], legend["label"]))
+        for legend in legends
+    ]
+
+
+class LayerMap:
+    """
+    Descriptors of the layers and legends of a map.
+    Layers are drawn in the order in which they are added (the last one on top).
+    """
+
+    def __init__(self, center=(20, 0), zoom=3):
+        self.center = list(center)
+        self.zoom = zoom
+        self.layers = []
+        self.legends = []
+
+    def add_layer(self, ee_object, vis_params, name, visible=True, opacity=1.0):
+        self.layers.append(tile_layer(ee_object, vis_params, name, visible, opacity))
+
+    def add_tile_layer(self, url, name, visible=True, opacity=1.0, attribution=ATTRIBUTION):
+        """Adds a layer of precomputed tiles (e.g. from the climatology tile store) given its URL template."""
+        self.layers.append({
+            "id": name, "name": name, "url": url, "attribution": attribution, "visible": visible, "opacity": opacity,
+        })
+
+    def add_legend(self, vis_params, label):
+        self.legends.append(legend(vis_params, label))
+
+    def to_dict(self):
+        return {"center": self.center, "zoom": self.zoom, "layers": self.layers, "legends": self.legends}
+
+
+def get_component():
+    """Declares the streamlit component once per process."""
+    global _component
+    with _lock:
+        if _component is None:
+            import streamlit.components.v1 as components
+            _component = components.declare_component("gwr_layer_map", path=FRONTEND_DIR)
+        return _component
+
+
+def component_key(name):
+    return f"gwr_layer_map:{name}"
+
+
+def render(layer_map, name, height=600):
+    """
+    Renders the map with the layer map component (must be called from the streamlit script thread).
+    The component is given a stable key and rendered once per run at the same position of the page: on a
+    rerun it keeps its Leaflet map and only applies the changes of the descriptors, and the colorbar images
+    it already received are not sent again.
+    """
+    import streamlit as st
+
+    key = component_key(name)
+    legends_key = f"{key}:legends"
+    # The component state is dropped when it was not rendered in the previous run, it is then mounted again
+    # without any image.
+    sent = st.session_state.get(legends_key, set()) if key in st.session_state else set()
+
+    descriptors = layer_map.to_dict()
+    descriptors["legends"] = with_images(layer_map.legends, sent)
+    st.session_state[legends_key] = sent | {legend["id"] for legend in layer_map.legends}
+    return get_component()(height=height, key=key, default=None, **descriptors)
+
+
+class MapPlaceholder:
+    """
+    Placeholder of a map section: a container of the map component followed by a status line.
+    The container is not written to before the new descriptors are available, so the component rendered
+    in it on the previous run stays mounted. The messages (loading, errors) are displayed in the status line.
+    """
+
+    def __init__(self, container, status):
+        self.container = container
+        self.status = status
+
+    def __getattr__(self, attr):
+        # info, warning, error... are written to the status line.
+        return getattr(self.status, attr)
+
+
+def map_placeholder(name, message, height=600):
+    """
+    Returns the placeholder of a map section, displaying the loading message until the map is rendered.
+    If the map was already rendered in this session, its component is left untouched until render_into.
+    """
+    import streamlit as st
+
+    container = st.container()
+    status = st.empty()
+    if component_key(name) in st.session_state:
+        status.caption(message)
+    else:
+        status.info(message)
+    return MapPlaceholder(container, status)
+
+
+def render_into(placeholder, name, layer_map, height=600):
+    """Renders the map into its placeholder (a MapPlaceholder) and clears the status line."""
+    with placeholder.container:
+        render(layer_map, name, height)
+    placeholder.status.empty()
@@ -1,24 +1,23 @@
+from datetime import timedelta
+
 import ee
-from gwr import ee_utils
-import geemap.foliumap as geemap
+from gwr import cache, datasets, ee_utils, results
+
+PRECIPITATION_DATASET = "chirps"
+POTENTIAL_EVAPORATION_DATASET = "mod16a2"
 
+# Number of days of a MOD16A2 composite and scale factor from its PET band to mm per day.
+PET_COMPOSITE_DAYS = 8
+PET_DAILY_SCALE_FACTOR = datasets.get(POTENTIAL_EVAPORATION_DATASET).scale_factors["PET"] / PET_COMPOSITE_DAYS
 
 
 def get_precipitation_data_for_dates(start_date, end_date):
-    return (
-        ee.ImageCollection("UCSB-CHG/CHIRPS/DAILY")
-            .select("precipitation")
-            .filterDate(start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d'))
-    )
+    return datasets.get(PRECIPITATION_DATASET).collection(start_date, end_date, ["precipitation"])
 
 
 def get_potential_evaporation_for_dates(start_date, end_date):
     # Import potential evaporation PET and its quality indicator ET_QC.
-    return (
-        ee.ImageCollection("MODIS/006/MOD16A2")
-            .select(["PET", "ET_QC"])
-            .filterDate(start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d'))
-    )
+    return datasets.get(POTENTIAL_EVAPORATION_DATASET).collection(start_date, end_date, ["PET", "ET_QC"])
 
 
 def get_mean_monthly_meteorological_data(start_date, end_date):
@@ -26,7 +25,10 @@ def get_mean_monthly_meteorological_data(start_date, end_date):
     Returns an ImageCollection that combines the Precipitation and Potential Evaporation data
     for a region across a time period resampled to provide monthly mean values
     """
-    
+    # Short-circuit the periods without data instead of resampling empty collections.
+    if not datasets.covers([PRECIPITATION_DATASET, POTENTIAL_EVAPORATION_DATASET], start_date, end_date):
+        return ee.ImageCollection([])
+
     pr = get_precipitation_data_for_dates(start_date, end_date)
     pet = get_potential_evaporation_for_dates(start_date, end_date)
 
@@ -34,7 +36,7 @@ def get_mean_monthly_meteorological_data(start_date, end_date):
     pr_m = ee_utils.sum_resampler(pr, 1, "month", 1, "pr")
 
     # Apply the resampling function to the PET dataset.
-    pet_m = ee_utils.sum_resampler(pet.select("PET"), 1, "month", 0.0125, "pet")
+    pet_m = ee_utils.sum_resampler(pet.select("PET"), 1, "month", PET_DAILY_SCALE_FACTOR, "pet")
 
     # Combine precipitation and evapotranspiration.
     meteo = pr_m.combine(pet_m)
@@ -44,21 +46,56 @@ def get_mean_monthly_meteorological_data(start_date, end_date):
 
 
 
-def get_mean_monthly_meteorological_data_for_roi_df(roi, scale, meteoImageCollection, ):
+def get_daily_meteorological_data(start_date, end_date):
+    """
+    Returns an ImageCollection with one image per day and the bands pr and pet in mm per day.
+    The pet of a day is the PET of the 8-day MODIS composite covering it spread evenly over the composite.
+    """
+    pr = get_precipitation_data_for_dates(start_date, end_date).select(["precipitation"], ["pr"])
+    # The composite covering the first day can start up to 7 days before it.
+    pet = get_potential_evaporation_for_dates(
+        start_date - timedelta(days=PET_COMPOSITE_DAYS - 1), end_date).select("PET")
+
+    # Join each day to the latest composite started at most 7 days before it.
+    join = ee.Join.saveFirst(matchKey="pet", ordering="system:time_start", ascending=False, outer=True)
+    covering_filter = ee.Filter.And(
+        ee.Filter.maxDifference(
+            difference=(PET_COMPOSITE_DAYS - 1) * 24 * 3600 * 1000,
+            leftField="system:time_start",
+            rightField="system:time_start",
+        ),
+        ee.Filter.greaterThanOrEquals(leftField="system:time_start", rightField="system:time_start"),
+    )
+    joined = join.apply(pr, pet, covering_filter)
+
+    # Placeholder used for the days without PET composite.
+    no_pet = ee.Image.constant(0).rename("PET").float().updateMask(0)
+
+    def add_pet_band(image):
+        image = ee.Image(image)
+        composite = ee.Image(ee.Algorithms.If(image.get("pet"), image.get("pet"), no_pet))
+        daily_pet = composite.select("PET").multiply(PET_DAILY_SCALE_FACTOR).float().rename("pet")
+        return image.select("pr").float().addBands(daily_pet)
+
+    return ee.ImageCollection(joined.map(add_pet_band))
+
+
+def get_mean_monthly_meteorological_data_for_roi(roi, scale, meteoImageCollection):
+    """
+    Returns a MonthlySeries with the columns mean-pr and mean-pet: the mean across the ROI
+    of the monthly precipitation and potential evaporation.
+    """
     # Import meteorological data as an array at the location of interest.
-    meteo_arr = meteoImageCollection.getRegion(roi, scale).getInfo()
+    meteo_arr = cache.get_info(
+        meteoImageCollection.getRegion(roi, scale), "getRegion", stage="meteo", method="getRegion",
+        asset_id=",".join(datasets.asset_ids([PRECIPITATION_DATASET, POTENTIAL_EVAPORATION_DATASET])), roi=roi, scale=scale)
 
-    # Transform the array into a pandas dataframe and sort the index.
     # Data for ROI may have multiple sample points within ROI for a date so group by date and take the mean
-    # To avoid loosing the datetime and time fields (used elswhere), group by both then remove time from the index
-    meteo_df = ee_utils.ee_array_to_df(meteo_arr, ["pr", "pet"]).groupby(['datetime', 'time']).mean(
-        ['pr', 'pet']).sort_values("datetime")
-    meteo_df.reset_index(level='time', inplace=True)
-    meteo_df.rename(columns={'pr': 'mean-pr'}, inplace=True)
-    meteo_df.rename(columns={'pet': 'mean-pet'}, inplace=True)
-    meteo_df["date"] = meteo_df.index.strftime("%m-%Y")
-
-    return meteo_df
+    return results.region_to_monthly_series(meteo_arr, ["pr", "pet"], roi=roi, scale=scale, dataset="meteo")
+
+
+def get_mean_monthly_meteorological_data_for_roi_df(roi, scale, meteoImageCollection):
+    return get_mean_monthly_meteorological_data_for_roi(roi, scale, meteoImageCollection).to_frame()
 
 
 
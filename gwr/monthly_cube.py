@@ -0,0 +1,87 @@
+import ee
+import numpy as np
+import pandas as pd
+from gwr import recharge_properties, results
+
+'''
+    Fused monthly cube of the meteorological, recharge and soil moisture data.
+
+    The recharge collection already carries the monthly precipitation and potential evapotranspiration
+    used by the water balance model, the monthly SMAP soil moisture is joined to it on the month so that
+    all the monthly tables of the page are column selections of a single extraction instead of one
+    getRegion call per dataset.
+'''
+
+METEO_BANDS = ["pr", "pet"]
+RECHARGE_BANDS = ["pr", "pet", "apwl", "st", "rech"]
+SMAP_BANDS = ["ssm", "susm"]
+CUBE_BANDS = ["pr", "pet", "apwl", "st", "rech", "ssm", "susm"]
+
+
+def set_month_key(image):
+    # The month of the image is used as join key as the collections do not start on the same day.
+    return image.set("month", image.date().format("YYYY-MM"))
+
+
+def build_monthly_cube(meteo, smap_m, stfc, fcm, wpm, time0):
+    """
+    Returns an ImageCollection with one image per month of the meteo collection and the bands
+    pr, pet, apwl, st, rech, ssm and susm.
+    Months without SMAP data (e.g. before April 2015) have masked ssm and susm bands.
+    """
+    rech_coll = recharge_properties.get_recharge_collection(meteo, stfc, fcm, wpm, time0)
+
+    join = ee.Join.saveFirst(matchKey="smap", outer=True)
+    month_filter = ee.Filter.equals(leftField="month", rightField="month")
+    joined = join.apply(rech_coll.map(set_month_key), smap_m.map(set_month_key), month_filter)
+
+    # Placeholder used for the months without soil moisture data.
+    no_smap = ee.Image.constant([0, 0]).rename(SMAP_BANDS).float().updateMask(0)
+
+    def add_smap_bands(image):
+        image = ee.Image(image)
+        smap = ee.Image(ee.Algorithms.If(image.get("smap"), image.get("smap"), no_smap))
+        return image.addBands(smap.select(SMAP_BANDS).float())
+
+    return ee.ImageCollection(joined.map(add_smap_bands)).select(CUBE_BANDS)
+
+
+def get_mean_annual_cube_df(cube_arr, bands=RECHARGE_BANDS):
+    """
+    Reduces the sampled points of the cube to the mean across the ROI and the months of each year.
+    Returns a DataFrame indexed by year with the columns mean-annual-<band>.
+    """
+    time, values = results.region_columns(cube_arr, bands)
+    return annual_means_df(time, values, bands)
+
+
+def get_annual_series_df(monthly_series, bands=RECHARGE_BANDS):
+    """
+    Returns the DataFrame of the annual means of a MonthlySeries of the cube (e.g. extracted at a point),
+    indexed by year with the columns mean-annual-<band>.
+    """
+    values = np.stack([monthly_series[f"mean-{band}"] for band in bands]).astype(np.float64)
+    return annual_means_df(monthly_series.index, values, bands)
+
+
+def annual_means_df(time, values, bands):
+    """
+    Averages the (n_bands, n_rows) values over the rows of each year, ignoring the NaN values.
+    time: int64 array of the row times in epoch milliseconds
+    """
+    years, group = np.unique(time.astype("datetime64[ms]").astype("datetime64[Y]"), return_inverse=True)
+
+    valid = ~np.isnan(values)
+    means = {}
+    for i, band in enumerate(bands):
+        sums = np.bincount(group, weights=np.where(valid[i], values[i], 0.0), minlength=len(years))
+        counts = np.bincount(group, weights=valid[i], minlength=len(years))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            means[f"mean-annual-{band}"] = (sums / counts).astype(np.float32)
+
+    return pd.DataFrame(means, index=pd.Index(years.astype(str), name="year"))
+
+
+def select_bands(monthly_series, bands):
+    """Returns the monthly series of the given bands (e.g. METEO_BANDS) from the mean monthly cube."""
+    return monthly_series.select([f"mean-{band}" for band in bands])
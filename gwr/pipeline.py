@@ -0,0 +1,257 @@
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+from gwr import (cache, datasets, geometry, hydro_properties, met_properties, monthly_cube, point_query,
+                 recharge_properties, results, soil_moisture, soil_properties)
+
+'''
+    Computation stages of the groundwater recharge page.
+
+    Every stage is a plain function of client-side parameters (a PipelineInputs or scalar values), so it
+    can be called from the page, from a batch job or from a worker thread, and identified by a fingerprint
+    of its inputs. The image stages only build the Earth Engine graphs, the extraction stages make the
+    backend calls (through the result cache) and return typed results: MonthlySeries, DataFrames or the
+    profile tuples below.
+'''
+
+# Root zone depths [in m] and depletion fractions of the sensitivity analysis of the recharge.
+SENSITIVITY_ZR = recharge_properties.SUPPORTED_ZR
+SENSITIVITY_P = recharge_properties.SUPPORTED_P
+
+# Datasets read by the water balance model, which gives the months of the monthly tables.
+METEO_DATASETS = [met_properties.PRECIPITATION_DATASET, met_properties.POTENTIAL_EVAPORATION_DATASET]
+
+SoilImages = namedtuple("SoilImages", ["sand", "clay", "orgc", "orgm", "field_capacity", "wilting_point"])
+SoilWaterImages = namedtuple("SoilWaterImages", ["fcm", "wpm", "taw", "stfc"])
+MeteoCollections = namedtuple("MeteoCollections", ["meteo", "pr", "pet"])
+SoilContentProfiles = namedtuple("SoilContentProfiles", ["sand", "clay", "orgc"])
+HydraulicProfiles = namedtuple("HydraulicProfiles", ["wp", "fc"])
+
+
+class PipelineInputs:
+    """
+    Parameters of a run of the pipeline.
+
+    roi: (ee.Geometry) region of interest
+    scale: (int) nominal scale in meters of the extractions
+    start_date, end_date: (date) period of interest, end_date excluded
+    zr: (float) root zone depth [in m]
+    p: (float) depletion fraction
+    point: (bool) the ROI is a single point, the extractions then take the point query fast path
+    geometry: (dict) normalized GeoJSON geometry of the ROI (see geometry.normalize), identifies the ROI
+    """
+
+    __slots__ = ("roi", "scale", "start_date", "end_date", "zr", "p", "point", "geometry")
+
+    def __init__(self, roi, scale, start_date, end_date, zr=0.5, p=0.5, point=False, geometry=None):
+        self.roi = roi
+        self.scale = scale
+        self.start_date = start_date
+        self.end_date = end_date
+        self.zr = zr
+        self.p = p
+        self.point = point
+        self.geometry = geometry
+
+    def __repr__(self):
+        return (f"PipelineInputs(scale={self.scale}, start_date={self.start_date}, end_date={self.end_date}, "
+                f"zr={self.zr}, p={self.p}, point={self.point})")
+
+    def roi_key(self):
+        """
+        Returns the key identifying the ROI: the canonical hash of its normalized geometry, so that the same
+        region drawn twice (or with another vertex order or start point) gives the same key, or else the
+        serialized ee.Geometry.
+        """
+        if self.geometry is not None:
+            return geometry.geometry_hash(self.geometry)
+        return self.roi.serialize() if self.roi is not None else None
+
+    def fingerprint(self):
+        """Returns a hash identifying the inputs."""
+        return cache.fingerprint(
+            self.roi_key(), self.scale, self.start_date.isoformat(), self.end_date.isoformat(), self.zr, self.p)
+
+
+# ______________________________________________Image stages________________________________________________
+# These stages only build Earth Engine objects, they do not make any backend call.
+
+def soil_images():
+    """Returns the OpenLandMap soil content images and the derived field capacity and wilting point."""
+    sand = soil_properties.get_soil_prop("sand")
+    clay = soil_properties.get_soil_prop("clay")
+    orgc = soil_properties.get_soil_prop("orgc")
+
+    # Conversion of organic carbon content into organic matter content.
+    orgm = soil_properties.convert_orgc_to_orgm(orgc)
+
+    # Obtain Field Capacity and Wilting Points
+    field_capacity, wilting_point = hydro_properties.compute_hyrdo_properties(sand, clay, orgm, datasets.OLM_BANDS)
+
+    return SoilImages(sand, clay, orgc, orgm, field_capacity, wilting_point)
+
+
+def soil_water_images(zr, p):
+    """
+    Returns the mean field capacity and wilting point, the theoretical available water and the stored
+    water at field capacity, read from the precomputed asset of (zr, p) when it is available.
+    """
+    soil_water = recharge_properties.get_soil_water_properties(zr, p)
+    return SoilWaterImages(*(soil_water.select(band) for band in recharge_properties.SOIL_WATER_BANDS))
+
+
+def meteo_collections(start_date, end_date):
+    """Returns the monthly meteorological collection and the raw precipitation and PET collections."""
+    return MeteoCollections(
+        met_properties.get_mean_monthly_meteorological_data(start_date, end_date),
+        met_properties.get_precipitation_data_for_dates(start_date, end_date),
+        met_properties.get_potential_evaporation_for_dates(start_date, end_date),
+    )
+
+
+def soil_moisture_collection(start_date, end_date):
+    """Returns the SMAP soil moisture resampled on a monthly basis."""
+    return soil_moisture.get_mean_monthly_smap_data(start_date, end_date)
+
+
+def recharge_collection(inputs):
+    """Returns the monthly collection of the water balance model (rech, apwl, st, pr and pet)."""
+    meteo = meteo_collections(inputs.start_date, inputs.end_date).meteo
+    soil_water = soil_water_images(inputs.zr, inputs.p)
+
+    # Define the initial time (time0) according to the start of the collection.
+    time0 = meteo.first().get("system:time_start")
+
+    return recharge_properties.get_recharge_collection(meteo, soil_water.stfc, soil_water.fcm, soil_water.wpm, time0)
+
+
+def monthly_cube_collection(inputs):
+    """
+    Returns the monthly meteorological, recharge and soil moisture data fused in a single collection,
+    used to sample all the monthly data at points with a single request (see gwr.well_sampling).
+    """
+    meteo = meteo_collections(inputs.start_date, inputs.end_date).meteo
+    soil_water = soil_water_images(inputs.zr, inputs.p)
+
+    # Define the initial time (time0) according to the start of the collection.
+    time0 = meteo.first().get("system:time_start")
+
+    return monthly_cube.build_monthly_cube(
+        meteo, soil_moisture_collection(inputs.start_date, inputs.end_date),
+        soil_water.stfc, soil_water.fcm, soil_water.wpm, time0)
+
+
+# ____________________________________________Extraction stages______________________________________________
+# These stages make the backend calls, the identical calls made concurrently by several stages are
+# coalesced and their results cached by gwr.cache.
+# Each dataset is extracted at the requested scale, or at its native resolution when it is coarser (see
+# datasets.extraction_scale). Only the water balance model, which combines the meteorological data and
+# the soil water properties pixel by pixel, is extracted on the common grid of the requested scale.
+
+def soil_content_profiles(inputs):
+    """Returns the sand, clay and organic carbon profiles at the ROI."""
+    soil = soil_images()
+    scale = datasets.extraction_scale(soil_properties.SOIL_DATASETS, inputs.scale)
+    if inputs.point:
+        return SoilContentProfiles(*point_query.get_point_profiles(
+            [soil.sand, soil.clay, soil.orgc], inputs.roi, scale, datasets.OLM_BANDS))
+    return SoilContentProfiles(*(
+        soil_properties.get_local_soil_profile_at_poi(image, inputs.roi, scale, datasets.OLM_BANDS)
+        for image in (soil.sand, soil.clay, soil.orgc)
+    ))
+
+
+def hydraulic_profiles(inputs):
+    """Returns the wilting point and field capacity profiles at the ROI."""
+    soil = soil_images()
+    scale = datasets.extraction_scale(soil_properties.SOIL_DATASETS, inputs.scale)
+    if inputs.point:
+        return HydraulicProfiles(*point_query.get_point_profiles(
+            [soil.wilting_point, soil.field_capacity], inputs.roi, scale, datasets.OLM_BANDS))
+    return HydraulicProfiles(*(
+        soil_properties.get_local_soil_profile_at_poi(image, inputs.roi, scale, datasets.OLM_BANDS)
+        for image in (soil.wilting_point, soil.field_capacity)
+    ))
+
+
+def covers_meteo(inputs):
+    """Returns True if the meteorological datasets have data in the period of the inputs."""
+    return datasets.covers(METEO_DATASETS, inputs.start_date, inputs.end_date)
+
+
+def recharge_array(inputs):
+    """Returns the client-side getRegion array of the water balance model over the ROI, on the common grid."""
+    if not covers_meteo(inputs):
+        # No month to extract: the empty array is returned without any request.
+        return [["id", "longitude", "latitude", "time"] + monthly_cube.RECHARGE_BANDS]
+    return recharge_properties.get_recharge_for_roi(inputs.roi, inputs.scale, recharge_collection(inputs))
+
+
+def mean_recharge(inputs):
+    """Returns the MonthlySeries of the ROI mean of the water balance (pr, pet, apwl, st, rech)."""
+    if inputs.point and covers_meteo(inputs):
+        return point_query.get_point_monthly_series(
+            recharge_collection(inputs), inputs.roi, inputs.scale, monthly_cube.RECHARGE_BANDS, dataset="recharge")
+    return results.region_to_monthly_series(
+        recharge_array(inputs), monthly_cube.RECHARGE_BANDS, roi=inputs.roi, scale=inputs.scale, dataset="recharge")
+
+
+def meteo_series(inputs):
+    """Returns the MonthlySeries of the mean precipitation and potential evapotranspiration."""
+    return monthly_cube.select_bands(mean_recharge(inputs), monthly_cube.METEO_BANDS)
+
+
+def recharge_series(inputs):
+    """Returns the MonthlySeries of the mean water balance (pr, pet, apwl, st, rech)."""
+    return mean_recharge(inputs)
+
+
+def recharge_sensitivity(inputs):
+    """
+    Returns the DataFrame of the mean annual recharge over the ROI (columns zr, p and mean-annual-rech) for
+    every combination of SENSITIVITY_ZR and SENSITIVITY_P. The inputs are extracted once and all the
+    scenarios are evaluated locally (see recharge_properties.sweep_recharge_at_roi_df).
+    """
+    columns = ["zr", "p", "mean-annual-rech"]
+    if not covers_meteo(inputs):
+        return pd.DataFrame(columns=columns, dtype=np.float32)
+
+    meteo = meteo_collections(inputs.start_date, inputs.end_date).meteo
+    # The mean field capacity and wilting point do not depend on zr and p.
+    soil_water = soil_water_images(inputs.zr, inputs.p)
+    rdf = recharge_properties.sweep_recharge_at_roi_df(
+        meteo, inputs.roi, inputs.scale, SENSITIVITY_ZR, SENSITIVITY_P, soil_water.fcm, soil_water.wpm)
+
+    annual = rdf.groupby(["zr", "p", rdf["datetime"].dt.year])["mean-rech"].sum()
+    return annual.groupby(level=["zr", "p"]).mean().astype(np.float32).rename("mean-annual-rech").reset_index()
+
+
+def soil_moisture_series(inputs):
+    """
+    Returns the MonthlySeries of the mean surface and subsurface soil moisture, extracted at the native
+    resolution of SMAP (10 km) as it is not used by the water balance model.
+    """
+    columns = [f"mean-{band}" for band in monthly_cube.SMAP_BANDS]
+    smap = datasets.get(soil_moisture.SMAP_DATASET)
+    scale = datasets.extraction_scale([soil_moisture.SMAP_DATASET], inputs.scale)
+
+    if not smap.covers(inputs.start_date, inputs.end_date):
+        return results.MonthlySeries([], [[] for _ in columns], columns, roi=inputs.roi, scale=scale, dataset="smap")
+
+    smap_m = soil_moisture_collection(inputs.start_date, inputs.end_date)
+    if not inputs.point:
+        series = soil_moisture.get_mean_monthly_smap_data_for_roi(inputs.roi, scale, smap_m)
+        if len(series):
+            return series
+
+    # A point, or a ROI smaller than a SMAP pixel (no pixel centre within it): the pixel at its centroid.
+    return point_query.get_point_monthly_series(
+        smap_m, inputs.roi.centroid(1), scale, monthly_cube.SMAP_BANDS, dataset="smap")
+
+
+def annual_recharge(inputs):
+    """Returns the DataFrame of the mean annual water balance indexed by year."""
+    if inputs.point:
+        return monthly_cube.get_annual_series_df(mean_recharge(inputs))
+    return monthly_cube.get_mean_annual_cube_df(recharge_array(inputs))
@@ -0,0 +1,168 @@
+import argparse
+import logging
+from datetime import date
+
+import ee
+import numpy as np
+from gwr import cache, ee_utils, geometry, pipeline, rate_limit, recharge_properties
+
+logger = logging.getLogger(__name__)
+
+'''
+    Export of the per-pixel monthly water balance (pr, pet, apwl, st, rech) of a ROI as a local
+    time / lat / lon cube (xarray Dataset written to Zarr or NetCDF), so that trend maps, anomalies
+    or percentiles can be computed locally without new Earth Engine requests.
+
+    Requires the optional xarray package, and zarr or netCDF4 depending on the output format.
+    The cube of a region given as a GeoJSON, WKT or CSV file is exported from the command line, e.g.:
+        python -m gwr.pixel_cube roi.geojson cube.zarr --start 2015-01-01 --end 2020-01-01
+'''
+
+CUBE_BANDS = ["pr", "pet", "apwl", "st", "rech"]
+
+BAND_ATTRIBUTES = {
+    "pr": {"long_name": "Monthly precipitation", "units": "mm"},
+    "pet": {"long_name": "Monthly potential evapotranspiration", "units": "mm"},
+    "apwl": {"long_name": "Accumulated potential water loss", "units": "mm"},
+    "st": {"long_name": "Water stored in the soil", "units": "mm"},
+    "rech": {"long_name": "Monthly groundwater recharge", "units": "mm"},
+}
+
+# Number of decimals used to snap the pixel centres returned by getRegion on a regular grid.
+COORDINATE_DECIMALS = 6
+
+
+def get_pixels_df(rech_coll, roi, scale, bands=CUBE_BANDS):
+    """
+    Extracts the value of every pixel of the ROI for every image of the collection.
+    Returns a DataFrame with one row per pixel and month with the longitude and latitude of the pixel.
+    """
+    arr = cache.get_info(
+        rech_coll.getRegion(roi, scale), "getRegion", stage="pixel cube", method="iterate+getRegion",
+        roi=roi, scale=scale)
+
+    return ee_utils.ee_array_to_df(arr, bands, keep_coordinates=True)
+
+
+def pixels_df_to_arrays(pixels_df, bands=CUBE_BANDS):
+    """
+    Scatters the pixel rows into dense float32 arrays of shape (time, lat, lon).
+    Returns the time, lat and lon coordinates and a dict of arrays keyed by band,
+    pixels missing from the ROI (outside the polygon, masked) are NaN.
+    """
+    times, time_idx = np.unique(pixels_df.index.values, return_inverse=True)
+    lats, lat_idx = np.unique(pixels_df["latitude"].round(COORDINATE_DECIMALS).values, return_inverse=True)
+    lons, lon_idx = np.unique(pixels_df["longitude"].round(COORDINATE_DECIMALS).values, return_inverse=True)
+
+    # Latitudes are stored north to south as in the usual raster layout.
+    lats = lats[::-1]
+    lat_idx = len(lats) - 1 - lat_idx
+
+    arrays = {}
+    for band in bands:
+        values = np.full((len(times), len(lats), len(lons)), np.nan, dtype=np.float32)
+        values[time_idx, lat_idx, lon_idx] = pixels_df[band].values.astype(np.float32)
+        arrays[band] = values
+
+    return times, lats, lons, arrays
+
+
+def to_dataset(pixels_df, bands=CUBE_BANDS, attributes=None):
+    """Converts the pixel rows into an xarray Dataset with time, lat and lon coordinates."""
+    try:
+        import xarray as xr
+    except ImportError as e:
+        raise ImportError("The xarray package is required to build the pixel cube") from e
+
+    times, lats, lons, arrays = pixels_df_to_arrays(pixels_df, bands)
+
+    data_vars = {
+        band: (("time", "lat", "lon"), arrays[band], BAND_ATTRIBUTES.get(band, {}))
+        for band in bands
+    }
+    coords = {
+        "time": ("time", times),
+        "lat": ("lat", lats, {"standard_name": "latitude", "units": "degrees_north"}),
+        "lon": ("lon", lons, {"standard_name": "longitude", "units": "degrees_east"}),
+    }
+    dataset = xr.Dataset(data_vars, coords=coords, attrs=dict(attributes or {}))
+    dataset.attrs.setdefault("Conventions", "CF-1.8")
+
+    return dataset
+
+
+def _chunks(dataset, time_chunk, space_chunk):
+    return (
+        min(time_chunk, dataset.sizes["time"]),
+        min(space_chunk, dataset.sizes["lat"]),
+        min(space_chunk, dataset.sizes["lon"]),
+    )
+
+
+def write_zarr(dataset, path, time_chunk=12, space_chunk=256):
+    """Writes the cube to a chunked Zarr store (compressed with the default zarr compressor)."""
+    chunks = _chunks(dataset, time_chunk, space_chunk)
+    encoding = {band: {"chunks": chunks} for band in dataset.data_vars}
+    dataset.to_zarr(path, mode="w", encoding=encoding)
+    return path
+
+
+def write_netcdf(dataset, path, time_chunk=12, space_chunk=256, complevel=4):
+    """Writes the cube to a chunked and zlib compressed NetCDF4 file."""
+    chunks = _chunks(dataset, time_chunk, space_chunk)
+    encoding = {
+        band: {"zlib": True, "complevel": complevel, "chunksizes": chunks}
+        for band in dataset.data_vars
+    }
+    dataset.to_netcdf(path, encoding=encoding)
+    return path
+
+
+def export_recharge_cube(meteo, roi, scale, stfc, fcm, wpm, time0, path, output_format="zarr"):
+    """
+    Computes the monthly water balance over the ROI and writes the per-pixel pr, pet, apwl, st
+    and rech values to a Zarr store or a NetCDF file.
+    output_format: (str) must be 'zarr' or 'netcdf'
+    """
+    rech_coll = recharge_properties.get_recharge_collection(meteo, stfc, fcm, wpm, time0)
+    pixels_df = get_pixels_df(rech_coll, roi, scale)
+
+    dataset = to_dataset(pixels_df, attributes={"scale": scale, "source": "gwr water balance"})
+    logger.info(f"Writing the pixel cube {dict(dataset.sizes)} to {path}")
+
+    if output_format == "zarr":
+        return write_zarr(dataset, path)
+    if output_format == "netcdf":
+        return write_netcdf(dataset, path)
+
+    raise ValueError(f"The output format '{output_format}' is not supported")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the per-pixel monthly water balance of a region.")
+    parser.add_argument("roi", help="GeoJSON, WKT or CSV file of the region of interest")
+    parser.add_argument("path", help="Zarr store or NetCDF file to write")
+    parser.add_argument("--start", type=date.fromisoformat, required=True)
+    parser.add_argument("--end", type=date.fromisoformat, required=True)
+    parser.add_argument("--zr", type=float, default=0.5)
+    parser.add_argument("--p", type=float, default=0.5)
+    parser.add_argument("--scale", type=int, default=1000)
+    parser.add_argument("--format", choices=["zarr", "netcdf"], default="zarr")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    with open(args.roi, "rb") as f:
+        roi = geometry.to_ee(geometry.normalize(geometry.parse_file(args.roi, f.read())))
+    ee.Initialize()
+
+    meteo = pipeline.meteo_collections(args.start, args.end).meteo
+    soil_water = pipeline.soil_water_images(args.zr, args.p)
+    time0 = meteo.first().get("system:time_start")
+    with rate_limit.priority(rate_limit.BATCH):
+        export_recharge_cube(meteo, roi, args.scale, soil_water.stfc, soil_water.fcm, soil_water.wpm, time0,
+                             args.path, args.format)
+    logger.info(f"Pixel cube written to {args.path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+import ee
+import numpy as np
+from gwr import cache, results
+
+'''
+    Fast path of the extractions at a single point (e.g. a monitoring well).
+
+    For a point region of interest there is a single pixel per image, so the polygon machinery (getRegion
+    rows with id / longitude / latitude, grouping of the sampled points by date, sample features reduced
+    with pandas) is not needed. The values of the pixel are reduced server-side with reduceRegion and
+    Reducer.first, and returned in a compact form: one list of times and one list of band values per image
+    for a collection, a flat dictionary of band values for a set of images, each in a single request.
+'''
+
+
+def is_point(geometry):
+    """Returns True if the normalized GeoJSON geometry (see gwr.geometry) is a single point."""
+    return geometry is not None and geometry["type"] == "Point"
+
+
+def to_float_array(values):
+    # Masked pixels are returned as null by reduceRegion.
+    return np.array([[np.nan if v is None else v for v in row] for row in values], dtype=np.float64)
+
+
+def get_point_profiles(images, point, scale, bands):
+    """
+    Returns the values of the bands of several images at the point with a single reduceRegion call,
+    as one {band: value} profile per image rounded as the profiles of soil_properties.
+    images: list of ee.Image having the bands
+    point: (ee.Geometry.Point) point of interest
+    """
+    # Stack the images with prefixed band names so that a single request returns all the profiles.
+    stacked = ee.Image.cat([
+        image.select(bands, [f"{i}_{band}" for band in bands]) for i, image in enumerate(images)
+    ])
+    values = cache.get_info(
+        stacked.reduceRegion(ee.Reducer.first(), point, scale), "reduceRegion", stage="point profile",
+        method="reduceRegion", roi=point, scale=scale)
+
+    profiles = []
+    for i in range(len(images)):
+        profile = {}
+        for band in bands:
+            value = values.get(f"{i}_{band}")
+            profile[band] = float("nan") if value is None else round(value, 3)
+        profiles.append(profile)
+    return profiles
+
+
+def get_point_series_arrays(coll, point, scale, bands):
+    """
+    Extracts the time series of the bands of a collection at the point with a single request.
+    Returns the int64 array of the image times (epoch milliseconds) and the (n_bands, n_times) float64
+    array of the values (masked values are NaN).
+    """
+    reducer = ee.Reducer.first()
+
+    def point_values(image):
+        values = image.reduceRegion(reducer, point, scale)
+        return ee.Feature(None, {"t": image.get("system:time_start"), "v": values.values(bands)})
+
+    features = ee.FeatureCollection(coll.select(bands).map(point_values))
+    series = cache.get_info(
+        ee.Dictionary({"time": features.aggregate_array("t"), "values": features.aggregate_array("v")}),
+        "reduceRegion", stage="point series", method="map+reduceRegion", roi=point, scale=scale)
+
+    time = np.array(series["time"], dtype=np.int64)
+    values = to_float_array(series["values"]).reshape(len(time), len(bands)).T
+    return time, values
+
+
+def get_point_monthly_series(coll, point, scale, bands, prefix="mean-", **metadata):
+    """
+    Returns the MonthlySeries of the bands of a monthly collection at the point.
+    The columns are named as the ROI means of the other extractions (mean-<band>), so that the charts and
+    tables handle points and polygons alike.
+    """
+    time, values = get_point_series_arrays(coll, point, scale, bands)
+    return results.MonthlySeries(time, values, [prefix + band for band in bands], roi=point, scale=scale, **metadata)
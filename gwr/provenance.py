@@ -0,0 +1,197 @@
+import json
+import logging
+import threading
+import time
+
+import ee
+import numpy as np
+import pandas as pd
+from gwr import (cache, datasets, hydro_properties, instrumentation, met_properties, pipeline, rate_limit,
+                 recharge_properties, results, soil_moisture, soil_properties)
+
+logger = logging.getLogger(__name__)
+
+'''
+    Provenance of the results of the pipeline stages.
+
+    The result of a stage is identified by a provenance record: the stage, the assets it reads with their
+    version (the update time of the asset in the Earth Engine catalog), the normalized geometry, the date
+    range, the scale and the model parameters (root zone depth, depletion fraction, pedotransfer functions).
+    The fingerprint of the record is deterministic, the store keeps the record and the result under it:
+        - identical requests are served from the store without any computation,
+        - when an asset is updated its version changes, and so the fingerprint of every result depending on
+          it: the stale entries are no longer served and expire with PROVENANCE_TTL.
+    The asset versions are looked up at most once every ASSET_VERSION_TTL seconds.
+
+    The store shares the backend of the result cache (GWR_CACHE_URL). As the backend may be shared with
+    other processes, the entries are stored as JSON: the results (MonthlySeries, DataFrames and the profile
+    tuples of the pipeline) are encoded explicitly with a type tag, and only these types are decoded.
+'''
+
+# Version of the provenance records, to be increased when the computations change without any change of
+# their inputs (e.g. a fix of the water balance model).
+PROVENANCE_VERSION = 1
+
+# Time to live of the entries of the store [in seconds].
+PROVENANCE_TTL = 30 * 24 * 3600
+
+# Time after which the version of an asset is looked up again [in seconds].
+ASSET_VERSION_TTL = 3600
+
+METEO_DATASETS = [met_properties.PRECIPITATION_DATASET, met_properties.POTENTIAL_EVAPORATION_DATASET]
+
+# Stages running the water balance model, which read the soil water properties and the meteorological data.
+WATER_BALANCE_STAGES = ["meteo_series", "recharge_series", "annual_recharge", "recharge_sensitivity"]
+
+# Datasets read by each stage, the stages not listed read all of them.
+STAGE_DATASETS = {
+    "soil_content_profiles": soil_properties.SOIL_DATASETS,
+    "hydraulic_profiles": soil_properties.SOIL_DATASETS,
+    "soil_moisture_series": [soil_moisture.SMAP_DATASET],
+    **{stage: soil_properties.SOIL_DATASETS + METEO_DATASETS for stage in WATER_BALANCE_STAGES},
+}
+ALL_DATASETS = soil_properties.SOIL_DATASETS + METEO_DATASETS + [soil_moisture.SMAP_DATASET]
+
+
+# Key of the type tag of the encoded results.
+TYPE_KEY = "__type__"
+
+# Named tuples returned by the stages, decoded by name.
+RESULT_TUPLES = {cls.__name__: cls for cls in (pipeline.SoilContentProfiles, pipeline.HydraulicProfiles)}
+
+
+def encode_result(value):
+    """Converts a stage result into JSON serialisable values, tagging the MonthlySeries, DataFrames and tuples."""
+    if isinstance(value, results.MonthlySeries):
+        # The roi is not stored, the geometry of the request is part of the provenance record.
+        return {TYPE_KEY: "MonthlySeries", "index": value.index.tolist(), "values": value.values.tolist(),
+                "columns": list(value.columns), "scale": value.scale, "dataset": value.dataset}
+    if isinstance(value, pd.DataFrame):
+        return {TYPE_KEY: "DataFrame", "index": encode_result(value.index.tolist()), "index_name": value.index.name,
+                "columns": list(value.columns), "dtypes": [str(dtype) for dtype in value.dtypes],
+                "values": encode_result(value.to_numpy(dtype=object).tolist())}
+    if isinstance(value, tuple) and type(value).__name__ in RESULT_TUPLES:
+        return {TYPE_KEY: type(value).__name__, "values": [encode_result(item) for item in value]}
+    if isinstance(value, dict):
+        return {key: encode_result(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [encode_result(item) for item in value]
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def decode_result(value):
+    """Inverse of encode_result, used as the object_hook of json.loads."""
+    kind = value.get(TYPE_KEY)
+    if kind is None:
+        return value
+    if kind == "MonthlySeries":
+        return results.MonthlySeries(value["index"], np.array(value["values"], dtype=np.float32).reshape(
+            len(value["columns"]), len(value["index"])), value["columns"], scale=value["scale"], dataset=value["dataset"])
+    if kind == "DataFrame":
+        df = pd.DataFrame(value["values"], index=pd.Index(value["index"], name=value["index_name"]),
+                          columns=value["columns"])
+        return df.astype(dict(zip(value["columns"], value["dtypes"])))
+    if kind in RESULT_TUPLES:
+        return RESULT_TUPLES[kind](*value["values"])
+    raise ValueError(f"Unknown type '{kind}' in the provenance store")
+
+
+class ProvenanceStore(cache.ResultCache):
+    """Result cache of the stage results, encoding the typed results of the stages as JSON."""
+
+    def get(self, key, default=None):
+        value = self.backend.get("provenance:" + key)
+        return default if value is None else json.loads(value, object_hook=decode_result)
+
+    def set(self, key, result):
+        self.backend.set("provenance:" + key, json.dumps(encode_result(result), separators=(",", ":")), self.ttl)
+
+
+_store = None
+_versions = None
+_lock = threading.Lock()
+
+
+def get_store():
+    """Returns the provenance store, sharing the backend of the result cache."""
+    global _store
+    with _lock:
+        if _store is None:
+            _store = ProvenanceStore(cache.get_cache().backend, ttl=PROVENANCE_TTL)
+        return _store
+
+
+def get_version_cache():
+    global _versions
+    with _lock:
+        if _versions is None:
+            _versions = cache.ResultCache(cache.get_cache().backend, ttl=ASSET_VERSION_TTL)
+        return _versions
+
+
+def asset_version(asset_id):
+    """Returns the version (update time) of an asset, or None if the asset cannot be read."""
+    def compute():
+        with instrumentation.span("getAsset", stage="provenance", method="getAsset", asset_id=asset_id) as s:
+            try:
+                asset = rate_limit.call(lambda: ee.data.getAsset(asset_id), span=s)
+            except ee.EEException as e:
+                logger.warning(f"Unable to read the version of {asset_id}: {e}")
+                return {"version": None}
+        return {"version": asset.get("updateTime")}
+
+    return get_version_cache().get_or_compute(cache.fingerprint("asset version", asset_id), compute)["version"]
+
+
+def stage_assets(stage, inputs):
+    """Returns the ids of the assets read by the stage for the given inputs."""
+    asset_ids = datasets.asset_ids(STAGE_DATASETS.get(stage.__name__, ALL_DATASETS))
+    if stage.__name__ in WATER_BALANCE_STAGES or stage.__name__ not in STAGE_DATASETS:
+        # The soil water properties may be read from a precomputed asset.
+        asset_root = recharge_properties.SOIL_WATER_ASSET_ROOT
+        if asset_root and recharge_properties.is_supported_soil_water_pair(inputs.zr, inputs.p):
+            asset_ids.append(recharge_properties.soil_water_asset_id(asset_root, inputs.zr, inputs.p))
+    return asset_ids
+
+
+def provenance_record(stage, inputs):
+    """Returns the provenance record of the result of the stage for the given PipelineInputs."""
+    return {
+        "stage": stage.__name__,
+        "version": PROVENANCE_VERSION,
+        "assets": {asset_id: asset_version(asset_id) for asset_id in stage_assets(stage, inputs)},
+        "geometry": inputs.roi_key(),
+        "point": inputs.point,
+        "start_date": inputs.start_date.isoformat(),
+        "end_date": inputs.end_date.isoformat(),
+        "scale": inputs.scale,
+        "parameters": {
+            "zr": inputs.zr,
+            "p": inputs.p,
+            "pedotransfer": hydro_properties.PEDOTRANSFER_EXPRESSIONS,
+            "orgc_to_orgm": soil_properties.ORGC_TO_ORGM,
+        },
+    }
+
+
+def record_fingerprint(record):
+    """Returns the deterministic fingerprint of a provenance record."""
+    return cache.fingerprint("provenance", record)
+
+
+def run(stage, inputs):
+    """
+    Returns the result of the stage for the inputs, served from the provenance store when the same
+    record was already computed.
+    """
+    record = provenance_record(stage, inputs)
+    key = record_fingerprint(record)
+
+    def compute():
+        return {"record": record, "result": stage(inputs), "created": time.time()}
+
+    entry = get_store().get_or_compute(key, compute)
+    logger.debug(f"{stage.__name__} result {key}")
+    return entry["result"]
@@ -0,0 +1,271 @@
+import argparse
+import json
+import logging
+import math
+import os
+import threading
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date, datetime, timezone
+
+import ee
+from gwr import cache, instrumentation, pipeline, rate_limit
+
+logger = logging.getLogger(__name__)
+
+'''
+    Tiled export of the monthly and annual recharge rasters of a large area.
+
+    The products (one monthly recharge image per month of the collection, one annual total per complete
+    year) are stacked into a single multi-band image, so that the water balance is computed once per tile
+    rather than once per product and tile. The area (west, south, east, north) is split into tiles small
+    enough for the direct download of Earth Engine (getDownloadURL, at most MAX_DOWNLOAD_BYTES of bands).
+    The tiles are downloaded in parallel through the rate limiter at batch priority, and each band is then
+    mosaicked locally into the Cloud Optimized GeoTIFF of its product:
+        <out_dir>/tiles/<row>_<col>.tif  - all the products of the tile, one band per product
+        <out_dir>/<product>.tif
+        <out_dir>/manifest.json          - parameters, products and state of every tile and mosaic
+    The manifest is updated after every tile, so an interrupted or partly failed export is resumed by
+    running it again with the same parameters: only the missing tiles are downloaded.
+
+    The mosaic step requires the rasterio package.
+
+    Usage:
+        python -m gwr.raster_export out --bounds 88 20 93 27 --start 2015-01-01 --end 2020-01-01
+'''
+
+# Maximum width and height of a tile [in pixels].
+TILE_PIXELS = 2048
+
+# Maximum size of a direct download of Earth Engine [in bytes], the bands being downloaded as float32.
+MAX_DOWNLOAD_BYTES = 32 * 1024 * 1024
+
+# Approximate length of a degree of latitude [in meters].
+METERS_PER_DEGREE = 111320
+
+# Number of tiles downloaded at once.
+EXPORT_WORKERS = 8
+
+MANIFEST = "manifest.json"
+
+DONE = "done"
+FAILED = "failed"
+
+
+class ExportManifest:
+    """
+    Progress of an export, persisted as JSON in the output directory.
+    The state of the tiles is {tile: "done" | "failed: <error>"}, the mosaics {product: path}.
+    """
+
+    def __init__(self, out_dir, parameters):
+        self.path = os.path.join(out_dir, MANIFEST)
+        self.lock = threading.Lock()
+        self.data = {"parameters": parameters, "tiles": {}, "mosaics": {}}
+
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                data = json.load(f)
+            # A manifest of other parameters would mix tiles of different exports.
+            if data["parameters"] != parameters:
+                raise ValueError(f"{self.path} belongs to an export with other parameters, use another directory")
+            self.data = data
+
+    def is_done(self, tile, path):
+        return self.data["tiles"].get(tile) == DONE and os.path.exists(path)
+
+    def set_tile(self, tile, state):
+        with self.lock:
+            self.data["tiles"][tile] = state
+            self.save()
+
+    def set_mosaic(self, product, path):
+        with self.lock:
+            self.data["mosaics"][product] = path
+            self.save()
+
+    def failed_tiles(self):
+        return [tile for tile, state in self.data["tiles"].items() if state != DONE]
+
+    def save(self):
+        # Written to a temporary file first so that an interruption does not corrupt the manifest.
+        with open(self.path + ".tmp", "w") as f:
+            json.dump(self.data, f, indent=2)
+        os.replace(self.path + ".tmp", self.path)
+
+
+def tile_grid(bounds, scale, tile_pixels=TILE_PIXELS):
+    """
+    Splits bounds (west, south, east, north) [in degrees] into tiles of at most tile_pixels pixels of
+    scale meters. Returns a dict of tile name (<row>_<col>) to tile bounds.
+    """
+    west, south, east, north = bounds
+    step = tile_pixels * scale / METERS_PER_DEGREE
+    n_rows = max(1, math.ceil((north - south) / step))
+    n_cols = max(1, math.ceil((east - west) / step))
+
+    tiles = {}
+    for row in range(n_rows):
+        for col in range(n_cols):
+            tile_north = north - row * step
+            tile_west = west + col * step
+            tiles[f"{row}_{col}"] = (tile_west, max(south, tile_north - step), min(east, tile_west + step), tile_north)
+    return tiles
+
+
+def tile_size(n_bands, tile_pixels=TILE_PIXELS):
+    """Returns the width and height [in pixels] of the tiles of n_bands float32 bands."""
+    return max(1, min(tile_pixels, math.isqrt(MAX_DOWNLOAD_BYTES // (4 * max(n_bands, 1)))))
+
+
+def recharge_products(inputs):
+    """
+    Returns the image stacking the products to export, one band per product: the monthly recharge of each
+    month of the collection (rech_YYYY-MM) and the annual total recharge of the years whose 12 months are in
+    the collection (rech_YYYY). Returns (image, list of the product names in the order of the bands).
+    The months are read once from the collection, so a month without data is not exported.
+    """
+    rech = pipeline.recharge_collection(inputs).select("rech")
+    times = cache.get_info(rech.aggregate_array("system:time_start"), "aggregate_array", stage="raster export",
+                           method="aggregate_array")
+    months = [datetime.fromtimestamp(time / 1000, timezone.utc) for time in times]
+    if not months:
+        return None, []
+
+    # The images of the collection are flattened in their order, the same as aggregate_array.
+    products = [f"rech_{month.year}-{month.month:02d}" for month in months]
+    bands = [rech.toBands().rename(products)]
+
+    for year in sorted({month.year for month in months}):
+        if len({month.month for month in months if month.year == year}) == 12:
+            products.append(f"rech_{year}")
+            bands.append(rech.filter(ee.Filter.calendarRange(year, year, "year")).sum().rename(f"rech_{year}"))
+    return ee.Image.cat(bands).float(), products
+
+
+def download_tile(image, tile_bounds, scale, path):
+    # Downloads a tile as GeoTIFF through the rate limiter.
+    region = ee.Geometry.Rectangle(list(tile_bounds), None, False)
+    params = {"region": region, "scale": scale, "crs": "EPSG:4326", "format": "GEO_TIFF"}
+
+    with instrumentation.span("getDownloadURL", stage="raster export", method="getDownloadURL") as s:
+        url = rate_limit.call(lambda: image.getDownloadURL(params), span=s)
+
+    def fetch():
+        with urllib.request.urlopen(url, timeout=300) as response:
+            return response.read()
+
+    data = rate_limit.call(fetch)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + ".tmp", "wb") as f:
+        f.write(data)
+    os.replace(path + ".tmp", path)
+
+
+def mosaic(tile_paths, band, path):
+    """Mosaics a band (1-based index) of the GeoTIFF tiles into a Cloud Optimized GeoTIFF."""
+    try:
+        import rasterio
+        from rasterio.merge import merge
+    except ImportError as e:
+        raise ImportError("The rasterio package is required to mosaic the exported tiles") from e
+
+    sources = [rasterio.open(tile_path) for tile_path in tile_paths]
+    try:
+        data, transform = merge(sources, indexes=[band], nodata=float("nan"))
+        profile = sources[0].profile
+    finally:
+        for source in sources:
+            source.close()
+
+    profile.update(driver="COG", count=1, height=data.shape[1], width=data.shape[2], transform=transform,
+                   nodata=float("nan"), compress="deflate")
+    profile.pop("blockxsize", None)
+    profile.pop("blockysize", None)
+    profile.pop("tiled", None)
+    with rasterio.open(path + ".tmp", "w", **profile) as destination:
+        destination.write(data)
+    os.replace(path + ".tmp", path)
+
+
+def export_recharge(out_dir, bounds, inputs, tile_pixels=TILE_PIXELS, workers=EXPORT_WORKERS):
+    """
+    Exports the monthly and annual recharge rasters of bounds (west, south, east, north) [in degrees]
+    into out_dir, resuming a previous export of the same parameters.
+    inputs: (PipelineInputs) period, root zone depth, depletion fraction and scale of the export
+    Returns the manifest of the export, whose failed_tiles() lists the tiles to retry.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    image, products = recharge_products(inputs)
+    tile_pixels = tile_size(len(products), tile_pixels)
+    parameters = {
+        "bounds": list(bounds), "scale": inputs.scale, "tile_pixels": tile_pixels,
+        "start_date": inputs.start_date.isoformat(), "end_date": inputs.end_date.isoformat(),
+        "zr": inputs.zr, "p": inputs.p, "products": products,
+    }
+    manifest = ExportManifest(out_dir, parameters)
+    if not products:
+        logger.warning("No recharge data in the period, nothing to export")
+        return manifest
+    tiles = tile_grid(bounds, inputs.scale, tile_pixels)
+
+    def tile_path(tile):
+        return os.path.join(out_dir, "tiles", f"{tile}.tif")
+
+    def run(tile):
+        if manifest.is_done(tile, tile_path(tile)):
+            return
+        with rate_limit.priority(rate_limit.BATCH):
+            try:
+                download_tile(image, tiles[tile], inputs.scale, tile_path(tile))
+            except Exception as e:
+                logger.warning(f"Export of the tile {tile} failed: {e}")
+                manifest.set_tile(tile, f"{FAILED}: {e}")
+                return
+        manifest.set_tile(tile, DONE)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(run, tile) for tile in tiles]
+        for i, future in enumerate(as_completed(futures), 1):
+            future.result()
+            if i % 100 == 0 or i == len(futures):
+                logger.info(f"{i} / {len(futures)} tiles exported")
+
+    # Mosaic each product from its band of the tiles, once all the tiles are downloaded.
+    if any(manifest.data["tiles"].get(tile) != DONE for tile in tiles):
+        return manifest
+    for band, product in enumerate(products, 1):
+        if product in manifest.data["mosaics"]:
+            continue
+        path = os.path.join(out_dir, f"{product}.tif")
+        mosaic([tile_path(tile) for tile in tiles], band, path)
+        manifest.set_mosaic(product, path)
+
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the monthly and annual recharge rasters of an area.")
+    parser.add_argument("out_dir")
+    parser.add_argument("--bounds", type=float, nargs=4, required=True, metavar=("WEST", "SOUTH", "EAST", "NORTH"))
+    parser.add_argument("--start", type=date.fromisoformat, required=True)
+    parser.add_argument("--end", type=date.fromisoformat, required=True)
+    parser.add_argument("--zr", type=float, default=0.5)
+    parser.add_argument("--p", type=float, default=0.5)
+    parser.add_argument("--scale", type=int, default=1000)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    ee.Initialize()
+    inputs = pipeline.PipelineInputs(None, args.scale, args.start, args.end, zr=args.zr, p=args.p)
+    manifest = export_recharge(args.out_dir, args.bounds, inputs)
+
+    failed = manifest.failed_tiles()
+    if failed:
+        logger.error(f"{len(failed)} tiles failed, run the same command again to resume the export")
+    else:
+        logger.info(f"Export completed in {args.out_dir}")
+
+
+if __name__ == "__main__":
+    main()
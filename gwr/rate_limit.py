@@ -0,0 +1,222 @@
+import heapq
+import itertools
+import logging
+import os
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+from gwr import instrumentation
+
+logger = logging.getLogger(__name__)
+
+'''
+    Quota aware rate limiting of the calls made to the Earth Engine backend.
+
+    All the backend calls of the process go through a single token bucket limiter which also bounds
+    the number of concurrent calls. Waiting calls are served by priority (interactive page requests
+    first, then background pre-warming, then batch jobs) so that batch jobs only use the capacity left
+    by the interactive sessions. Calls rejected by Earth Engine because of quota or concurrency limits
+    (429, "Too many concurrent aggregations"...) are retried with exponential backoff and jitter.
+
+    The limits can be configured with the GWR_EE_RATE (calls per second), GWR_EE_BURST and
+    GWR_EE_MAX_CONCURRENT environment variables.
+'''
+
+INTERACTIVE = 0
+PREWARM = 1
+BATCH = 2
+
+PRIORITY_NAMES = {INTERACTIVE: "interactive", PREWARM: "prewarm", BATCH: "batch"}
+
+# Messages of the Earth Engine errors caused by quota or concurrency limits, worth retrying.
+RETRYABLE_ERRORS = [
+    "too many concurrent aggregations",
+    "too many requests",
+    "quota exceeded",
+    "rate limit",
+    "service unavailable",
+]
+
+# HTTP status of the quota and unavailability errors.
+RETRYABLE_STATUSES = (429, 503)
+
+# The status quoted in an error message ("<HttpError 429 ...", "HTTP Error 503: ...", "status: 429"), as a
+# bare number may be part of an asset id, a coordinate or a count.
+RETRYABLE_STATUS_PATTERN = re.compile(r"\b(?:http\s*error|status|code)\s*[:=]?\s*(?:429|503)\b")
+
+
+class BackendBusyError(Exception):
+    """Raised when a backend call is still rejected because of quota limits after all its retries."""
+
+
+def is_retryable(error):
+    """Returns True if the error is caused by Earth Engine quota or concurrency limits."""
+    # Status of a googleapiclient HttpError, or of a urllib HTTPError.
+    status = getattr(getattr(error, "resp", None), "status", None) or getattr(error, "code", None)
+    if status in RETRYABLE_STATUSES:
+        return True
+
+    message = str(error).lower()
+    return any(marker in message for marker in RETRYABLE_ERRORS) or RETRYABLE_STATUS_PATTERN.search(message) is not None
+
+
+class RateLimiter:
+    """
+    Token bucket limiter with a bound on concurrent calls and priority ordering of the waiting calls.
+
+    rate: (float) number of calls allowed per second on average
+    burst: (int) maximum number of calls that can be started at once after an idle period
+    max_concurrent: (int) maximum number of calls running at the same time
+    reserved: (int) number of concurrent slots only usable by interactive calls
+    """
+
+    def __init__(self, rate=10.0, burst=20, max_concurrent=20, reserved=4,
+                 max_retries=5, base_delay=1.0, max_delay=60.0):
+        self.rate = rate
+        self.burst = burst
+        self.max_concurrent = max_concurrent
+        self.reserved = min(reserved, max_concurrent - 1)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+        self._tokens = float(burst)
+        self._last_refill = time.monotonic()
+        self._running = 0
+        self._waiting = []
+        self._counter = itertools.count()
+        self._condition = threading.Condition()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._last_refill) * self.rate)
+        self._last_refill = now
+
+    def _slots(self, priority):
+        # Lower priority calls cannot use the slots reserved for the interactive requests.
+        return self.max_concurrent if priority == INTERACTIVE else self.max_concurrent - self.reserved
+
+    def _publish_queue_depth(self):
+        for priority, name in PRIORITY_NAMES.items():
+            depth = sum(1 for entry in self._waiting if entry[0] == priority)
+            instrumentation.set_gauge("gwr_ee_queue_depth", depth,
+                                      "Number of Earth Engine calls waiting for the rate limiter.",
+                                      priority=name)
+        instrumentation.set_gauge("gwr_ee_calls_running", self._running,
+                                  "Number of Earth Engine calls currently running.")
+
+    def acquire(self, priority=INTERACTIVE):
+        """Blocks until a call of the given priority is allowed to start."""
+        entry = (priority, next(self._counter))
+        with self._condition:
+            heapq.heappush(self._waiting, entry)
+            self._publish_queue_depth()
+            try:
+                while True:
+                    self._refill()
+                    if (self._waiting[0] == entry and self._tokens >= 1
+                            and self._running < self._slots(priority)):
+                        break
+
+                    # Wait until a token is available or a running call is released.
+                    timeout = max((1 - self._tokens) / self.rate, 0.01)
+                    self._condition.wait(timeout)
+
+                self._tokens -= 1
+                self._running += 1
+            finally:
+                self._waiting.remove(entry)
+                heapq.heapify(self._waiting)
+                self._publish_queue_depth()
+                self._condition.notify_all()
+
+    def release(self):
+        with self._condition:
+            self._running -= 1
+            self._publish_queue_depth()
+            self._condition.notify_all()
+
+    def backoff_delay(self, attempt):
+        """Exponential backoff with full jitter for the given retry attempt (starting at 1)."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+    def call(self, fn, priority=None, span=None):
+        """
+        Calls fn() once allowed by the limiter, retrying it on quota errors.
+
+        fn: (callable) function without arguments making the backend call
+        priority: INTERACTIVE, PREWARM or BATCH, defaults to the priority of the current context
+        span: instrumentation span on which the retries are recorded
+        """
+        if priority is None:
+            priority = current_priority()
+
+        attempt = 0
+        while True:
+            self.acquire(priority)
+            try:
+                return fn()
+            except Exception as e:
+                if not is_retryable(e):
+                    raise
+                attempt += 1
+                if attempt > self.max_retries:
+                    raise BackendBusyError(
+                        "Earth Engine is currently overloaded, please try again in a few minutes"
+                    ) from e
+                error = e
+            finally:
+                self.release()
+
+            delay = self.backoff_delay(attempt)
+            logger.warning(f"Earth Engine call rejected ({error}), retry {attempt} in {delay:.1f}s")
+            if span is not None:
+                span.add_retry()
+            time.sleep(delay)
+
+
+_local = threading.local()
+
+
+def current_priority():
+    """Returns the priority of the backend calls made by the current thread."""
+    return getattr(_local, "priority", INTERACTIVE)
+
+
+@contextmanager
+def priority(level):
+    """
+    Sets the priority of the backend calls made by the current thread within the block,
+    e.g. `with rate_limit.priority(rate_limit.BATCH): ...` for batch jobs.
+    """
+    previous = current_priority()
+    _local.priority = level
+    try:
+        yield
+    finally:
+        _local.priority = previous
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def get_limiter():
+    """Returns the process wide rate limiter, configured from the environment."""
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = RateLimiter(
+                rate=float(os.environ.get("GWR_EE_RATE", 10)),
+                burst=int(os.environ.get("GWR_EE_BURST", 20)),
+                max_concurrent=int(os.environ.get("GWR_EE_MAX_CONCURRENT", 20)),
+            )
+        return _limiter
+
+
+def call(fn, priority=None, span=None):
+    """Calls fn() through the process wide rate limiter."""
+    return get_limiter().call(fn, priority, span)
@@ -1,10 +1,48 @@
+import argparse
+import logging
+import os
+import threading
+from datetime import date, timedelta
+
 import ee
-from gwr import ee_utils
+import numpy as np
+import pandas as pd
+from gwr import (cache, datasets, geometry, hydro_properties, met_properties, rate_limit, results,
+                 soil_properties, water_balance)
+
+logger = logging.getLogger(__name__)
 
 '''
 Functions related to the calculation of Soild Water Recharge (SWR)
+
+The one-off batch jobs are run from the command line, e.g. the export of the precomputed soil water
+properties (see export_soil_water_assets):
+    python -m gwr.recharge_properties export --asset-root projects/<project>/assets/gwr
+or the daily water balance of a region (see get_daily_recharge_at_roi_df), written as CSV:
+    python -m gwr.recharge_properties daily roi.geojson --start 2015-01-01 --end 2020-01-01 --out daily.csv
+or the monthly recharge of a region for several root zone depths and depletion fractions (see
+sweep_recharge_at_roi_df), written as CSV:
+    python -m gwr.recharge_properties sweep roi.geojson --start 2015-01-01 --end 2020-01-01 --zr 0.5 1 --p 0.5
 '''
 
+# Root zone depths [in m] and depletion fractions for which the soil water properties are precomputed.
+SUPPORTED_ZR = [0.25, 0.5, 0.75, 1.0, 1.5, 2.0]
+SUPPORTED_P = [0.25, 0.5, 0.75]
+
+# Bands of the precomputed soil water images.
+SOIL_WATER_BANDS = ["fc_mean", "wp_mean", "taw", "stfc"]
+
+# Scale [in m] of the precomputed soil water assets (native resolution of OpenLandMap).
+SOIL_WATER_SCALE = 250
+
+# Number of days extracted per backend request by the daily water balance. The getRegion results are
+# limited to about a million values, so it should be lowered for ROIs with many pixels.
+DAILY_CHUNK_DAYS = 365
+
+# Earth Engine folder of the precomputed soil water assets, e.g. projects/<project>/assets/gwr.
+# Without it the soil water properties are always computed from the soil properties.
+SOIL_WATER_ASSET_ROOT = os.environ.get("GWR_SOIL_WATER_ASSET_ROOT")
+
 
 def olm_prop_mean(olm_image, band_output_name):
     """
@@ -39,6 +77,111 @@ def calculate_stored_water_at_fc(taw, p):
     return stfc
 
 
+def is_supported_soil_water_pair(zr, p):
+    """Returns True if the soil water properties are precomputed for the root depth zr and fraction p."""
+    return zr in SUPPORTED_ZR and p in SUPPORTED_P
+
+
+def soil_water_asset_id(asset_root, zr, p):
+    """Returns the id of the precomputed soil water asset of the root depth zr and fraction p."""
+    return f"{asset_root}/soil_water_zr{round(zr * 100):03d}_p{round(p * 100):03d}"
+
+
+def compute_soil_water_image(zr, p, fcm=None, wpm=None):
+    """
+    Computes the soil water properties from the OpenLandMap soil properties.
+    Returns an ee.Image with the bands fc_mean, wp_mean, taw and stfc.
+
+    zr: (float) root zone depth [in m]
+    p: (float) depletion fraction
+    fcm, wpm: optional mean field capacity and wilting point images (fc_mean and wp_mean bands),
+              computed from the soil properties when not given
+    """
+    if fcm is None or wpm is None:
+        sand = soil_properties.get_soil_prop("sand")
+        clay = soil_properties.get_soil_prop("clay")
+        orgm = soil_properties.convert_orgc_to_orgm(soil_properties.get_soil_prop("orgc"))
+        field_capacity, wilting_point = hydro_properties.compute_hyrdo_properties(sand, clay, orgm, datasets.OLM_BANDS)
+        fcm = olm_prop_mean(field_capacity, "fc_mean")
+        wpm = olm_prop_mean(wilting_point, "wp_mean")
+
+    taw = calculate_available_water(fcm, wpm, ee.Image(zr)).rename("taw")
+    stfc = calculate_stored_water_at_fc(taw, ee.Image(p)).rename("stfc")
+
+    return ee.Image([fcm, wpm, taw, stfc]).select(SOIL_WATER_BANDS).float()
+
+
+def export_soil_water_assets(asset_root, pairs=None, scale=SOIL_WATER_SCALE, region=None):
+    """
+    Starts one Earth Engine export task per (zr, p) pair writing the soil water properties
+    (fc_mean, wp_mean, taw, stfc) to an asset of asset_root. This is a one-off batch job,
+    the recharge model then reads the exported rasters through get_soil_water_properties.
+
+    pairs: list of (zr, p) tuples, defaults to all the combinations of SUPPORTED_ZR and SUPPORTED_P
+    region: ee.Geometry covered by the export, defaults to the whole globe
+    Returns the list of started tasks.
+    """
+    if pairs is None:
+        pairs = [(zr, p) for zr in SUPPORTED_ZR for p in SUPPORTED_P]
+    if region is None:
+        region = ee.Geometry.BBox(-180, -90, 180, 90)
+
+    # The soil properties do not depend on the pair, they are shared by all the exports.
+    image = compute_soil_water_image(SUPPORTED_ZR[0], SUPPORTED_P[0])
+    fcm, wpm = image.select("fc_mean"), image.select("wp_mean")
+
+    tasks = []
+    for zr, p in pairs:
+        asset_id = soil_water_asset_id(asset_root, zr, p)
+        task = ee.batch.Export.image.toAsset(
+            image=compute_soil_water_image(zr, p, fcm, wpm).set({"zr": zr, "p": p}),
+            description=asset_id.rsplit("/", 1)[-1],
+            assetId=asset_id,
+            region=region,
+            scale=scale,
+            maxPixels=1e13,
+        )
+        rate_limit.call(task.start, priority=rate_limit.BATCH)
+        logger.info(f"Started the export of the soil water properties zr={zr} p={p} to {asset_id}")
+        tasks.append(task)
+
+    return tasks
+
+
+_available_assets = {}
+_available_assets_lock = threading.Lock()
+
+
+def get_available_soil_water_assets(asset_root):
+    """Returns the set of the asset ids of asset_root, listed once per process."""
+    with _available_assets_lock:
+        if asset_root not in _available_assets:
+            try:
+                listing = rate_limit.call(lambda: ee.data.listAssets({"parent": asset_root}))
+                _available_assets[asset_root] = {asset["id"] for asset in listing.get("assets", [])}
+            except ee.EEException as e:
+                logger.warning(f"Unable to list the soil water assets of {asset_root}: {e}")
+                _available_assets[asset_root] = set()
+        return _available_assets[asset_root]
+
+
+def get_soil_water_properties(zr, p, fcm=None, wpm=None, asset_root=None):
+    """
+    Returns an ee.Image with the bands fc_mean, wp_mean, taw and stfc for the root depth zr and
+    the depletion fraction p.
+    The precomputed asset is used when it exists for the pair, otherwise the properties are computed
+    from the soil properties (and fcm, wpm if given).
+    """
+    asset_root = asset_root or SOIL_WATER_ASSET_ROOT
+    if asset_root and is_supported_soil_water_pair(zr, p):
+        asset_id = soil_water_asset_id(asset_root, zr, p)
+        if asset_id in get_available_soil_water_assets(asset_root):
+            return ee.Image(asset_id).select(SOIL_WATER_BANDS)
+        logger.info(f"No precomputed soil water asset {asset_id}, computing it")
+
+    return compute_soil_water_image(zr, p, fcm, wpm)
+
+
 def get_soil_hydric_bands(stfc, time0):
     # Initialize all bands describing the hydric state of the soil.
     # Do not forget to cast the type of the data with a .float().
@@ -168,7 +311,11 @@ def compute_recharge(meteo_data, image_list, stfc, fcm, wpm):
     return meteo_data.iterate(calculate_recharge, image_list)
 
 
-def get_recharge_at_poi_df(meteo, poi, scale, stfc, fcm, wpm, time0):
+def get_recharge_collection(meteo, stfc, fcm, wpm, time0):
+    """
+    Returns the monthly ee.ImageCollection with the bands rech, apwl, st, pr and pet
+    computed by the water balance model over the meteo collection.
+    """
     initial_image, image_list = get_soil_hydric_bands(stfc, time0)
     # Iterate the user-supplied function to the meteo collection.
     rech_list = compute_recharge(meteo, image_list, stfc, fcm, wpm)
@@ -179,61 +326,243 @@ def get_recharge_at_poi_df(meteo, poi, scale, stfc, fcm, wpm, time0):
     # Transform the list into an ee.ImageCollection.
     rech_coll = ee.ImageCollection(rech_list)
 
-    arr = rech_coll.getRegion(poi, scale).getInfo()
-    rdf = ee_utils.ee_array_to_df(arr, ["pr", "pet", "apwl", "st", "rech"]).sort_index()
+    return rech_coll
 
-    return rdf, rech_coll
 
+def get_recharge_for_roi(roi, scale, rech_coll):
+    """
+    Extracts the recharge collection over the ROI with a single getRegion call.
+    Returns the client-side getRegion array (one row per sampled point and month).
+    """
+    return cache.get_info(
+        rech_coll.getRegion(roi, scale), "getRegion", stage="recharge", method="iterate+getRegion",
+        roi=roi, scale=scale)
 
-def get_monthly_mean_recharge_at_roi_df(meteo, roi, scale, stfc, fcm, wpm, time0):
-    initial_image, image_list = get_soil_hydric_bands(stfc, time0)
-    # Iterate the user-supplied function to the meteo collection.
-    rech_list = compute_recharge(meteo, image_list, stfc, fcm, wpm)
 
-    # Remove the initial image from our list.
-    rech_list = ee.List(rech_list).remove(initial_image)
+def region_to_pixel_arrays(arr, bands, pixels=None):
+    """
+    Converts a client-side getRegion array into one (n_times, n_pixels) float64 array per band.
+    pixels: (n_pixels, 2) longitude and latitude of the columns of the arrays, the sorted pixels of arr by
+            default. The rows of other pixels are dropped and the pixels without any row are NaN.
+    Returns the sorted int64 times, the (n_pixels, 2) pixels and a dict of arrays keyed by band, missing
+    values are NaN.
+    """
+    header = arr[0]
+    time, values = results.region_columns(arr, bands)
+    coordinates = np.array(
+        [[row[header.index("longitude")], row[header.index("latitude")]] for row in arr[1:]], dtype=np.float64
+    ).reshape(-1, 2).round(6)
+
+    times, time_idx = np.unique(time, return_inverse=True)
+    if pixels is None:
+        pixels, pixel_idx = np.unique(coordinates, axis=0, return_inverse=True)
+        pixel_idx = pixel_idx.ravel()
+        known = np.ones(len(pixel_idx), dtype=bool)
+    else:
+        pixels = np.asarray(pixels, dtype=np.float64).reshape(-1, 2)
+        index = {tuple(pixel): i for i, pixel in enumerate(pixels.tolist())}
+        pixel_idx = np.array([index.get(tuple(pixel), -1) for pixel in coordinates.tolist()], dtype=np.int64)
+        known = pixel_idx >= 0
+
+    arrays = {}
+    for i, band in enumerate(bands):
+        array = np.full((len(times), len(pixels)), np.nan)
+        array[time_idx[known], pixel_idx[known]] = values[i][known]
+        arrays[band] = array
+
+    return times, pixels, arrays
+
+
+def get_water_balance_inputs(meteo, roi, scale, fcm, wpm, stage="water balance inputs"):
+    """
+    Extracts the pr and pet of each image of meteo and the mean field capacity and wilting point of every
+    pixel of the ROI with a single getRegion call (cached, so that all the sweeps over the same ROI reuse it).
+    Returns the times, the (n_times, n_pixels) pr and pet arrays and the (n_pixels,) fc and wp arrays.
+    """
+    soil = ee.Image([fcm.select("fc_mean"), wpm.select("wp_mean")])
+    coll = meteo.map(lambda image: ee.Image(image).select(["pr", "pet"]).addBands(soil))
 
-    # Transform the list into an ee.ImageCollection.
-    rech_coll = ee.ImageCollection(rech_list)
+    arr = cache.get_info(
+        coll.getRegion(roi, scale), "getRegion", stage=stage, method="getRegion",
+        roi=roi, scale=scale)
+    times, _, arrays = region_to_pixel_arrays(arr, ["pr", "pet", "fc_mean", "wp_mean"])
 
-    arr = rech_coll.getRegion(roi, scale).getInfo()
-    # The df contains data across all points sampled, so we need to reduce this to be the mean
-    # across all points in the ROI for each month
-    # To avoid loosing the datetime and time fields (used elsewhere), group by both then remove time from the index
-    rdf = ee_utils.ee_array_to_df(arr, ["pr", "pet", "apwl", "st", "rech"]).groupby(['datetime', 'time']).mean(
-        ['pr', 'pet', "apwl", "st", "rech"]).sort_values("datetime")
+    # The soil properties are static, they are read from the first month.
+    return times, arrays["pr"], arrays["pet"], arrays["fc_mean"][0], arrays["wp_mean"][0]
 
-    rdf.reset_index(level='time', inplace=True)
-    rdf.rename(columns={'pr': 'mean-pr'}, inplace=True)
-    rdf.rename(columns={'pet': 'mean-pet'}, inplace=True)
-    rdf.rename(columns={'apwl': 'mean-apwl'}, inplace=True)
-    rdf.rename(columns={'st': 'mean-st'}, inplace=True)
-    rdf.rename(columns={'rech': 'mean-rech'}, inplace=True)
-    rdf["date"] = rdf.index.strftime("%m-%Y")
 
-    return rdf, rech_coll
+def get_soil_water_at_roi(roi, scale, fcm, wpm):
+    """
+    Extracts the mean field capacity and wilting point of every pixel of the ROI.
+    Returns the (n_pixels, 2) pixels and the (n_pixels,) fc and wp arrays.
+    """
+    soil = ee.Image([fcm.select("fc_mean"), wpm.select("wp_mean")]).set("system:time_start", 0)
+    arr = cache.get_info(
+        ee.ImageCollection([soil]).getRegion(roi, scale), "getRegion", stage="soil water", method="getRegion",
+        roi=roi, scale=scale)
+    _, pixels, arrays = region_to_pixel_arrays(arr, ["fc_mean", "wp_mean"])
+    return pixels, arrays["fc_mean"][0], arrays["wp_mean"][0]
 
 
-def get_mean_annual_recharge_at_roi_df(meteo, roi, scale, stfc, fcm, wpm, time0):
-    initial_image, image_list = get_soil_hydric_bands(stfc, time0)
-    # Iterate the user-supplied function to the meteo collection.
-    rech_list = compute_recharge(meteo, image_list, stfc, fcm, wpm)
+def get_meteo_at_pixels(meteo, roi, scale, pixels, stage="meteo"):
+    """
+    Extracts the pr and pet of each image of meteo at the pixels of the ROI.
+    Returns the times and the (n_times, n_pixels) pr and pet arrays, the columns in the order of pixels.
+    """
+    arr = cache.get_info(
+        meteo.select(["pr", "pet"]).getRegion(roi, scale), "getRegion", stage=stage, method="getRegion",
+        roi=roi, scale=scale)
+    times, _, arrays = region_to_pixel_arrays(arr, ["pr", "pet"], pixels)
+    return times, arrays["pr"], arrays["pet"]
 
-    # Remove the initial image from our list.
-    rech_list = ee.List(rech_list).remove(initial_image)
 
-    # Transform the list into an ee.ImageCollection.
-    rech_coll = ee.ImageCollection(rech_list)
+def sweep_recharge_at_roi_df(meteo, roi, scale, zr_values, p_values, fcm, wpm):
+    """
+    Computes the monthly recharge over the ROI for every combination of the root depths zr_values
+    and the depletion fractions p_values.
+    pr, pet, fc and wp are extracted once and the scenarios are evaluated locally with vectorized numpy.
+    Returns a tidy DataFrame with one row per scenario and month and the columns zr, p, datetime
+    and mean-pr, mean-pet, mean-apwl, mean-st, mean-rech.
+    """
+    times, pr, pet, fc, wp = get_water_balance_inputs(meteo, roi, scale, fcm, wpm)
+    zr, p, means = water_balance.sweep(pr, pet, fc, wp, zr_values, p_values)
 
-    arr = rech_coll.getRegion(roi, scale).getInfo()
-    # The df contains data across all points sampled, so we need to reduce this to be the mean
-    # across all points in the ROI for each month
-    rdf = ee_utils.ee_array_to_df(arr, ["pr", "pet", "apwl", "st", "rech"])
-    rdf['year'] = rdf.index.strftime("%Y")
-    rdf = rdf.groupby('year').mean(['pr', 'pet', "apwl", "st", "rech"]).sort_values('year')
-    rdf.rename(columns={'pr': 'mean-annual-pr'}, inplace=True)
-    rdf.rename(columns={'pet': 'mean-annual-pet'}, inplace=True)
-    rdf.rename(columns={'apwl': 'mean-annual-apwl'}, inplace=True)
-    rdf.rename(columns={'st': 'mean-annual-st'}, inplace=True)
-    rdf.rename(columns={'rech': 'mean-annual-rech'}, inplace=True)
-    return rdf
+    n_months, n_scenarios = len(times), len(zr)
+    rdf = pd.DataFrame({
+        "zr": np.tile(zr, n_months),
+        "p": np.tile(p, n_months),
+        "datetime": np.repeat(times.astype("datetime64[ms]"), n_scenarios),
+    })
+    for band in ["pr", "pet", "apwl", "st", "rech"]:
+        rdf[f"mean-{band}"] = means[band].ravel().astype(np.float32)
+
+    return rdf.sort_values(["zr", "p", "datetime"], ignore_index=True)
+
+
+def date_chunks(start_date, end_date, chunk_days):
+    """Splits the period [start_date, end_date) into consecutive periods of at most chunk_days days."""
+    chunk_start = start_date
+    while chunk_start < end_date:
+        chunk_end = min(chunk_start + timedelta(days=chunk_days), end_date)
+        yield chunk_start, chunk_end
+        chunk_start = chunk_end
+
+
+def iter_daily_recharge_at_roi(roi, scale, start_date, end_date, fcm, wpm, zr=0.5, p=0.5,
+                               chunk_days=DAILY_CHUNK_DAYS):
+    """
+    Runs the water balance on a daily time step over the ROI.
+    The field capacity and wilting point are extracted once, the daily pr and pet chunk by chunk of
+    chunk_days days and evaluated with the local water balance, the APWL and ST state of every pixel being
+    carried from one chunk to the next, so the memory used only depends on the chunk size whatever the
+    length of the period. The chunks without data (e.g. the last days, not yet published) are skipped.
+    Yields one DataFrame per chunk indexed by day with the columns mean-pr, mean-pet, mean-apwl,
+    mean-st and mean-rech (mean across the ROI).
+    """
+    pixels, fc, wp = get_soil_water_at_roi(roi, scale, fcm, wpm)
+    with np.errstate(invalid="ignore"):
+        valid_soil = (fc >= 0) & (wp >= 0)
+    stfc = (fc - wp) * 1000 * zr * p
+
+    def meteo_chunks():
+        for chunk_start, chunk_end in date_chunks(start_date, end_date, chunk_days):
+            meteo = met_properties.get_daily_meteorological_data(chunk_start, chunk_end)
+            times, pr, pet = get_meteo_at_pixels(meteo, roi, scale, pixels, stage="daily water balance inputs")
+            if len(times) == 0:
+                logger.info(f"No meteorological data from {chunk_start} to {chunk_end}")
+            yield times, pr, pet
+
+    for (times, pr, pet), outputs in water_balance.run_chunks(meteo_chunks(), stfc):
+        outputs["rech"][:, ~valid_soil] = np.nan
+        outputs["pr"], outputs["pet"] = pr, pet
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            means = {}
+            for band in ["pr", "pet", "apwl", "st", "rech"]:
+                values = outputs[band]
+                valid = ~np.isnan(values)
+                means[f"mean-{band}"] = (np.where(valid, values, 0).sum(axis=1) / valid.sum(axis=1)).astype(np.float32)
+
+        yield pd.DataFrame(means, index=pd.DatetimeIndex(times.astype("datetime64[ms]"), name="datetime"))
+
+
+def get_daily_recharge_at_roi_df(roi, scale, start_date, end_date, fcm, wpm, zr=0.5, p=0.5,
+                                 chunk_days=DAILY_CHUNK_DAYS):
+    """
+    Computes the daily water balance over the ROI (see iter_daily_recharge_at_roi).
+    Returns a DataFrame indexed by day with the ROI mean of pr, pet, apwl, st and rech, empty if there is
+    no meteorological data in the period.
+    """
+    chunks = list(iter_daily_recharge_at_roi(roi, scale, start_date, end_date, fcm, wpm, zr, p, chunk_days))
+    if not chunks:
+        columns = [f"mean-{band}" for band in ["pr", "pet", "apwl", "st", "rech"]]
+        return pd.DataFrame(columns=columns, index=pd.DatetimeIndex([], name="datetime"), dtype=np.float32)
+    return pd.concat(chunks)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch jobs of the soil water recharge model.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    export = subparsers.add_parser("export", help="export the soil water properties of every (zr, p) pair")
+    export.add_argument("--asset-root", default=SOIL_WATER_ASSET_ROOT,
+                        help="Earth Engine folder of the assets (defaults to GWR_SOIL_WATER_ASSET_ROOT)")
+    export.add_argument("--bounds", type=float, nargs=4, metavar=("WEST", "SOUTH", "EAST", "NORTH"),
+                        help="region of the export (defaults to the whole globe)")
+    export.add_argument("--scale", type=int, default=SOIL_WATER_SCALE)
+
+    daily = subparsers.add_parser("daily", help="compute the daily water balance of a region of interest")
+    daily.add_argument("roi", help="GeoJSON, WKT or CSV file of the region of interest")
+    daily.add_argument("--start", type=date.fromisoformat, required=True)
+    daily.add_argument("--end", type=date.fromisoformat, required=True)
+    daily.add_argument("--zr", type=float, default=0.5)
+    daily.add_argument("--p", type=float, default=0.5)
+    daily.add_argument("--scale", type=int, default=1000)
+    daily.add_argument("--chunk-days", type=int, default=DAILY_CHUNK_DAYS)
+    daily.add_argument("--out", default="daily_recharge.csv")
+
+    sweep = subparsers.add_parser("sweep", help="compute the monthly recharge of a region for several zr and p")
+    sweep.add_argument("roi", help="GeoJSON, WKT or CSV file of the region of interest")
+    sweep.add_argument("--start", type=date.fromisoformat, required=True)
+    sweep.add_argument("--end", type=date.fromisoformat, required=True)
+    sweep.add_argument("--zr", type=float, nargs="+", default=SUPPORTED_ZR, help="root zone depths [in m]")
+    sweep.add_argument("--p", type=float, nargs="+", default=SUPPORTED_P, help="depletion fractions")
+    sweep.add_argument("--scale", type=int, default=1000)
+    sweep.add_argument("--out", default="recharge_sweep.csv")
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    if args.command == "export":
+        if not args.asset_root:
+            parser.error("--asset-root or GWR_SOIL_WATER_ASSET_ROOT is required")
+        ee.Initialize()
+        region = ee.Geometry.BBox(*args.bounds) if args.bounds else None
+        tasks = export_soil_water_assets(args.asset_root, scale=args.scale, region=region)
+        logger.info(f"{len(tasks)} export tasks started, follow them in the Earth Engine task manager")
+        return
+
+    with open(args.roi, "rb") as f:
+        roi = geometry.to_ee(geometry.normalize(geometry.parse_file(args.roi, f.read())))
+    ee.Initialize()
+
+    if args.command == "daily":
+        soil_water = get_soil_water_properties(args.zr, args.p)
+        with rate_limit.priority(rate_limit.BATCH):
+            rdf = get_daily_recharge_at_roi_df(roi, args.scale, args.start, args.end, soil_water.select("fc_mean"),
+                                               soil_water.select("wp_mean"), args.zr, args.p, args.chunk_days)
+        rdf.to_csv(args.out)
+        logger.info(f"{len(rdf)} days written to {args.out}")
+    else:
+        # The mean field capacity and wilting point do not depend on zr and p.
+        soil_water = get_soil_water_properties(args.zr[0], args.p[0])
+        meteo = met_properties.get_mean_monthly_meteorological_data(args.start, args.end)
+        with rate_limit.priority(rate_limit.BATCH):
+            rdf = sweep_recharge_at_roi_df(meteo, roi, args.scale, args.zr, args.p, soil_water.select("fc_mean"),
+                                           soil_water.select("wp_mean"))
+        rdf.to_csv(args.out, index=False)
+        logger.info(f"{len(rdf)} rows written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
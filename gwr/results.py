@@ -0,0 +1,114 @@
+import numpy as np
+import pandas as pd
+
+'''
+    Compact typed results of the monthly extractions.
+
+    A MonthlySeries stores the monthly ROI means as a single float32 array with one contiguous row per
+    column and an int64 index of epoch milliseconds, instead of a DataFrame with object/float64 columns,
+    a duplicated raw time column and a string date column. Charts and exports use zero-copy views of it.
+'''
+
+
+class MonthlySeries:
+    """
+    Monthly values of several columns (e.g. mean-pr, mean-pet) over a ROI.
+
+    index: (n_months,) int64 array of the month start times in epoch milliseconds
+    values: (n_columns, n_months) float32 array, values[i] is the series of columns[i]
+    columns: tuple of the column names
+    roi, scale, dataset: metadata describing the extraction
+    """
+
+    __slots__ = ("index", "values", "columns", "roi", "scale", "dataset")
+
+    def __init__(self, index, values, columns, roi=None, scale=None, dataset=None):
+        self.index = np.ascontiguousarray(index, dtype=np.int64)
+        self.values = np.ascontiguousarray(values, dtype=np.float32)
+        self.columns = tuple(columns)
+        self.roi = roi
+        self.scale = scale
+        self.dataset = dataset
+
+        if self.values.shape != (len(self.columns), len(self.index)):
+            raise ValueError(
+                f"values of shape {self.values.shape} do not match {len(self.columns)} columns "
+                f"and {len(self.index)} months"
+            )
+
+    def __getstate__(self):
+        return {slot: getattr(self, slot) for slot in self.__slots__}
+
+    def __setstate__(self, state):
+        for slot, value in state.items():
+            setattr(self, slot, value)
+
+    def __len__(self):
+        return len(self.index)
+
+    def __getitem__(self, column):
+        """Returns a zero-copy view of the values of a column."""
+        return self.values[self.columns.index(column)]
+
+    def __repr__(self):
+        return (f"MonthlySeries(dataset={self.dataset!r}, columns={list(self.columns)}, "
+                f"months={len(self)}, scale={self.scale})")
+
+    @property
+    def dates(self):
+        """Month start dates as a DatetimeIndex."""
+        return pd.DatetimeIndex(self.index.astype("datetime64[ms]"), name="datetime")
+
+    @property
+    def nbytes(self):
+        return self.index.nbytes + self.values.nbytes
+
+    def select(self, columns):
+        """Returns a MonthlySeries with a subset of the columns."""
+        rows = [self.columns.index(column) for column in columns]
+        return MonthlySeries(self.index, self.values[rows], columns, self.roi, self.scale, self.dataset)
+
+    def to_frame(self):
+        """
+        Returns a DataFrame indexed by month for display and CSV export.
+        The DataFrame wraps the float32 values without copying them where pandas allows it.
+        """
+        return pd.DataFrame(self.values.T, index=self.dates, columns=list(self.columns), copy=False)
+
+    @classmethod
+    def from_frame(cls, df, columns=None, **metadata):
+        """Builds a MonthlySeries from a DataFrame indexed by datetime."""
+        columns = list(columns or df.columns)
+        index = pd.DatetimeIndex(df.index).as_unit("ms").asi8
+        return cls(index, df[columns].to_numpy(dtype=np.float32).T, columns, **metadata)
+
+
+def region_columns(arr, bands):
+    """
+    Converts a client-side ee.ImageCollection.getRegion array into numpy columns.
+    Returns the int64 time column and a (n_bands, n_rows) float64 array (masked values are NaN).
+    """
+    header, rows = arr[0], arr[1:]
+    time = np.array([row[header.index("time")] for row in rows], dtype=np.int64)
+    values = np.array([[row[header.index(band)] for row in rows] for band in bands], dtype=np.float64)
+
+    return time, values.reshape(len(bands), len(rows))
+
+
+def region_to_monthly_series(arr, bands, prefix="mean-", **metadata):
+    """
+    Reduces a getRegion array to the mean of the sampled points for each date.
+    The grouping is vectorized with numpy (no pandas groupby) and NaN values are ignored.
+    """
+    time, values = region_columns(arr, bands)
+    index, group = np.unique(time, return_inverse=True)
+
+    valid = ~np.isnan(values)
+    means = np.empty((len(bands), len(index)), dtype=np.float32)
+    for i in range(len(bands)):
+        sums = np.bincount(group, weights=np.where(valid[i], values[i], 0.0), minlength=len(index))
+        counts = np.bincount(group, weights=valid[i], minlength=len(index))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            means[i] = sums / counts
+
+    return MonthlySeries(index, means, [prefix + band for band in bands], **metadata)
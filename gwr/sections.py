@@ -0,0 +1,77 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from gwr import instrumentation
+
+logger = logging.getLogger(__name__)
+
+'''
+    Schedules the independent sections of a page so that each one is rendered as soon as its data is available
+'''
+
+
+class SectionScheduler:
+    """
+    Runs the data extraction of each page section in a background thread and renders
+    the sections in the order in which their extraction completes.
+
+    The extraction functions must not call streamlit, they only fetch data (Earth Engine
+    calls, DataFrame building, map construction). The render functions are always called
+    from the thread that calls run(), which is the streamlit script thread.
+    """
+
+    def __init__(self, max_workers=6):
+        self.max_workers = max_workers
+        self._sections = []
+
+    def add(self, name, placeholder, extract, render, **attributes):
+        """
+        Registers a section.
+
+        name: (str) name of the section, used for logging and as the name of its timing span
+        placeholder: streamlit container (e.g. st.empty()) the section is rendered into
+        extract: (callable) function without arguments returning the data of the section
+        render: (callable) function called with (placeholder, data) once the data is available
+        attributes: extra attributes of the timing span (roi, scale, date_range...)
+        """
+        self._sections.append((name, placeholder, self._timed(name, extract, attributes), render))
+
+    @staticmethod
+    def _timed(name, extract, attributes):
+        def timed_extract():
+            # The Earth Engine calls made by the extraction are recorded as children of this span.
+            with instrumentation.span(name, stage=name, method=instrumentation.SECTION_METHOD, **attributes):
+                return extract()
+
+        return timed_extract
+
+    def run(self, on_error=None):
+        """
+        Starts the extraction of every registered section and renders each one as soon as
+        its extraction completes.
+        If the extraction or the rendering of a section fails, on_error is called with
+        (placeholder, exception) so that the other sections are still displayed.
+        """
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {
+                executor.submit(extract): (name, placeholder, render)
+                for name, placeholder, extract, render in self._sections
+            }
+
+            for future in as_completed(futures):
+                name, placeholder, render = futures[future]
+                try:
+                    data = future.result()
+                except Exception as e:
+                    logger.exception(f"Extraction of section '{name}' failed")
+                    if on_error is not None:
+                        on_error(placeholder, e)
+                    continue
+
+                try:
+                    render(placeholder, data)
+                except Exception as e:
+                    logger.exception(f"Rendering of section '{name}' failed")
+                    if on_error is not None:
+                        on_error(placeholder, e)
+
+        self._sections = []
@@ -0,0 +1,75 @@
+import logging
+import threading
+from concurrent.futures import Future
+
+logger = logging.getLogger(__name__)
+
+'''
+    In-process coalescing of identical in-flight computations ("single-flight").
+
+    When several sessions request the same computation at the same time (e.g. the same ROI after a
+    shared link goes out) only the first caller runs it, the duplicate callers wait for the future of
+    the first call and receive its result (or its exception) instead of issuing their own backend call.
+'''
+
+
+class SingleFlight:
+    """Registry of the in-flight computations of the process, keyed by request fingerprint."""
+
+    def __init__(self):
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.coalesced = 0
+
+    def do(self, key, fn):
+        """
+        Returns fn(), unless a computation with the same key is already running in which
+        case its result is awaited and returned instead.
+
+        key: (str) canonical fingerprint of the request
+        fn: (callable) function without arguments computing the result
+        """
+        with self._lock:
+            future = self._in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._in_flight[key] = future
+                self.calls += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            logger.debug(f"Waiting for the in-flight computation {key}")
+            return future.result()
+
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+
+    def in_flight(self):
+        """Returns the number of computations currently running."""
+        with self._lock:
+            return len(self._in_flight)
+
+
+_registry = SingleFlight()
+
+
+def do(key, fn):
+    """Runs fn() through the process wide single-flight registry."""
+    return _registry.do(key, fn)
+
+
+def get_registry():
+    """Returns the process wide single-flight registry."""
+    return _registry
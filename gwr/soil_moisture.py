@@ -1,14 +1,14 @@
 import ee
-from gwr import ee_utils
-import pandas as pd
+from gwr import cache, datasets, ee_utils, results
+
+SMAP_DATASET = "smap"
+
+# The soil moisture bands are states (mm of water in the layer), so the monthly value is their mean.
+SMAP_AGGREGATION = {"ssm": "mean", "susm": "mean"}
 
 
 def get_smap_soil_moisture_for_dates(start_date, end_date):
-    return (
-        ee.ImageCollection("NASA_USDA/HSL/SMAP10KM_soil_moisture")
-            .select(["ssm", "susm"])
-            .filterDate(start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d'))
-    )
+    return datasets.get(SMAP_DATASET).collection(start_date, end_date, ["ssm", "susm"])
 
 
 def get_mean_monthly_smap_data(start_date, end_date):
@@ -16,39 +16,33 @@ def get_mean_monthly_smap_data(start_date, end_date):
     Returns an ImageCollection that combines the SMAP soil moisture data for a region
     across a time period resampled to provide monthly mean values.
     """
+    # Short-circuit the periods without SMAP data instead of resampling an empty collection.
+    if not datasets.get(SMAP_DATASET).covers(start_date, end_date):
+        return ee.ImageCollection([])
+
     smap = get_smap_soil_moisture_for_dates(start_date, end_date)
 
-    # Apply the resampling function to the SMAP soil moisture dataset.
-    smap_m = ee_utils.sum_resampler(smap, 1, "month", 1, ["ssm", "susm"])
+    # Resample both bands on calendar months starting at start_date in a single pass.
+    smap_m = ee_utils.temporal_resampler(
+        smap, 1, "month", SMAP_AGGREGATION, start_date=start_date.strftime('%Y-%m-01')
+    )
 
     return smap_m
 
 
-def get_mean_monthly_smap_data_for_roi_df(roi, scale, smapImageCollection):
+def get_mean_monthly_smap_data_for_roi(roi, scale, smapImageCollection):
+    """
+    Returns a MonthlySeries with the columns mean-ssm and mean-susm: the mean across the ROI
+    of the surface and subsurface soil moisture.
+    """
     # Import SMAP soil moisture data as an array at the location of interest.
-    smap_arr = smapImageCollection.getRegion(roi, scale).getInfo()
+    smap_arr = cache.get_info(
+        smapImageCollection.getRegion(roi, scale), "getRegion", stage="soil moisture", method="getRegion",
+        asset_id=datasets.get(SMAP_DATASET).resolve_asset_id(), roi=roi, scale=scale)
 
-    # Transform the array into a pandas DataFrame and sort the index.
     # Data for the ROI may have multiple sample points within ROI for a date, so group by date and take the mean.
-    # To avoid losing the datetime and time fields (used elsewhere), group by both and then remove time from the index.
-    smap_df = ee_utils.ee_array_to_df(smap_arr, ["ssm", "susm"]).groupby(['datetime', 'time']).mean().sort_values(
-        "datetime")
-    smap_df.reset_index(level='time', inplace=True)
-    smap_df.rename(columns={'ssm': 'mean-ssm', 'susm': 'mean-susm'}, inplace=True)
-    smap_df["date"] = smap_df.index.strftime("%m-%Y")
-
-    return smap_df
-
+    return results.region_to_monthly_series(smap_arr, ["ssm", "susm"], roi=roi, scale=scale, dataset="smap")
 
-def get_combined_dataframe(start_date, end_date, roi, scale):
-    # Retrieve the SMAP soil moisture ImageCollection for the specified date range
-    smap_collection = get_smap_soil_moisture_for_dates(start_date, end_date)
 
-    # Get the monthly mean SMAP data for the ROI as separate DataFrames
-    smap_ssm = get_mean_monthly_smap_data_for_roi_df(roi, scale, smap_collection.select("ssm"))
-    smap_susm = get_mean_monthly_smap_data_for_roi_df(roi, scale, smap_collection.select("susm"))
-
-    # Merge the two DataFrames based on the common date column
-    combined_df = pd.merge(smap_ssm, smap_susm, on="date")
-
-    return combined_df
+def get_mean_monthly_smap_data_for_roi_df(roi, scale, smapImageCollection):
+    return get_mean_monthly_smap_data_for_roi(roi, scale, smapImageCollection).to_frame()
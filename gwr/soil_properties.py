@@ -1,16 +1,21 @@
-import ee
 import logging
-import numpy as np
 import pandas as pd
+from gwr import cache, datasets
 
 logger = logging.getLogger(__name__)
 
+# Names of the OpenLandMap soil content datasets in the registry.
+SOIL_DATASETS = ["sand", "clay", "orgc"]
+
+# Conversion factor of the organic carbon content into organic matter content.
+ORGC_TO_ORGM = 1.724
+
 
 def convert_orgc_to_orgm(org_c):
     ''' 
         Converts organic carbon content into organic matter content.
     '''
-    return org_c.multiply(1.724)
+    return org_c.multiply(ORGC_TO_ORGM)
 
 
 def get_soil_prop(soil_type):
@@ -21,28 +26,12 @@ def get_soil_prop(soil_type):
         "clay"     - Clay fraction
         "orgc"     - Organic Carbon fraction
     """
-    if soil_type == "sand":  # Sand fraction [%w]
-        snippet = "OpenLandMap/SOL/SOL_SAND-WFRACTION_USDA-3A1A1A_M/v02"
-        # Define the scale factor in accordance with the dataset description.
-        scale_factor = 1 * 0.01
-
-    elif soil_type == "clay":  # Clay fraction [%w]
-        snippet = "OpenLandMap/SOL/SOL_CLAY-WFRACTION_USDA-3A1A1A_M/v02"
-        # Define the scale factor in accordance with the dataset description.
-        scale_factor = 1 * 0.01
-
-    elif soil_type == "orgc":  # Organic Carbon fraction [g/kg]
-        snippet = "OpenLandMap/SOL/SOL_ORGANIC-CARBON_USDA-6A1C_M/v02"
-        # Define the scale factor in accordance with the dataset description.
-        scale_factor = 5 * 0.001  # to get kg/kg
-    else:
+    if soil_type not in SOIL_DATASETS:
         logger.error(f"The soil property '{soil_type} was not recognised")
         return None
 
-    # Apply the scale factor to the ee.Image.
-    dataset = ee.Image(snippet).multiply(scale_factor)
-
-    return dataset
+    # The scale factor of the dataset description is applied to the ee.Image.
+    return datasets.get(soil_type).image()
 
 
 def get_local_soil_profile_at_poi(dataset, roi, buffer, olm_bands):
@@ -52,7 +41,9 @@ def get_local_soil_profile_at_poi(dataset, roi, buffer, olm_bands):
     # # Names of bands associated with reference depths.
     # olm_bands = ["b" + str(sd) for sd in olm_depths]
     # Get properties at the location of interest and transfer to client-side.
-    prop = dataset.sample(roi, buffer).select(olm_bands).getInfo()
+    prop = cache.get_info(
+        dataset.sample(roi, buffer).select(olm_bands), "sample", stage="soil profile", method="sample",
+        roi=roi, scale=buffer)
 
     # Initialize an empty list to store dictionaries for each ID
     data_dicts = []
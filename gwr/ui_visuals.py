@@ -1,11 +1,37 @@
-import matplotlib.pyplot as plt
+import base64
+import io
+import threading
+from functools import lru_cache
+
 import numpy as np
+from gwr import results
 
 '''
     Contains  set of functions that generate visualisations used in the application
 '''
 
 
+def subplots(**kwargs):
+    # matplotlib is only imported when the first chart is generated, it is not needed to start the page.
+    import matplotlib.pyplot as plt
+    return plt.subplots(**kwargs)
+
+
+def as_monthly_series(data):
+    """Accepts a MonthlySeries or a DataFrame indexed by datetime with mean-* columns."""
+    if isinstance(data, results.MonthlySeries):
+        return data
+    return results.MonthlySeries.from_frame(data, [c for c in data.columns if c.startswith("mean-")])
+
+
+def format_monthly_axis(ax):
+    import matplotlib.dates as mdates
+
+    # Define the date format of the x-labels.
+    ax.xaxis.set_major_formatter(mdates.DateFormatter("%m-%Y"))
+    ax.figure.autofmt_xdate()
+
+
 # Definition of a function to attach a label to each bar.
 def autolabel_soil_prop(ax, rects):
     """Attach a text label above each bar in *rects*, displaying its height."""
@@ -25,10 +51,13 @@ def autolabel_soil_prop(ax, rects):
 def generate_pr_pet_rech_graph(recharge_df):
     '''
     Generates a line graph comparing Precipitation, Potential Evapotranspiration and Groundwater Recharge over time from a dataframe
-    The recharge_df must contain the columns "pr", "pet", "rech" 
+    The recharge_df (MonthlySeries or DataFrame) must contain the columns "mean-pr", "mean-pet", "mean-rech"
     '''
+    recharge_df = as_monthly_series(recharge_df)
+    dates = recharge_df.dates
+
     # Data visualization in the form of line.
-    fig, ax = plt.subplots(figsize=(15, 6))
+    fig, ax = subplots(figsize=(15, 6))
 
     # Title of the plot.
     ax.set_title(
@@ -37,15 +66,13 @@ def generate_pr_pet_rech_graph(recharge_df):
     )
 
     # Barplot associated with precipitation.
-    recharge_df["mean-pr"].plot(kind="line", ax=ax, label="precipitation")
+    ax.plot(dates, recharge_df["mean-pr"], label="precipitation")
 
     # Barplot associated with potential evapotranspiration.
-    recharge_df["mean-pet"].plot(
-        kind="line", ax=ax, label="potential evapotranspiration", color="orange"
-    )
+    ax.plot(dates, recharge_df["mean-pet"], label="potential evapotranspiration", color="orange")
 
     # Barplot associated with groundwater recharge
-    recharge_df["mean-rech"].plot(kind="line", ax=ax, label="recharge", color="green")
+    ax.plot(dates, recharge_df["mean-rech"], label="recharge", color="green")
 
     # Add a legend.
     ax.legend(loc='upper right')
@@ -55,15 +82,17 @@ def generate_pr_pet_rech_graph(recharge_df):
     ax.set_xlabel(None)
 
     # Define the date format and shape of x-labels.
-    x_labels = recharge_df.index.strftime("%m-%Y").to_list()
-    ax.set_xticks(x_labels)
+    format_monthly_axis(ax)
 
     return fig
 
 
 def generate_pr_pet_graph(meteo_df):
+    meteo_df = as_monthly_series(meteo_df)
+    dates = meteo_df.dates
+
     # Data visualization
-    fig, ax = plt.subplots(figsize=(15, 6))
+    fig, ax = subplots(figsize=(15, 6))
 
     # Title of the plot.
     ax.set_title(
@@ -71,11 +100,11 @@ def generate_pr_pet_graph(meteo_df):
     )
 
     # Lineplot associated with precipitations.
-    meteo_df["mean-pr"].plot(kind="line", ax=ax, label="Mean Precipitation")
+    ax.plot(dates, meteo_df["mean-pr"], label="Mean Precipitation")
 
     # Lineplot associated with potential evapotranspiration.
-    meteo_df["mean-pet"].plot(
-        kind="line", ax=ax, label="Mean Potential Evapotranspiration", color="orange", alpha=0.5
+    ax.plot(
+        dates, meteo_df["mean-pet"], label="Mean Potential Evapotranspiration", color="orange", alpha=0.5
     )
 
     # Add a legend.
@@ -86,14 +115,13 @@ def generate_pr_pet_graph(meteo_df):
     ax.set_xlabel(None)
 
     # Define the date format and shape of x-labels.
-    x_labels = meteo_df['date'].to_list()
-    ax.set_xticks(x_labels)
+    format_monthly_axis(ax)
 
     return fig
 
 
 def generate_hydraulic_props_chart(profile_wp, profile_fc, olm_bands, olm_depths):
-    fig, ax = plt.subplots(figsize=(15, 6))
+    fig, ax = subplots(figsize=(15, 6))
     ax.axes.get_yaxis().set_visible(False)
 
     # Definition of the label locations.
@@ -153,7 +181,7 @@ def generate_hydraulic_props_chart(profile_wp, profile_fc, olm_bands, olm_depths
 def generate(profile_sand, profile_clay, profile_orgc, olm_bands, olm_depths):
     # Data visualization in the form of a bar plot.
     # Create the plot
-    fig, ax = plt.subplots(figsize=(15, 6))
+    fig, ax = subplots(figsize=(15, 6))
     ax.axes.get_yaxis().set_visible(False)
 
     # Definition of label locations.
@@ -219,8 +247,11 @@ def generate(profile_sand, profile_clay, profile_orgc, olm_bands, olm_depths):
     return fig
 
 def generate_soil_moisture_graph(soilmois_df):
+    soilmois_df = as_monthly_series(soilmois_df)
+    dates = soilmois_df.dates
+
     # Data visualization
-    fig, ax = plt.subplots(figsize=(15, 6))
+    fig, ax = subplots(figsize=(15, 6))
 
     # Title of the plot.
     ax.set_title(
@@ -228,12 +259,10 @@ def generate_soil_moisture_graph(soilmois_df):
     )
 
     # Lineplot associated with precipitations.
-    soilmois_df["mean-ssm"].plot(kind="line", ax=ax, label="Mean Soil Moisture")
+    ax.plot(dates, soilmois_df["mean-ssm"], label="Mean Soil Moisture")
 
     # Lineplot associated with potential evapotranspiration.
-    soilmois_df["mean-susm"].plot(
-        kind="line", ax=ax, label="Mean Sub Soil ", color="orange", alpha=0.5
-    )
+    ax.plot(dates, soilmois_df["mean-susm"], label="Mean Sub Soil ", color="orange", alpha=0.5)
 
     # Add a legend.
     ax.legend(loc='upper right')
@@ -243,7 +272,52 @@ def generate_soil_moisture_graph(soilmois_df):
     ax.set_xlabel(None)
 
     # Define the date format and shape of x-labels.
-    x_labels = soilmois_df['date']
-    ax.set_xticks(x_labels)
+    format_monthly_axis(ax)
+
+    return fig
+
+
+# matplotlib figures are rendered one at a time as the colorbars are generated from the map threads.
+_colorbar_lock = threading.Lock()
+
+
+@lru_cache(maxsize=256)
+def colorbar_png(palette, vmin, vmax, label, size=(3.6, 0.6), dpi=100):
+    """
+    Renders a horizontal colorbar as a PNG image.
+    The images are cached per (palette, vmin, vmax, label, size): each legend of the maps is only rendered
+    once per process and then reused by every rerun and session.
+
+    palette: (tuple) colors of the palette (tuple, so that it can be used as cache key)
+    size: (tuple) width and height of the image [in inches]
+    """
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.colorbar import ColorbarBase
+    from matplotlib.colors import LinearSegmentedColormap, Normalize
+    from matplotlib.figure import Figure
+
+    with _colorbar_lock:
+        # The Figure API is used instead of pyplot, which is not thread-safe.
+        fig = Figure(figsize=size, dpi=dpi)
+        FigureCanvasAgg(fig)
+        ax = fig.add_axes([0.05, 0.65, 0.9, 0.25])
+        cmap = LinearSegmentedColormap.from_list("palette", list(palette))
+        colorbar = ColorbarBase(ax, cmap=cmap, norm=Normalize(vmin=vmin, vmax=vmax), orientation="horizontal")
+        colorbar.set_label(label, fontsize=6)
+        colorbar.ax.tick_params(labelsize=6)
+
+        buffer = io.BytesIO()
+        fig.savefig(buffer, format="png", transparent=True)
+
+    return buffer.getvalue()
+
+
+def colorbar_data_uri(palette, vmin, vmax, label, size=(3.6, 0.6)):
+    """Returns the colorbar PNG image as a data URI, ready to be used as the source of an image."""
+    return _colorbar_data_uri(tuple(palette), vmin, vmax, label, tuple(size))
+
 
-    return fig
\ No newline at end of file
+@lru_cache(maxsize=256)
+def _colorbar_data_uri(palette, vmin, vmax, label, size):
+    # The base64 encoding is cached as well, the same string is sent for every rerun.
+    return "data:image/png;base64," + base64.b64encode(colorbar_png(palette, vmin, vmax, label, size)).decode()
@@ -0,0 +1,162 @@
+import numpy as np
+
+'''
+    Local (numpy) implementation of the soil water balance model of recharge_properties.compute_recharge.
+
+    The server-side model iterates over the images of a collection, so every scenario or time step costs
+    a node of the Earth Engine graph. This kernel runs the same equations on arrays of any shape (pixels,
+    scenarios...) with a Python loop over the time steps only, and accepts and returns the soil state
+    (APWL and ST) so that a long period can be evaluated chunk by chunk.
+'''
+
+# Maximum number of values per band held in memory at once by sweep.
+MAX_SWEEP_ELEMENTS = 20_000_000
+
+
+class WaterBalanceState:
+    """
+    Hydric state of the soil between two time steps.
+
+    apwl: accumulated potential water loss [mm]
+    st: water stored in the soil [mm]
+    """
+
+    __slots__ = ("apwl", "st")
+
+    def __init__(self, apwl, st):
+        self.apwl = apwl
+        self.st = st
+
+    def __repr__(self):
+        return f"WaterBalanceState(shape={np.shape(self.st)})"
+
+
+def initial_state(stfc):
+    """State at the start of the model: no water loss and the soil at field capacity."""
+    stfc = np.asarray(stfc, dtype=np.float64)
+    return WaterBalanceState(np.zeros_like(stfc), stfc.copy())
+
+
+def step(pr, pet, stfc, state):
+    """
+    Runs one time step of the water balance.
+    Returns the recharge of the step and the new state.
+    Where pr or pet is missing (NaN) the recharge is NaN, APWL is reset and ST is kept as in the
+    server-side model.
+    """
+    apwl = np.zeros(np.broadcast(pr, pet, stfc, state.st).shape)
+    st = np.broadcast_to(state.st, apwl.shape).copy()
+    rech = np.zeros_like(apwl)
+
+    with np.errstate(invalid="ignore", divide="ignore", over="ignore"):
+        # CASE 1: PET > P, the soil dries out.
+        zone1 = pet > pr
+        zone1_apwl = state.apwl + (pet - pr)
+        zone1_st = state.st * np.exp(-zone1_apwl / stfc)
+        np.copyto(apwl, zone1_apwl, where=zone1)
+        np.copyto(st, zone1_st, where=zone1)
+
+        # CASE 2: PET <= P, the soil is refilled.
+        zone2 = pet <= pr
+        zone2_st = state.st + pr - pet
+        np.copyto(st, zone2_st, where=zone2)
+
+        # CASE 2.1: the soil reaches field capacity, the surplus is recharge.
+        zone21 = zone2 & (zone2_st >= stfc)
+        np.copyto(rech, zone2_st - stfc, where=zone21)
+        np.copyto(st, np.broadcast_to(stfc, st.shape), where=zone21)
+
+        # CASE 2.2: the soil stays below field capacity.
+        zone22 = zone2 & (zone2_st < stfc)
+        zone22_apwl = -stfc * np.log(zone2_st / stfc)
+        np.copyto(apwl, zone22_apwl, where=zone22)
+
+    # The recharge is only defined where PET and P are available.
+    np.copyto(rech, np.nan, where=~(zone1 | zone2))
+
+    return rech, WaterBalanceState(apwl, st)
+
+
+def run(pr, pet, stfc, state=None, dtype=np.float32):
+    """
+    Runs the water balance over the time steps of pr and pet.
+
+    pr, pet: (n_steps, ...) arrays of precipitation and potential evapotranspiration [mm]
+    stfc: stored water at field capacity [mm], broadcastable with pr[0] (e.g. (n_scenarios, n_pixels))
+    state: WaterBalanceState at the start of the period, defaults to initial_state(stfc)
+    Returns a dict of (n_steps, ...) arrays rech, apwl and st, and the state at the end of the period.
+    """
+    pr = np.asarray(pr, dtype=np.float64)
+    pet = np.asarray(pet, dtype=np.float64)
+    stfc = np.asarray(stfc, dtype=np.float64)
+    if state is None:
+        state = initial_state(stfc)
+
+    shape = (len(pr),) + np.broadcast(pr[0], pet[0], stfc, state.st).shape
+    outputs = {band: np.empty(shape, dtype=dtype) for band in ("rech", "apwl", "st")}
+
+    for t in range(len(pr)):
+        rech, state = step(pr[t], pet[t], stfc, state)
+        outputs["rech"][t] = rech
+        outputs["apwl"][t] = state.apwl
+        outputs["st"][t] = state.st
+
+    return outputs, state
+
+
+def run_chunks(chunks, stfc, state=None, dtype=np.float32):
+    """
+    Runs the water balance over consecutive chunks of time steps, the state at the end of a chunk being
+    the state at the start of the next one, so the result is the same as a single run over the whole period.
+
+    chunks: iterable of (times, pr, pet), pr and pet being (n_steps, ...) arrays, the chunks without any
+            time step (e.g. the last days not yet published) are skipped
+    Yields each chunk and its outputs (see run).
+    """
+    for chunk in chunks:
+        _, pr, pet = chunk
+        if len(pr) == 0:
+            continue
+        outputs, state = run(pr, pet, stfc, state, dtype)
+        yield chunk, outputs
+
+
+def sweep(pr, pet, fc, wp, zr_values, p_values):
+    """
+    Runs the local water balance for all the combinations of root depths and depletion fractions at once.
+
+    pr, pet: (n_months, n_pixels) arrays
+    fc, wp: (n_pixels,) mean field capacity and wilting point
+    zr_values, p_values: sequences of root zone depths [in m] and depletion fractions
+    Returns the (n_scenarios,) zr and p of each scenario and a dict of (n_months, n_scenarios) arrays
+    with the ROI mean of pr, pet, apwl, st and rech.
+    """
+    zr, p = (np.array(v, dtype=np.float64).ravel() for v in np.meshgrid(zr_values, p_values, indexing="ij"))
+    n_months, n_pixels = pr.shape
+
+    # The masked pixels (urban areas, water...) are excluded as in the server-side model.
+    with np.errstate(invalid="ignore"):
+        valid_soil = (fc >= 0) & (wp >= 0)
+    stfc = (fc - wp)[None, :] * 1000 * zr[:, None] * p[:, None]
+
+    sums = {band: np.zeros((n_months, len(zr))) for band in ("apwl", "st", "rech")}
+    counts = {band: np.zeros((n_months, len(zr))) for band in ("apwl", "st", "rech")}
+
+    # The pixels are processed in chunks so that the scenarios x months x pixels arrays stay bounded.
+    chunk = max(1, MAX_SWEEP_ELEMENTS // max(n_months * len(zr), 1))
+    for start in range(0, n_pixels, chunk):
+        pixels = slice(start, start + chunk)
+        outputs, _ = run(pr[:, None, pixels], pet[:, None, pixels], stfc[:, pixels])
+        outputs["rech"][:, :, ~valid_soil[pixels]] = np.nan
+
+        for band, values in outputs.items():
+            valid = ~np.isnan(values)
+            sums[band] += np.where(valid, values, 0).sum(axis=2)
+            counts[band] += valid.sum(axis=2)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = {band: sums[band] / counts[band] for band in sums}
+        means["pr"] = np.broadcast_to(np.nanmean(pr, axis=1)[:, None], (n_months, len(zr)))
+        means["pet"] = np.broadcast_to(np.nanmean(pet, axis=1)[:, None], (n_months, len(zr)))
+
+    return zr, p, means
@@ -0,0 +1,229 @@
+import argparse
+import logging
+import os
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+import ee
+import numpy as np
+import pandas as pd
+from gwr import cache, datasets, geometry, monthly_cube, pipeline, rate_limit
+
+logger = logging.getLogger(__name__)
+
+'''
+    Bulk sampling of the soil, hydraulic, recharge and soil moisture data at a network of wells.
+
+    The wells are read from a CSV or Parquet table with an id, longitude and latitude column. Instead of one
+    request per well and dataset, the wells are sent in chunks as a FeatureCollection and all the data is
+    read with one reduceRegions call per chunk and kind of data:
+        - the profiles: a single image stacking the sand, clay, organic carbon, field capacity and wilting
+          point bands of all the depths,
+        - the monthly cube (pr, pet, apwl, st, rech, ssm, susm) flattened into a single image with toBands.
+    The chunks run in parallel through the rate limiter at batch priority.
+
+    The results are one wide frame of the profiles (one row per well) and one long frame of the monthly
+    values (one row per well and month).
+'''
+
+# Number of wells per backend request of the profiles.
+CHUNK_SIZE = 1000
+
+# Maximum number of values (wells x bands) returned by a single request of the monthly cube.
+MAX_VALUES_PER_REQUEST = 500000
+
+# Number of chunks requested at once.
+SAMPLING_WORKERS = 8
+
+PROFILE_IMAGES = ["sand", "clay", "orgc", "field_capacity", "wilting_point"]
+
+ID_COLUMNS = ("well_id", "id", "name")
+LONGITUDE_COLUMNS = ("longitude", "lon", "lng", "x")
+LATITUDE_COLUMNS = ("latitude", "lat", "y")
+
+WellSamples = namedtuple("WellSamples", ["profiles", "monthly"])
+
+
+def find_column(df, candidates, kind):
+    columns = {column.lower(): column for column in df.columns}
+    for candidate in candidates:
+        if candidate in columns:
+            return columns[candidate]
+    raise geometry.GeometryError(f"No {kind} column found, expected one of {candidates}")
+
+
+def read_wells(path):
+    """
+    Reads the well table (CSV, or Parquet for a .parquet / .pq file).
+    Returns a DataFrame with the columns well_id, longitude and latitude, the longitudes brought back
+    into [-180, 180].
+    """
+    if os.path.splitext(path)[1].lower() in (".parquet", ".pq"):
+        df = pd.read_parquet(path)
+    else:
+        df = pd.read_csv(path)
+    return normalize_wells(df)
+
+
+def normalize_wells(df):
+    """Returns the well_id, longitude and latitude columns of a well table, validated and normalized."""
+    lon_column = find_column(df, LONGITUDE_COLUMNS, "longitude")
+    lat_column = find_column(df, LATITUDE_COLUMNS, "latitude")
+    try:
+        id_column = find_column(df, ID_COLUMNS, "id")
+        ids = df[id_column].astype(str)
+    except geometry.GeometryError:
+        ids = pd.Series(df.index.astype(str), index=df.index)
+
+    points = df[[lon_column, lat_column]].to_numpy(dtype=np.float64)
+    geometry.validate_points(points)
+    if ids.duplicated().any():
+        raise geometry.GeometryError("The well ids must be unique")
+
+    # Each well is wrapped individually, unlike the vertices of a polygon.
+    longitude = (points[:, 0] + 180) % 360 - 180
+    return pd.DataFrame({
+        "well_id": ids.to_numpy(),
+        "longitude": np.round(longitude, geometry.COORDINATE_DECIMALS),
+        "latitude": np.round(points[:, 1], geometry.COORDINATE_DECIMALS),
+    })
+
+
+def wells_to_ee(wells):
+    """Converts a chunk of the well table into an ee.FeatureCollection of points carrying their well_id."""
+    return ee.FeatureCollection([
+        ee.Feature(ee.Geometry.Point([lon, lat]), {"well_id": well_id})
+        for well_id, lon, lat in zip(wells["well_id"], wells["longitude"], wells["latitude"])
+    ])
+
+
+def chunks(wells, size):
+    return [wells.iloc[start:start + size] for start in range(0, len(wells), size)]
+
+
+def reduce_regions(image, wells, scale, stage):
+    """
+    Returns the values of the bands of the image at each well of the chunk, as a list of property dicts.
+    reduceRegions is used rather than sampleRegions, which drops the wells where any band is masked.
+    """
+    features = image.reduceRegions(wells_to_ee(wells), ee.Reducer.first(), scale)
+    # Only the properties are transferred, not the point geometries.
+    properties = features.map(lambda f: ee.Feature(None, f.toDictionary()))
+    result = cache.get_info(properties, "reduceRegions", stage=stage, method="reduceRegions",
+                            wells=len(wells), scale=scale)
+    return [feature["properties"] for feature in result["features"]]
+
+
+def map_chunks(fn, wells, size):
+    """Calls fn on each chunk of wells in parallel, at batch priority. Returns the results in order."""
+    def run(chunk):
+        with rate_limit.priority(rate_limit.BATCH):
+            return fn(chunk)
+
+    with ThreadPoolExecutor(max_workers=SAMPLING_WORKERS) as executor:
+        return list(executor.map(run, chunks(wells, size)))
+
+
+def profile_image():
+    """Returns the image stacking the profiles of the soil images, with the bands <image>_<depth band>."""
+    soil = pipeline.soil_images()
+    return ee.Image.cat([
+        getattr(soil, name).select(datasets.OLM_BANDS, [f"{name}_{band}" for band in datasets.OLM_BANDS])
+        for name in PROFILE_IMAGES
+    ])
+
+
+def sample_profiles(wells, scale=250, chunk_size=CHUNK_SIZE):
+    """
+    Samples the soil content and hydraulic profiles at the wells.
+    Returns the well table with one column <image>_<depth band> per image and depth (e.g. sand_b0).
+    """
+    image = profile_image()
+    columns = [f"{name}_{band}" for name in PROFILE_IMAGES for band in datasets.OLM_BANDS]
+
+    results = map_chunks(lambda chunk: reduce_regions(image, chunk, scale, "well profiles"), wells, chunk_size)
+    rows = [row for chunk_rows in results for row in chunk_rows]
+    values = pd.DataFrame(rows, columns=["well_id"] + columns).set_index("well_id").astype(np.float64)
+    return wells.join(values, on="well_id")
+
+
+def sample_monthly(wells, inputs, chunk_size=CHUNK_SIZE):
+    """
+    Samples the monthly cube (meteorological data, water balance and soil moisture) at the wells.
+    inputs: (PipelineInputs) period, root zone depth and depletion fraction, its roi is not used
+    Returns a long DataFrame with the columns well_id, datetime and the bands of the cube.
+    """
+    cube = pipeline.monthly_cube_collection(inputs)
+    times = cache.get_info(cube.aggregate_array("system:time_start"), "aggregate_array", stage="well monthly",
+                           method="aggregate_array")
+    bands = monthly_cube.CUBE_BANDS
+    if not times:
+        # No month with meteorological data in the period, nothing to sample.
+        return pd.DataFrame({
+            "well_id": pd.Series(dtype=object),
+            "datetime": pd.Series(dtype="datetime64[ms]"),
+            **{band: pd.Series(dtype=np.float32) for band in bands},
+        })
+
+    # The collection is flattened into one image with the bands <month>_<band>.
+    names = [f"m{i}_{band}" for i in range(len(times)) for band in bands]
+    image = cube.toBands().rename(names)
+
+    # The chunks are smaller than for the profiles so that a response stays below MAX_VALUES_PER_REQUEST.
+    chunk_size = max(1, min(chunk_size, MAX_VALUES_PER_REQUEST // max(len(names), 1)))
+    results = map_chunks(lambda chunk: reduce_regions(image, chunk, inputs.scale, "well monthly"), wells, chunk_size)
+    rows = [row for chunk_rows in results for row in chunk_rows]
+
+    # Reshape the (n_wells, n_months x n_bands) values into the long frame.
+    ids = np.array([row["well_id"] for row in rows], dtype=object)
+    # Masked values are missing or null, both converted to NaN.
+    values = np.array([[row.get(name) for name in names] for row in rows], dtype=np.float64)
+    values = values.reshape(len(rows) * len(times), len(bands))
+
+    df = pd.DataFrame(values.astype(np.float32), columns=bands)
+    df.insert(0, "datetime", np.tile(np.array(times, dtype="datetime64[ms]"), len(rows)))
+    df.insert(0, "well_id", np.repeat(ids, len(times)))
+    return df
+
+
+def sample_wells(wells, start_date, end_date, zr=0.5, p=0.5, scale=1000, profile_scale=250):
+    """
+    Samples the profiles and the monthly cube at all the wells.
+    wells: DataFrame of the wells (see read_wells)
+    Returns WellSamples(profiles, monthly).
+    """
+    inputs = pipeline.PipelineInputs(None, scale, start_date, end_date, zr=zr, p=p)
+    return WellSamples(sample_profiles(wells, profile_scale), sample_monthly(wells, inputs))
+
+
+def write_frame(df, path):
+    if os.path.splitext(path)[1].lower() in (".parquet", ".pq"):
+        df.to_parquet(path, index=False)
+    else:
+        df.to_csv(path, index=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sample the groundwater recharge data at a network of wells.")
+    parser.add_argument("wells", help="CSV or Parquet table of the wells (id, longitude, latitude)")
+    parser.add_argument("--start", type=date.fromisoformat, required=True)
+    parser.add_argument("--end", type=date.fromisoformat, required=True)
+    parser.add_argument("--zr", type=float, default=0.5)
+    parser.add_argument("--p", type=float, default=0.5)
+    parser.add_argument("--scale", type=int, default=1000)
+    parser.add_argument("--profiles", default="well_profiles.csv")
+    parser.add_argument("--monthly", default="well_monthly.csv")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    ee.Initialize()
+    wells = read_wells(args.wells)
+    samples = sample_wells(wells, args.start, args.end, args.zr, args.p, args.scale)
+    write_frame(samples.profiles, args.profiles)
+    write_frame(samples.monthly, args.monthly)
+    logger.info(f"{len(wells)} wells sampled into {args.profiles} and {args.monthly}")
+
+
+if __name__ == "__main__":
+    main()
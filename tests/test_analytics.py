@@ -0,0 +1,79 @@
+import math
+
+import numpy as np
+import pytest
+from gwr import analytics
+
+
+def brute_force_mann_kendall(series):
+    # Direct implementation of the Mann-Kendall statistic and of its variance with the tie correction.
+    x = series[~np.isnan(series)]
+    n = len(x)
+    s = sum(np.sign(x[j] - x[i]) for i in range(n) for j in range(i + 1, n))
+    _, ties = np.unique(x, return_counts=True)
+    var_s = (n * (n - 1) * (2 * n + 5) - sum(t * (t - 1) * (2 * t + 5) for t in ties)) / 18
+    return s, var_s
+
+
+def brute_force_sens_slope(series):
+    t = np.flatnonzero(~np.isnan(series))
+    slopes = [(series[b] - series[a]) / (b - a) for k, a in enumerate(t) for b in t[k + 1:]]
+    return np.median(slopes) if slopes else np.nan
+
+
+def test_monotonic_series():
+    values = np.array([2.0 * np.arange(10) + 1, -0.5 * np.arange(10)])
+    summary = analytics.mann_kendall(values)
+
+    np.testing.assert_array_equal(summary["s"], [45, -45])
+    np.testing.assert_array_equal(summary["var_s"], [125, 125])
+    np.testing.assert_allclose(summary["z"], [44 / math.sqrt(125), -44 / math.sqrt(125)])
+    # The p-value uses an approximation of erfc with an absolute error below 1.5e-7.
+    np.testing.assert_allclose(summary["p_value"], math.erfc(44 / math.sqrt(125) / math.sqrt(2)), atol=2e-7)
+    np.testing.assert_array_equal(summary["trend"], [1, -1])
+    np.testing.assert_allclose(analytics.sens_slope(values), [2.0, -0.5])
+
+
+def test_ties():
+    values = np.array([[1, 2, 2, 3, 3, 3], [5, 5, 5, 5, 5, 5]], dtype=np.float64)
+    summary = analytics.mann_kendall(values)
+
+    assert summary["s"][0] == 11
+    assert summary["var_s"][0] == pytest.approx((510 - 18 - 66) / 18)
+    # A constant series has no trend.
+    assert summary["s"][1] == 0 and summary["z"][1] == 0 and summary["trend"][1] == 0
+    np.testing.assert_allclose(analytics.sens_slope(values), [0.4, 0.0])
+
+
+def test_missing_values():
+    linear = 1.0 + np.arange(12)
+    with_gaps = linear.copy()
+    with_gaps[[1, 5, 6]] = np.nan
+    values = np.array([with_gaps, np.full(12, np.nan), np.r_[3.0, np.full(11, np.nan)]])
+
+    summary = analytics.mann_kendall(values)
+    s, var_s = brute_force_mann_kendall(with_gaps)
+    assert summary["s"][0] == s and summary["var_s"][0] == var_s
+    # The gaps keep the time spacing of the remaining months.
+    slopes = analytics.sens_slope(values)
+    assert slopes[0] == pytest.approx(1.0)
+    # Series with less than 2 values have no slope and no trend.
+    assert np.isnan(slopes[1:]).all()
+    np.testing.assert_array_equal(summary["trend"][1:], [0, 0])
+
+
+def test_random_series_match_the_brute_force_implementation(monkeypatch):
+    rng = np.random.default_rng(0)
+    # Rounded values give ties, and the series have different numbers of missing months.
+    values = np.round(rng.normal(0, 3, size=(30, 25)))
+    values[rng.random(values.shape) < 0.1] = np.nan
+    # Several chunks per group of series with the same number of valid months.
+    monkeypatch.setattr(analytics, "MAX_PAIRWISE_ELEMENTS", 500)
+
+    summary = analytics.mann_kendall(values)
+    slopes = analytics.sens_slope(values)
+    for k, series in enumerate(values):
+        s, var_s = brute_force_mann_kendall(series)
+        assert summary["s"][k] == s
+        assert summary["var_s"][k] == pytest.approx(var_s)
+        assert slopes[k] == pytest.approx(brute_force_sens_slope(series))
@@ -0,0 +1,146 @@
+import threading
+
+import pytest
+from gwr import cache
+
+
+@pytest.fixture
+def process_cache():
+    # Restores the process wide cache configured from GWR_CACHE_URL.
+    cache.set_cache(None)
+    yield
+    cache.set_cache(None)
+
+
+def test_memory_backend_evicts_the_least_recently_used_entries():
+    backend = cache.MemoryBackend(max_entries=2)
+    backend.set("a", "1", 60)
+    backend.set("b", "2", 60)
+    assert backend.get("a") == "1"
+    backend.set("c", "3", 60)
+
+    assert backend.get("b") is None
+    assert backend.get("a") == "1"
+    assert backend.get("c") == "3"
+
+
+def test_memory_backend_evicts_beyond_max_bytes():
+    backend = cache.MemoryBackend(max_bytes=10)
+    backend.set("a", "12345", 60)
+    backend.set("b", "12345", 60)
+    backend.set("c", "123", 60)
+
+    assert backend.get("a") is None
+    assert backend.get("b") == "12345"
+    assert backend.get("c") == "123"
+
+    # Replacing a value does not count its previous size.
+    backend.set("c", "12345", 60)
+    assert backend.get("b") == "12345"
+
+
+def test_memory_backend_purges_expired_entries_on_set():
+    backend = cache.MemoryBackend()
+    backend.set("a", "1", -1)
+    backend.set("b", "2", 60)
+
+    assert list(backend._values) == ["b"]
+    assert backend._size == 1
+
+
+def test_none_results_are_cached():
+    result_cache = cache.ResultCache(cache.MemoryBackend())
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return None
+
+    assert result_cache.get_or_compute("key", compute) is None
+    assert result_cache.get_or_compute("key", compute) is None
+    assert len(calls) == 1
+    assert result_cache.get("key", cache.MISSING) is None
+    assert result_cache.get("other", cache.MISSING) is cache.MISSING
+
+
+def test_memory_lease_expires():
+    backend = cache.MemoryBackend()
+    assert backend.acquire_lease("key", 60)
+    assert not backend.acquire_lease("key", 60)
+    backend.release_lease("key")
+    assert backend.acquire_lease("key", -1)
+    # The lease of a dead process has expired.
+    assert backend.acquire_lease("key", 60)
+
+
+def test_abandoned_lease_is_taken_over():
+    backend = cache.MemoryBackend()
+    result_cache = cache.ResultCache(backend, lease_ttl=0.05, poll_interval=0.01)
+    # Another process holds the lease and never stores the result.
+    assert backend.acquire_lease("key", 60)
+
+    assert result_cache.get_or_compute("key", lambda: {"value": 1}) == {"value": 1}
+    assert result_cache.get("key") == {"value": 1}
+
+
+def test_waiter_gets_the_result_of_the_lease_holder():
+    backend = cache.MemoryBackend()
+    result_cache = cache.ResultCache(backend, poll_interval=0.01)
+    assert backend.acquire_lease("key", 60)
+
+    def other_process():
+        result_cache.set("key", [1, 2])
+        backend.release_lease("key")
+
+    timer = threading.Timer(0.05, other_process)
+    timer.start()
+    try:
+        assert result_cache.get_or_compute("key", lambda: pytest.fail("computed twice")) == [1, 2]
+    finally:
+        timer.join()
+
+
+def test_sqlite_backend_round_trip(tmp_path):
+    path = str(tmp_path / "cache" / "results.db")
+    result_cache = cache.ResultCache(cache.SQLiteBackend(path))
+    result_cache.set("key", {"values": [1.5, None]})
+
+    # A second backend on the same file, as another process would open it.
+    other = cache.ResultCache(cache.SQLiteBackend(path))
+    assert other.get("key") == {"values": [1.5, None]}
+    assert other.get("missing") is None
+
+
+def test_sqlite_backend_expiry_and_leases(tmp_path):
+    backend = cache.SQLiteBackend(str(tmp_path / "results.db"))
+    backend.set("key", "1", -1)
+    assert backend.get("key") is None
+
+    assert backend.acquire_lease("key", 60)
+    assert not backend.acquire_lease("key", 60)
+    backend.release_lease("key")
+    assert backend.acquire_lease("key", -1)
+    assert backend.acquire_lease("key", 60)
+
+
+def test_backend_from_url(tmp_path):
+    assert isinstance(cache.backend_from_url(None), cache.MemoryBackend)
+    assert isinstance(cache.backend_from_url("memory://"), cache.MemoryBackend)
+
+    backend = cache.backend_from_url(f"sqlite:///{tmp_path}/results.db")
+    assert isinstance(backend, cache.SQLiteBackend)
+    assert backend.path == f"{tmp_path}/results.db"
+
+    with pytest.raises(ValueError):
+        cache.backend_from_url("postgres://localhost/gwr")
+
+
+def test_get_cache_reads_gwr_cache_url(tmp_path, monkeypatch, process_cache):
+    monkeypatch.setenv("GWR_CACHE_URL", f"sqlite:///{tmp_path}/results.db")
+    assert isinstance(cache.get_cache().backend, cache.SQLiteBackend)
+    assert cache.get_cache() is cache.get_cache()
+
+
+def test_fingerprint_is_deterministic():
+    assert cache.fingerprint("a", {"x": 1, "y": 2}) == cache.fingerprint("a", {"y": 2, "x": 1})
+    assert cache.fingerprint("a", 1) != cache.fingerprint("a", 2)
@@ -0,0 +1,50 @@
+from datetime import date
+
+import pytest
+
+pytest.importorskip("ee")
+
+from gwr import datasets  # noqa: E402
+
+SMAP = datasets.Dataset("test_smap", "NASA/SMAP", ["ssm"], {"ssm": 1}, resolution=10000, cadence="3-day",
+                        start_date=date(2015, 4, 2), end_date=date(2022, 8, 3))
+
+
+def test_clip_dates():
+    assert SMAP.clip_dates(date(2016, 1, 1), date(2017, 1, 1)) == (date(2016, 1, 1), date(2017, 1, 1))
+    assert SMAP.clip_dates(date(2010, 1, 1), date(2030, 1, 1)) == (date(2015, 4, 2), date(2022, 8, 3))
+    assert SMAP.clip_dates(date(2010, 1, 1), date(2015, 4, 2)) is None
+    assert SMAP.clip_dates(date(2022, 8, 3), date(2023, 1, 1)) is None
+
+    # A dataset still updated has no end date.
+    chirps = datasets.get("chirps")
+    assert chirps.clip_dates(date(1970, 1, 1), date(2100, 1, 1)) == (date(1981, 1, 1), date(2100, 1, 1))
+
+
+def test_covers():
+    assert SMAP.covers(date(2022, 8, 2), date(2023, 1, 1))
+    assert not SMAP.covers(date(2023, 1, 1), date(2024, 1, 1))
+    # A static dataset covers any period.
+    assert datasets.get("sand").covers(date(1900, 1, 1), date(1901, 1, 1))
+
+    assert datasets.covers(["chirps", "mod16a2"], date(2015, 1, 1), date(2016, 1, 1))
+    assert not datasets.covers(["chirps", "mod16a2"], date(1990, 1, 1), date(1995, 1, 1))
+
+
+def test_unknown_datasets_are_rejected():
+    with pytest.raises(ValueError, match="not registered"):
+        datasets.get("landsat")
+
+
+def test_asset_id_override(monkeypatch):
+    monkeypatch.setenv("GWR_ASSET_TEST_SMAP", "projects/mirror/smap")
+    assert SMAP.resolve_asset_id() == "projects/mirror/smap"
+
+
+def test_extraction_scale():
+    # The requested scale, unless a dataset is coarser.
+    assert datasets.extraction_scale(["sand", "clay"], 100) == 250
+    assert datasets.extraction_scale(["sand", "clay"], 1000) == 1000
+    assert datasets.extraction_scale(["chirps", "mod16a2"], 1000) == 5566
+    assert datasets.extraction_scale(["smap"], 1000) == 10000
+    assert datasets.extraction_scale([], 1000) == 1000
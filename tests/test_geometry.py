@@ -0,0 +1,102 @@
+import math
+from datetime import date
+
+import pytest
+
+pytest.importorskip("ee")
+
+from gwr import geometry, pipeline  # noqa: E402
+
+SQUARE = [[0, 0], [1, 0], [1, 1], [0, 1], [0, 0]]
+
+
+def circle(n, radius=1.0, x=0.0, y=0.0):
+    ring = [[x + radius * math.cos(2 * math.pi * i / n), y + radius * math.sin(2 * math.pi * i / n)]
+            for i in range(n)]
+    return ring + ring[:1]
+
+
+@pytest.mark.parametrize("value", [
+    "",
+    "not a geometry",
+    "{\"type\": \"LineString\", \"coordinates\": [[0, 0], [1, 1]]}",
+    "{\"type\": \"FeatureCollection\", \"features\": []}",
+    "{\"type\": \"Polygon\", \"coordinates\": [[[0, 0], [1, \"a\"], [1, 1], [0, 0]]]}",
+    "[[0, 0], [1, 1], [0, 0]]",
+    "[[0, 0], [1, 95], [2, 0]]",
+    "[[170, 0], [190, 0], [190, 10], [170, 10]]",
+])
+def test_parse_rejects_invalid_geometries(value):
+    with pytest.raises(geometry.GeometryError):
+        geometry.parse(value)
+
+
+def test_parse_accepts_the_supported_formats():
+    expected = geometry.parse(SQUARE)
+    assert expected == {"type": "Polygon", "coordinates": [SQUARE]}
+
+    assert geometry.parse("POLYGON ((0 0, 1 0, 1 1, 0 1, 0 0))") == expected
+    assert geometry.parse({"type": "Feature", "geometry": {"type": "Polygon", "coordinates": [SQUARE]}}) == expected
+    assert geometry.parse_file("roi.csv", b"lon,lat\n0,0\n1,0\n1,1\n0,1\n") == {
+        "type": "Polygon", "coordinates": [[[0.0, 0.0], [1.0, 0.0], [1.0, 1.0], [0.0, 1.0]]]}
+    assert geometry.parse("POINT (-268 22)") == {"type": "Point", "coordinates": [92.0, 22.0]}
+
+
+def test_normalize_gives_the_same_geometry_and_hash_for_the_same_region():
+    # Another start point, the clockwise order, an open ring and longitudes shifted by 360 degrees.
+    variants = [
+        [[1, 1], [0, 1], [0, 0], [1, 0]],
+        [[0, 0], [0, 1], [1, 1], [1, 0], [0, 0]],
+        [[360, 0], [361, 0], [361, 1], [360, 1]],
+    ]
+    expected = geometry.parse(SQUARE)
+    for variant in variants:
+        normalized = geometry.parse(variant)
+        assert normalized == expected
+        assert geometry.geometry_hash(normalized) == geometry.geometry_hash(expected)
+
+    assert geometry.geometry_hash(geometry.parse([[0, 0], [2, 0], [2, 2], [0, 2]])) != geometry.geometry_hash(expected)
+
+
+def test_pipeline_fingerprint_uses_the_geometry_hash():
+    a, b = geometry.parse(SQUARE), geometry.parse([[1, 1], [0, 1], [0, 0], [1, 0]])
+    start, end = date(2020, 1, 1), date(2021, 1, 1)
+    fingerprint_a = pipeline.PipelineInputs(object(), 1000, start, end, geometry=a).fingerprint()
+    fingerprint_b = pipeline.PipelineInputs(object(), 1000, start, end, geometry=b).fingerprint()
+    assert fingerprint_a == fingerprint_b
+
+
+def test_normalize_rejects_self_intersecting_rings():
+    # A symmetric bowtie has a zero signed area.
+    with pytest.raises(geometry.GeometryError, match="no area"):
+        geometry.parse([[0, 0], [2, 2], [2, 0], [0, 2], [0, 0]])
+
+    # An uneven bowtie does not.
+    with pytest.raises(geometry.GeometryError, match="crosses itself"):
+        geometry.parse([[0, 0], [3, 2], [3, 0], [0, 1], [0, 0]])
+
+
+def test_multipolygon_order_does_not_change_the_geometry():
+    first, second = [SQUARE], [[[5, 5], [6, 5], [6, 6], [5, 6], [5, 5]]]
+    assert (geometry.parse({"type": "MultiPolygon", "coordinates": [first, second]})
+            == geometry.parse({"type": "MultiPolygon", "coordinates": [second, first]}))
+
+
+def test_dense_polygons_are_simplified_to_the_vertex_limit():
+    normalized = geometry.parse(circle(2000), max_vertices=100)
+    ring = normalized["coordinates"][0]
+    assert 4 <= len(ring) - 1 <= 100
+    assert ring[0] == ring[-1]
+    # The simplified ring stays close to the circle.
+    assert all(abs(math.hypot(x, y) - 1) < 0.01 for x, y in ring)
+
+
+def test_polygons_under_the_vertex_limit_are_kept():
+    normalized = geometry.parse(circle(50), max_vertices=100)
+    assert len(normalized["coordinates"][0]) == 51
+
+
+def test_too_many_polygons_cannot_be_simplified():
+    triangles = [[[[i / 2, 0], [i / 2 + 0.25, 0], [i / 2, 0.25], [i / 2, 0]]] for i in range(200)]
+    with pytest.raises(geometry.GeometryError, match="cannot be simplified"):
+        geometry.parse({"type": "MultiPolygon", "coordinates": triangles})
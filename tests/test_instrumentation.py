@@ -0,0 +1,64 @@
+import json
+
+import pytest
+from gwr import instrumentation
+
+
+@pytest.fixture(autouse=True)
+def reset():
+    instrumentation.reset()
+    yield
+    instrumentation.reset()
+
+
+def test_nested_spans_share_the_trace_of_their_parent():
+    with instrumentation.span("soil map", stage="soil map", method=instrumentation.SECTION_METHOD) as section:
+        with instrumentation.span("getRegion", stage="soil", method="getRegion") as call:
+            assert instrumentation.current_span() is call
+        assert instrumentation.current_span() is section
+    assert instrumentation.current_span() is None
+
+    assert call.parent_id == section.span_id
+    assert call.trace_id == section.trace_id
+    assert section.parent_id is None
+    # The inner span finishes first.
+    assert instrumentation.get_spans() == [call, section]
+
+
+def test_failed_span_records_the_error():
+    with pytest.raises(ValueError):
+        with instrumentation.span("getRegion", stage="soil", method="getRegion"):
+            raise ValueError("boom")
+
+    (s,) = instrumentation.get_spans()
+    assert s.status == "ERROR"
+    assert s.error == "ValueError: boom"
+
+
+def test_section_spans_are_exported_separately():
+    with instrumentation.span("soil map", stage="soil map", method=instrumentation.SECTION_METHOD):
+        with instrumentation.span("getRegion", stage="soil", method="getRegion") as s:
+            s.record_response([1, 2])
+
+    lines = instrumentation.export_prometheus().splitlines()
+    assert 'gwr_ee_calls_total{name="getRegion",stage="soil",method="getRegion"} 1' in lines
+    assert 'gwr_ee_response_bytes_total{name="getRegion",stage="soil",method="getRegion"} 5' in lines
+    assert 'gwr_section_runs_total{section="soil map"} 1' in lines
+    assert 'gwr_section_errors_total{section="soil map"} 0' in lines
+    assert "# TYPE gwr_section_duration_seconds_total counter" in lines
+    # The section is not counted as an Earth Engine call.
+    assert not [line for line in lines if line.startswith("gwr_ee_") and "soil map" in line]
+
+
+def test_export_files(tmp_path, monkeypatch):
+    monkeypatch.setenv("GWR_METRICS_FILE", str(tmp_path / "gwr.prom"))
+    monkeypatch.setenv("GWR_TRACES_FILE", str(tmp_path / "traces.json"))
+    with instrumentation.span("getRegion", stage="soil", method="getRegion"):
+        pass
+
+    instrumentation.export_files()
+
+    assert "gwr_ee_calls_total" in (tmp_path / "gwr.prom").read_text()
+    traces = json.loads((tmp_path / "traces.json").read_text())
+    (span,) = traces["resourceSpans"][0]["scopeSpans"][0]["spans"]
+    assert span["name"] == "getRegion"
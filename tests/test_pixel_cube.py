@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("ee")
+
+from gwr import ee_utils, pixel_cube  # noqa: E402
+
+MONTH_MS = [1420070400000, 1422748800000]
+
+# 2 months of a 2 x 2 grid (0.01 degree pixels), the south east pixel is outside the ROI.
+PIXELS = [(10.005, 20.015), (10.015, 20.015), (10.005, 20.005)]
+
+
+def region_array():
+    header = ["id", "longitude", "latitude", "time"] + pixel_cube.CUBE_BANDS
+    rows = []
+    for t, time in enumerate(MONTH_MS):
+        for i, (lon, lat) in enumerate(PIXELS):
+            # getRegion returns the pixel centres with some floating point noise.
+            rows.append([f"{t}_{i}", lon + 1e-9, lat - 1e-9, time] + [100 * t + 10 * i + b for b in range(5)])
+    return [header] + rows
+
+
+def test_pixels_df_to_arrays_scatters_the_pixels_on_the_grid():
+    pixels_df = ee_utils.ee_array_to_df(region_array(), pixel_cube.CUBE_BANDS, keep_coordinates=True)
+    times, lats, lons, arrays = pixel_cube.pixels_df_to_arrays(pixels_df)
+
+    assert times.astype("datetime64[ms]").astype(np.int64).tolist() == MONTH_MS
+    np.testing.assert_allclose(lats, [20.015, 20.005])
+    np.testing.assert_allclose(lons, [10.005, 10.015])
+    assert set(arrays) == set(pixel_cube.CUBE_BANDS)
+
+    rech = arrays["rech"]
+    assert rech.dtype == np.float32 and rech.shape == (2, 2, 2)
+    # North row first, the missing pixel is NaN.
+    np.testing.assert_array_equal(rech[1], [[104, 114], [124, np.nan]])
+    np.testing.assert_array_equal(arrays["pr"][0], [[0, 10], [20, np.nan]])
+
+
+def test_to_dataset_has_cf_coordinates():
+    pytest.importorskip("xarray")
+    pixels_df = ee_utils.ee_array_to_df(region_array(), pixel_cube.CUBE_BANDS, keep_coordinates=True)
+    dataset = pixel_cube.to_dataset(pixels_df, attributes={"scale": 1000})
+
+    assert dict(dataset.sizes) == {"time": 2, "lat": 2, "lon": 2}
+    assert dataset["rech"].attrs["units"] == "mm"
+    assert dataset["lat"].attrs["units"] == "degrees_north"
+    assert dataset.attrs == {"scale": 1000, "Conventions": "CF-1.8"}
+    assert float(dataset["st"].sel(lat=20.015, lon=10.015).isel(time=0)) == 13
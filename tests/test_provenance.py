@@ -0,0 +1,82 @@
+import math
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("ee")
+
+from gwr import cache, geometry, pipeline, provenance, results  # noqa: E402
+
+
+def round_trip(value):
+    store = provenance.ProvenanceStore(cache.MemoryBackend(), ttl=60)
+    store.set("key", value)
+    return store.get("key")
+
+
+def test_monthly_series_round_trip():
+    index = pd.date_range("2015-01-01", periods=3, freq="MS").as_unit("ms").asi8
+    series = results.MonthlySeries(index, [[1.5, np.nan, 3.0], [4, 5, 6]], ["mean-pr", "mean-pet"], scale=1000,
+                                   dataset="recharge")
+    restored = round_trip(series)
+
+    assert isinstance(restored, results.MonthlySeries)
+    np.testing.assert_array_equal(restored.index, series.index)
+    np.testing.assert_array_equal(restored.values, series.values)
+    assert restored.values.dtype == np.float32
+    assert (restored.columns, restored.scale, restored.dataset) == (series.columns, 1000, "recharge")
+
+
+def test_data_frame_round_trip():
+    df = pd.DataFrame({"mean-annual-rech": np.array([12.5, 0.0], dtype=np.float32), "months": [12, 11]},
+                      index=pd.Index(["2015", "2016"], name="year"))
+    restored = round_trip(df)
+    pd.testing.assert_frame_equal(restored, df)
+
+    sensitivity = pd.DataFrame({"zr": [0.5, 1.0], "p": [0.5, 0.5],
+                                "mean-annual-rech": np.array([10.0, 8.5], dtype=np.float32)})
+    pd.testing.assert_frame_equal(round_trip(sensitivity), sensitivity)
+
+
+def test_profile_tuples_round_trip():
+    profiles = pipeline.SoilContentProfiles(
+        [{"b0": 0.4, "b10": float("nan")}], [{"b0": np.float64(0.2), "b10": 0.3}], [{"b0": 0.01, "b10": 0.02}])
+    restored = round_trip(profiles)
+
+    assert isinstance(restored, pipeline.SoilContentProfiles)
+    assert restored.clay == [{"b0": 0.2, "b10": 0.3}]
+    assert restored.sand[0]["b0"] == 0.4 and math.isnan(restored.sand[0]["b10"])
+
+
+def test_unknown_types_are_not_decoded():
+    with pytest.raises(ValueError):
+        provenance.decode_result({provenance.TYPE_KEY: "Pickle", "values": []})
+
+
+def test_run_is_served_from_the_store_until_an_asset_changes(monkeypatch):
+    versions = {}
+    monkeypatch.setattr(provenance, "asset_version", lambda asset_id: versions.get(asset_id, "1"))
+    monkeypatch.setattr(provenance, "_store", provenance.ProvenanceStore(cache.MemoryBackend(), ttl=60))
+    calls = []
+
+    def soil_content_profiles(inputs):
+        calls.append(inputs)
+        return pipeline.SoilContentProfiles([{"b0": 0.4}], [{"b0": 0.2}], [{"b0": 0.01}])
+
+    def inputs(coordinates):
+        # The stage is not run on Earth Engine, only the normalized geometry is needed.
+        return pipeline.PipelineInputs(None, 1000, date(2015, 1, 1), date(2016, 1, 1),
+                                       geometry=geometry.parse(coordinates))
+
+    first = provenance.run(soil_content_profiles, inputs([[0, 0], [1, 0], [1, 1], [0, 1]]))
+    # The same region drawn from another vertex is served from the store.
+    second = provenance.run(soil_content_profiles, inputs([[1, 1], [0, 1], [0, 0], [1, 0]]))
+    assert len(calls) == 1
+    assert second == first
+
+    # A new version of an asset read by the stage gives a new record.
+    versions[provenance.stage_assets(soil_content_profiles, calls[0])[0]] = "2"
+    provenance.run(soil_content_profiles, inputs([[0, 0], [1, 0], [1, 1], [0, 1]]))
+    assert len(calls) == 2
@@ -0,0 +1,86 @@
+import json
+import os
+from datetime import date
+
+import pytest
+
+pytest.importorskip("ee")
+
+from gwr import pipeline, raster_export  # noqa: E402
+
+
+def test_tile_grid_covers_the_bounds():
+    # Tiles of 1000 pixels of 10 m, about 0.09 degrees.
+    bounds = (10.0, 20.0, 10.2, 20.1)
+    step = 1000 * 10 / raster_export.METERS_PER_DEGREE
+    tiles = raster_export.tile_grid(bounds, 10, tile_pixels=1000)
+
+    assert len(tiles) == 2 * 3
+    assert tiles["0_0"] == pytest.approx((10.0, 20.1 - step, 10.0 + step, 20.1))
+    # The last row and column are clipped to the bounds.
+    west, south, east, north = tiles["1_2"]
+    assert (south, east) == (20.0, 10.2)
+    assert west == pytest.approx(10.0 + 2 * step) and north == pytest.approx(20.1 - step)
+
+    # A small area is a single tile.
+    assert raster_export.tile_grid((0, 0, 0.01, 0.01), 1000) == {"0_0": (0, 0, 0.01, 0.01)}
+
+
+def test_tile_size_fits_the_download_limit():
+    for n_bands in (1, 12, 72, 500):
+        size = raster_export.tile_size(n_bands)
+        assert 1 <= size <= raster_export.TILE_PIXELS
+        assert 4 * n_bands * size * size <= raster_export.MAX_DOWNLOAD_BYTES
+    assert raster_export.tile_size(1) == raster_export.TILE_PIXELS
+    assert raster_export.tile_size(72) < raster_export.tile_size(12)
+
+
+def test_manifest_rejects_other_parameters(tmp_path):
+    manifest = raster_export.ExportManifest(str(tmp_path), {"scale": 1000})
+    manifest.set_tile("0_0", raster_export.DONE)
+
+    assert raster_export.ExportManifest(str(tmp_path), {"scale": 1000}).data["tiles"] == {"0_0": "done"}
+    with pytest.raises(ValueError):
+        raster_export.ExportManifest(str(tmp_path), {"scale": 500})
+
+
+def test_export_resumes_the_failed_tiles(tmp_path, monkeypatch):
+    products = ["rech_2015-01", "rech_2015-02"]
+    monkeypatch.setattr(raster_export, "recharge_products", lambda inputs: (object(), products))
+    downloads, mosaics, failing = [], [], {"0_1"}
+
+    def download_tile(image, tile_bounds, scale, path):
+        tile = os.path.basename(path)[:-len(".tif")]
+        downloads.append(tile)
+        if tile in failing:
+            raise IOError("connection reset")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(b"tif")
+
+    monkeypatch.setattr(raster_export, "download_tile", download_tile)
+    monkeypatch.setattr(raster_export, "mosaic", lambda paths, band, path: mosaics.append((band, len(paths))))
+
+    out_dir = str(tmp_path)
+    inputs = pipeline.PipelineInputs(None, 10, date(2015, 1, 1), date(2015, 3, 1))
+    # Two tiles of 1000 pixels of 10 m.
+    bounds = (10.0, 20.0, 10.15, 20.05)
+
+    manifest = raster_export.export_recharge(out_dir, bounds, inputs, tile_pixels=1000, workers=2)
+    assert sorted(downloads) == ["0_0", "0_1"]
+    assert manifest.failed_tiles() == ["0_1"]
+    # No mosaic while a tile is missing.
+    assert mosaics == []
+
+    # The second run only downloads the failed tile and builds the mosaics.
+    downloads.clear()
+    failing.clear()
+    manifest = raster_export.export_recharge(out_dir, bounds, inputs, tile_pixels=1000, workers=2)
+    assert downloads == ["0_1"]
+    assert manifest.failed_tiles() == []
+    assert mosaics == [(1, 2), (2, 2)]
+
+    with open(os.path.join(out_dir, raster_export.MANIFEST)) as f:
+        saved = json.load(f)
+    assert saved["tiles"] == {"0_0": "done", "0_1": "done"}
+    assert sorted(saved["mosaics"]) == products
@@ -0,0 +1,164 @@
+import threading
+import time
+import urllib.error
+
+import pytest
+from gwr import rate_limit
+
+
+class FakeSpan:
+    def __init__(self):
+        self.retries = 0
+
+    def add_retry(self):
+        self.retries += 1
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    # Records the backoff delays instead of sleeping.
+    delays = []
+    monkeypatch.setattr(rate_limit.time, "sleep", delays.append)
+    return delays
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.time() + timeout
+    while not condition():
+        assert time.time() < deadline, "timed out"
+        time.sleep(0.001)
+
+
+@pytest.mark.parametrize("message", [
+    "<HttpError 429 when requesting https://earthengine.googleapis.com/...>",
+    "HTTP Error 503: Service Unavailable",
+    "Too many concurrent aggregations.",
+    "Quota exceeded for quota metric 'Requests'",
+    "status: 429",
+])
+def test_quota_errors_are_retryable(message):
+    assert rate_limit.is_retryable(Exception(message))
+
+
+@pytest.mark.parametrize("message", [
+    "Image.load: Image asset 'users/gwr/well_429' not found.",
+    "Computed value is too large: 5030 elements",
+    "Invalid coordinates [90.503, 23.429]",
+    "User memory limit exceeded.",
+])
+def test_other_errors_are_not_retryable(message):
+    assert not rate_limit.is_retryable(Exception(message))
+
+
+def test_http_status_is_retryable():
+    assert rate_limit.is_retryable(urllib.error.HTTPError("https://x", 429, "Too Many Requests", None, None))
+    assert not rate_limit.is_retryable(urllib.error.HTTPError("https://x", 404, "Not Found", None, None))
+
+
+def test_call_retries_quota_errors(sleeps):
+    limiter = rate_limit.RateLimiter(max_retries=3)
+    span = FakeSpan()
+    attempts = []
+
+    def fn():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise Exception("Too many concurrent aggregations.")
+        return "result"
+
+    assert limiter.call(fn, span=span) == "result"
+    assert len(attempts) == 3
+    assert span.retries == 2
+    assert len(sleeps) == 2
+    assert all(0 <= delay <= limiter.max_delay for delay in sleeps)
+
+
+def test_call_raises_backend_busy_after_max_retries(sleeps):
+    limiter = rate_limit.RateLimiter(max_retries=2)
+    attempts = []
+
+    def fn():
+        attempts.append(1)
+        raise Exception("<HttpError 429 when requesting ...>")
+
+    with pytest.raises(rate_limit.BackendBusyError):
+        limiter.call(fn)
+    assert len(attempts) == 3
+    assert len(sleeps) == 2
+    # The slots are released after each attempt.
+    assert limiter._running == 0
+
+
+def test_call_does_not_retry_other_errors(sleeps):
+    limiter = rate_limit.RateLimiter()
+    with pytest.raises(ValueError):
+        limiter.call(lambda: (_ for _ in ()).throw(ValueError("Asset 'well_503' not found")))
+    assert sleeps == []
+    assert limiter._running == 0
+
+
+def test_backoff_delay_is_bounded():
+    limiter = rate_limit.RateLimiter(base_delay=1.0, max_delay=8.0)
+    for attempt in range(1, 10):
+        assert 0 <= limiter.backoff_delay(attempt) <= min(8.0, 2 ** (attempt - 1))
+
+
+def test_waiting_calls_are_served_by_priority():
+    limiter = rate_limit.RateLimiter(rate=1000, burst=10, max_concurrent=1, reserved=0)
+    order = []
+    limiter.acquire()
+
+    def wait(level):
+        limiter.acquire(level)
+        order.append(level)
+        limiter.release()
+
+    threads = []
+    for level in (rate_limit.BATCH, rate_limit.PREWARM, rate_limit.INTERACTIVE):
+        thread = threading.Thread(target=wait, args=(level,))
+        thread.start()
+        threads.append(thread)
+        wait_for(lambda: len(limiter._waiting) == len(threads))
+
+    limiter.release()
+    for thread in threads:
+        thread.join(5)
+
+    assert order == [rate_limit.INTERACTIVE, rate_limit.PREWARM, rate_limit.BATCH]
+
+
+def test_reserved_slots_are_only_used_by_interactive_calls():
+    limiter = rate_limit.RateLimiter(rate=1000, burst=10, max_concurrent=2, reserved=1)
+    limiter.acquire(rate_limit.BATCH)
+
+    acquired = threading.Event()
+
+    def batch():
+        limiter.acquire(rate_limit.BATCH)
+        acquired.set()
+        limiter.release()
+
+    thread = threading.Thread(target=batch)
+    thread.start()
+    wait_for(lambda: len(limiter._waiting) == 1)
+    assert not acquired.wait(0.1)
+
+    # The reserved slot is still available to an interactive call, served before the waiting batch call.
+    limiter.acquire(rate_limit.INTERACTIVE)
+    assert limiter._running == 2
+    limiter.release()
+    limiter.release()
+
+    thread.join(5)
+    assert acquired.is_set()
+
+
+def test_priority_context_is_thread_local():
+    seen = []
+    with rate_limit.priority(rate_limit.BATCH):
+        assert rate_limit.current_priority() == rate_limit.BATCH
+        thread = threading.Thread(target=lambda: seen.append(rate_limit.current_priority()))
+        thread.start()
+        thread.join()
+    assert seen == [rate_limit.INTERACTIVE]
+    assert rate_limit.current_priority() == rate_limit.INTERACTIVE
@@ -0,0 +1,75 @@
+import pickle
+
+import numpy as np
+import pandas as pd
+import pytest
+from gwr import results
+
+MONTHS = pd.date_range("2015-01-01", periods=4, freq="MS")
+
+
+def monthly_series():
+    values = np.array([[1.5, 2.5, np.nan, 4.0], [10, 20, 30, 40]])
+    return results.MonthlySeries(MONTHS.as_unit("ms").asi8, values, ["mean-pr", "mean-pet"], scale=1000,
+                                 dataset="meteo")
+
+
+def test_monthly_series_layout():
+    series = monthly_series()
+    assert series.index.dtype == np.int64 and series.values.dtype == np.float32
+    assert series.values.flags.c_contiguous
+    assert len(series) == 4
+    # Columns are zero-copy views of the values.
+    assert np.shares_memory(series["mean-pet"], series.values)
+    assert series.dates.equals(pd.DatetimeIndex(MONTHS, name="datetime"))
+
+    with pytest.raises(ValueError):
+        results.MonthlySeries(series.index, series.values[:, :3], series.columns)
+
+
+def test_to_frame_from_frame_round_trip():
+    series = monthly_series()
+    df = series.to_frame()
+    assert list(df.columns) == ["mean-pr", "mean-pet"]
+    assert df.index.equals(series.dates)
+    np.testing.assert_array_equal(df.to_numpy().T, series.values)
+
+    restored = results.MonthlySeries.from_frame(df, scale=1000, dataset="meteo")
+    np.testing.assert_array_equal(restored.index, series.index)
+    np.testing.assert_array_equal(restored.values, series.values)
+    assert restored.columns == series.columns
+    assert (restored.scale, restored.dataset) == (1000, "meteo")
+
+
+def test_select_and_pickle():
+    series = monthly_series()
+    selected = series.select(["mean-pet"])
+    assert selected.columns == ("mean-pet",)
+    np.testing.assert_array_equal(selected["mean-pet"], [10, 20, 30, 40])
+    assert selected.dataset == "meteo"
+
+    restored = pickle.loads(pickle.dumps(series))
+    np.testing.assert_array_equal(restored.values, series.values)
+    assert restored.columns == series.columns
+
+
+def test_region_to_monthly_series_matches_a_pandas_groupby():
+    rng = np.random.default_rng(0)
+    times = MONTHS.as_unit("ms").asi8
+    header = ["id", "longitude", "latitude", "time", "pr", "pet"]
+    rows = []
+    for i in range(60):
+        # Unordered dates, several points per date and masked values (None in the getRegion arrays).
+        pr = None if i % 7 == 0 else float(rng.uniform(0, 10))
+        rows.append([str(i), 0.1 * i, 0.2, int(times[rng.integers(len(times))]), pr, float(rng.uniform(0, 5))])
+    # A date where all the values are masked.
+    rows.append(["x", 0.0, 0.0, int(times[0]) - 1, None, None])
+
+    series = results.region_to_monthly_series([header] + rows, ["pr", "pet"], dataset="meteo")
+
+    df = pd.DataFrame(rows, columns=header).astype({"pr": float, "pet": float})
+    expected = df.groupby("time")[["pr", "pet"]].mean()
+    np.testing.assert_array_equal(series.index, expected.index.to_numpy())
+    assert series.columns == ("mean-pr", "mean-pet")
+    np.testing.assert_allclose(series.values, expected.to_numpy().T, rtol=1e-6)
+    assert np.isnan(series["mean-pr"][0])
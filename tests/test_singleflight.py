@@ -0,0 +1,73 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from gwr import singleflight
+
+CALLERS = 8
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.time() + timeout
+    while not condition():
+        assert time.time() < deadline, "timed out"
+        time.sleep(0.001)
+
+
+def run_concurrently(registry, fn):
+    # Starts CALLERS calls of the same key, releasing fn once all the duplicates wait for it.
+    release = threading.Event()
+
+    def blocked():
+        release.wait(5)
+        return fn()
+
+    executor = ThreadPoolExecutor(max_workers=CALLERS)
+    futures = [executor.submit(registry.do, "key", blocked) for _ in range(CALLERS)]
+    wait_for(lambda: registry.coalesced == CALLERS - 1)
+    release.set()
+    executor.shutdown(wait=True)
+    return futures
+
+
+def test_concurrent_callers_run_the_function_once():
+    registry = singleflight.SingleFlight()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return {"value": 42}
+
+    futures = run_concurrently(registry, compute)
+
+    assert len(calls) == 1
+    assert [future.result() for future in futures] == [{"value": 42}] * CALLERS
+    assert registry.calls == 1
+    assert registry.in_flight() == 0
+
+
+def test_exception_reaches_every_waiter_and_clears_the_key():
+    registry = singleflight.SingleFlight()
+
+    def fail():
+        raise RuntimeError("backend error")
+
+    futures = run_concurrently(registry, fail)
+
+    for future in futures:
+        with pytest.raises(RuntimeError, match="backend error"):
+            future.result()
+    assert registry.in_flight() == 0
+
+    # The key is not stuck on the failed computation.
+    assert registry.do("key", lambda: "retried") == "retried"
+    assert registry.calls == 2
+
+
+def test_different_keys_are_not_coalesced():
+    registry = singleflight.SingleFlight()
+    assert registry.do("a", lambda: 1) == 1
+    assert registry.do("b", lambda: 2) == 2
+    assert registry.calls == 2
+    assert registry.coalesced == 0
@@ -0,0 +1,109 @@
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+from gwr import water_balance
+
+
+def random_inputs(n_steps=40, n_pixels=5, seed=0):
+    rng = np.random.default_rng(seed)
+    pr = rng.gamma(0.5, 6.0, size=(n_steps, n_pixels))
+    pet = rng.uniform(1.0, 6.0, size=(n_steps, n_pixels))
+    stfc = rng.uniform(20.0, 120.0, size=n_pixels)
+    return pr, pet, stfc
+
+
+def test_run_chunks_matches_a_single_run():
+    pr, pet, stfc = random_inputs()
+    pr[7, 2] = np.nan
+    expected, _ = water_balance.run(pr, pet, stfc)
+
+    # Uneven chunks, with an empty chunk in the middle and at the end (days not yet published).
+    bounds = [0, 10, 10, 23, 40, 40]
+    chunks = [(np.arange(start, end), pr[start:end], pet[start:end]) for start, end in zip(bounds, bounds[1:])]
+    results = list(water_balance.run_chunks(chunks, stfc))
+
+    assert [len(times) for (times, _, _), _ in results] == [10, 13, 17]
+    for band in ("rech", "apwl", "st"):
+        chunked = np.concatenate([outputs[band] for _, outputs in results])
+        np.testing.assert_allclose(chunked, expected[band], rtol=1e-6, equal_nan=True)
+
+
+def test_sweep_chunking_matches_an_unchunked_run(monkeypatch):
+    pr, pet, _ = random_inputs(n_steps=24, n_pixels=7)
+    rng = np.random.default_rng(1)
+    wp = rng.uniform(0.05, 0.15, size=7)
+    fc = wp + rng.uniform(0.05, 0.2, size=7)
+    # A masked pixel (e.g. water) is excluded from the recharge.
+    fc[3] = wp[3] = np.nan
+    zr_values, p_values = [0.25, 0.5, 1.0], [0.25, 0.5]
+
+    zr, p, expected = water_balance.sweep(pr, pet, fc, wp, zr_values, p_values)
+
+    # A single pixel per chunk.
+    monkeypatch.setattr(water_balance, "MAX_SWEEP_ELEMENTS", 24 * 6)
+    chunked_zr, chunked_p, chunked = water_balance.sweep(pr, pet, fc, wp, zr_values, p_values)
+
+    np.testing.assert_array_equal(chunked_zr, zr)
+    np.testing.assert_array_equal(chunked_p, p)
+    for band in ("pr", "pet", "apwl", "st", "rech"):
+        np.testing.assert_allclose(chunked[band], expected[band], rtol=1e-6)
+
+    # Each scenario is the ROI mean of a single run of the model.
+    stfc = (fc - wp) * 1000 * zr[4] * p[4]
+    outputs, _ = water_balance.run(pr, pet, stfc)
+    outputs["rech"][:, 3] = np.nan
+    np.testing.assert_allclose(expected["rech"][:, 4], np.nanmean(outputs["rech"], axis=1), rtol=1e-5)
+
+
+def pandas_water_balance(df, stfc):
+    # Row by row implementation of the equations of recharge_properties.compute_recharge on a DataFrame,
+    # as the water balance was computed before the numpy kernel.
+    apwl, st = 0.0, stfc
+    rows = []
+    for _, row in df.iterrows():
+        if row["pet"] > row["pr"]:
+            apwl = apwl + row["pet"] - row["pr"]
+            st = st * math.exp(-apwl / stfc)
+            rech = 0.0
+        else:
+            st = st + row["pr"] - row["pet"]
+            rech = 0.0
+            if st >= stfc:
+                rech, st = st - stfc, stfc
+            apwl = 0.0 if rech > 0 or st >= stfc else -stfc * math.log(st / stfc)
+        rows.append({"rech": rech, "apwl": apwl, "st": st})
+    return pd.DataFrame(rows, index=df.index)
+
+
+def test_run_matches_the_pandas_loop():
+    # A dry season, a wet season filling the soil up to field capacity and a partial refill.
+    df = pd.DataFrame({
+        "pr": [120.0, 80.0, 10.0, 0.0, 5.0, 30.0, 150.0, 200.0, 90.0, 20.0, 60.0, 40.0],
+        "pet": [60.0, 70.0, 90.0, 110.0, 100.0, 80.0, 60.0, 50.0, 70.0, 90.0, 40.0, 45.0],
+    }, index=pd.date_range("2015-01-01", periods=12, freq="MS"))
+    stfc = 75.0
+
+    expected = pandas_water_balance(df, stfc)
+    outputs, state = water_balance.run(df["pr"].to_numpy(), df["pet"].to_numpy(), stfc, dtype=np.float64)
+
+    assert expected["rech"].gt(0).any() and expected["apwl"].gt(0).any()
+    for band in ("rech", "apwl", "st"):
+        np.testing.assert_allclose(outputs[band], expected[band].to_numpy(), rtol=1e-12, atol=1e-9)
+    assert state.st == pytest.approx(expected["st"].iloc[-1])
+
+
+def test_run_resumes_from_the_state():
+    pr, pet, stfc = random_inputs(n_steps=36)
+    expected, expected_state = water_balance.run(pr, pet, stfc)
+
+    first, state = water_balance.run(pr[:12], pet[:12], stfc)
+    second, state = water_balance.run(pr[12:30], pet[12:30], stfc, state=state)
+    third, state = water_balance.run(pr[30:], pet[30:], stfc, state=state)
+
+    for band in ("rech", "apwl", "st"):
+        chunked = np.concatenate([first[band], second[band], third[band]])
+        np.testing.assert_allclose(chunked, expected[band], rtol=1e-6)
+    np.testing.assert_allclose(state.st, expected_state.st)
+    np.testing.assert_allclose(state.apwl, expected_state.apwl)